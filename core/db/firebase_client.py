@@ -24,7 +24,12 @@ load_dotenv()
 # Variáveis globais
 firebase_app = None
 _lock = Lock()
-_conversation_locks = {}
+
+# Número de locks compartilhados entre as conversas (potência de 2)
+CONVERSATION_LOCK_SHARDS = 1024
+
+# Locks das conversas; cada conversa usa sempre o mesmo shard
+_conversation_locks = tuple(Lock() for _ in range(CONVERSATION_LOCK_SHARDS))
 
 def init_firebase():
     """
@@ -88,19 +93,18 @@ def get_conversation_lock(conversation_id: str) -> Lock:
     Obtém um lock para operações em uma conversa específica.
     Evita condições de corrida em operações concorrentes.
     
+    O lock vem de uma tabela fixa indexada pelo hash do ID, sem lock global
+    nem um dicionário que cresce a cada conversa. Conversas diferentes podem
+    compartilhar o mesmo lock, portanto não adquira o lock de uma conversa
+    enquanto segura o de outra.
+    
     Args:
         conversation_id: ID da conversa
         
     Returns:
         Lock: O lock para a conversa
     """
-    global _conversation_locks
-    
-    with _lock:
-        if conversation_id not in _conversation_locks:
-            _conversation_locks[conversation_id] = Lock()
-        
-        return _conversation_locks[conversation_id]
+    return _conversation_locks[hash(conversation_id) & (CONVERSATION_LOCK_SHARDS - 1)]
 
 def get_conversation(conversation_id: str) -> Optional[Dict]:
     """
@@ -0,0 +1,275 @@
+"""
+Camada Redis opcional do cache, para implantações com vários workers.
+
+Com REDIS_URL definida e o pacote redis instalado, as entradas do
+``CacheManager`` também são gravadas no Redis, compartilhadas por todos os
+processos, e cada invalidação é publicada em um canal pub/sub para que os
+demais processos descartem suas cópias em memória. Sem REDIS_URL o cache
+continua apenas em memória, como antes.
+"""
+import os
+import time
+import uuid
+import pickle
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+import orjson
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# URL do Redis compartilhado (None mantém o cache apenas em memória)
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Prefixo de todas as chaves gravadas no Redis
+REDIS_KEY_PREFIX = 'firebase_db'
+
+# Canal pub/sub das invalidações entre processos
+INVALIDATION_CHANNEL = f'{REDIS_KEY_PREFIX}:invalidate'
+
+# Chaves pedidas por iteração do SCAN ao invalidar um padrão
+SCAN_COUNT = 500
+
+# Espera antes de reconectar o assinante do canal após uma falha, em segundos
+RESUBSCRIBE_DELAY = 1.0
+
+# Caracteres especiais dos padrões glob do Redis, escapados nos segmentos das chaves
+_GLOB_CHARS = str.maketrans({char: '\\' + char for char in '\\*?[]'})
+
+def _args_default(value: Any) -> Any:
+    """Serializa o marcador de kwargs do functools._make_key; outros tipos não são suportados"""
+    if type(value) is object:
+        return '**'
+    raise TypeError(f"Tipo não serializável na chave do cache: {type(value).__name__}")
+
+class RedisBackend:
+    """
+    Armazenamento compartilhado do cache no Redis
+
+    Os valores são serializados com pickle, portanto o Redis deve ser um
+    serviço interno e confiável. Erros de conexão são registrados e tratados
+    como ausência no cache, sem interromper a aplicação.
+    """
+
+    def __init__(self, url: str):
+        """
+        Inicializa a conexão com o Redis
+
+        Args:
+            url: URL do Redis, ex.: redis://localhost:6379/0
+        """
+        self._client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(url))
+        # Identifica as mensagens publicadas por este processo
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+
+    def redis_key(self, key: Hashable) -> Optional[str]:
+        """
+        Converte uma chave do cache em chave do Redis
+
+        Segmentos str/int são mantidos; os argumentos de uma chamada @cached
+        viram um resumo SHA-1 estável entre processos.
+
+        Args:
+            key: Chave do cache (str separada por ':' ou tupla de segmentos)
+
+        Returns:
+            Chave do Redis, ou None se a chave não puder ser compartilhada
+        """
+        if isinstance(key, str):
+            return f'{REDIS_KEY_PREFIX}:{key}'
+        if not isinstance(key, tuple):
+            return None
+        segments = []
+        for segment in key:
+            if isinstance(segment, (str, int)) and not isinstance(segment, bool):
+                segments.append(str(segment))
+                continue
+            try:
+                encoded = orjson.dumps(segment, default=_args_default, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                return None
+            segments.append(hashlib.sha1(encoded).hexdigest())
+        return ':'.join((REDIS_KEY_PREFIX, *segments))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Obtém um valor compartilhado
+
+        Args:
+            key: Chave do cache
+
+        Returns:
+            Valor armazenado ou None se ausente
+        """
+        redis_key = self.redis_key(key)
+        if redis_key is None:
+            return None
+        try:
+            payload = self._client.get(redis_key)
+        except redis.RedisError as e:
+            logger.warning(f"Erro ao ler do Redis: {e}")
+            return None
+        return pickle.loads(payload) if payload is not None else None
+
+    def mget(self, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        """
+        Obtém vários valores compartilhados em uma única requisição
+
+        Args:
+            keys: Chaves do cache
+
+        Returns:
+            Dicionário de chave -> valor das chaves encontradas
+        """
+        pairs = [(key, self.redis_key(key)) for key in keys]
+        pairs = [(key, redis_key) for key, redis_key in pairs if redis_key is not None]
+        if not pairs:
+            return {}
+        try:
+            payloads = self._client.mget([redis_key for _, redis_key in pairs])
+        except redis.RedisError as e:
+            logger.warning(f"Erro ao ler do Redis: {e}")
+            return {}
+        return {
+            key: pickle.loads(payload)
+            for (key, _), payload in zip(pairs, payloads)
+            if payload is not None
+        }
+
+    def mset(self, mapping: Dict[Hashable, Any], ttl: int):
+        """
+        Armazena vários valores compartilhados com expiração
+
+        Args:
+            mapping: Dicionário de chave -> valor
+            ttl: Time To Live em segundos
+        """
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                redis_key = self.redis_key(key)
+                if redis_key is not None:
+                    pipe.setex(redis_key, ttl, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            pipe.execute()
+        except (redis.RedisError, pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning(f"Erro ao gravar no Redis: {e}")
+
+    def invalidate(self, pattern: Union[str, Tuple]):
+        """
+        Remove do Redis as chaves do padrão e avisa os demais processos
+
+        Args:
+            pattern: Padrão no formato de CacheManager.invalidate_pattern
+        """
+        if isinstance(pattern, tuple):
+            exact = self.redis_key(pattern)
+            if exact is None:
+                self.clear()
+                return
+            match = exact.translate(_GLOB_CHARS) + ':*'
+        elif '*' in pattern or '?' in pattern or '[' in pattern:
+            exact, match = None, f'{REDIS_KEY_PREFIX}:{pattern}'
+        else:
+            exact, match = f'{REDIS_KEY_PREFIX}:{pattern}', None
+
+        try:
+            keys = [exact] if exact else []
+            if match:
+                keys.extend(self._client.scan_iter(match=match, count=SCAN_COUNT))
+            if keys:
+                self._client.unlink(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Erro ao invalidar padrão {pattern} no Redis: {e}")
+        self._publish({'op': 'pattern', 'pattern': list(pattern) if isinstance(pattern, tuple) else pattern})
+
+    def clear(self):
+        """Remove do Redis todas as chaves do cache e avisa os demais processos"""
+        try:
+            keys = list(self._client.scan_iter(match=f'{REDIS_KEY_PREFIX}:*', count=SCAN_COUNT))
+            if keys:
+                self._client.unlink(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Erro ao limpar o cache no Redis: {e}")
+        self._publish({'op': 'clear'})
+
+    def _publish(self, message: Dict[str, Any]):
+        """
+        Publica uma invalidação no canal compartilhado
+
+        Args:
+            message: Operação ('pattern' ou 'clear') e seus dados
+        """
+        message['origin'] = self._origin
+        try:
+            payload = orjson.dumps(message)
+        except TypeError:
+            # Segmentos não serializáveis: os demais processos limpam tudo
+            payload = orjson.dumps({'op': 'clear', 'origin': self._origin})
+        try:
+            self._client.publish(INVALIDATION_CHANNEL, payload)
+        except redis.RedisError as e:
+            logger.warning(f"Erro ao publicar invalidação no Redis: {e}")
+
+    def start_listener(self, on_pattern: Callable[[Union[str, Tuple]], None], on_clear: Callable[[], None]):
+        """
+        Inicia a thread que aplica localmente as invalidações dos demais processos
+
+        Args:
+            on_pattern: Invalida localmente um padrão
+            on_clear: Limpa o cache local
+        """
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(
+            target=self._listen, args=(on_pattern, on_clear),
+            name='cache-invalidation-listener', daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self, on_pattern: Callable[[Union[str, Tuple]], None], on_clear: Callable[[], None]):
+        """Laço da thread de invalidação; reconecta após falhas"""
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    data = orjson.loads(message['data'])
+                    if data.get('origin') == self._origin:
+                        continue
+                    if data.get('op') == 'pattern':
+                        pattern = data['pattern']
+                        if isinstance(pattern, list):
+                            if not all(isinstance(segment, (str, int)) for segment in pattern):
+                                on_clear()
+                                continue
+                            pattern = tuple(pattern)
+                        on_pattern(pattern)
+                    else:
+                        on_clear()
+            except Exception as e:
+                logger.warning(f"Assinatura de invalidações do cache interrompida: {e}")
+                # Invalidações podem ter sido perdidas enquanto desconectado
+                on_clear()
+                time.sleep(RESUBSCRIBE_DELAY)
+
+def create_backend() -> Optional[RedisBackend]:
+    """
+    Cria a camada Redis do cache, se configurada
+
+    Returns:
+        RedisBackend, ou None se REDIS_URL não estiver definida ou o pacote redis não estiver instalado
+    """
+    if not REDIS_URL:
+        return None
+    if not REDIS_AVAILABLE:
+        logger.warning("REDIS_URL definida, mas o pacote redis não está instalado - cache apenas em memória")
+        return None
+    return RedisBackend(REDIS_URL)
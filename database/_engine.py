@@ -0,0 +1,55 @@
+"""
+Configuração única do banco de dados SQL.
+
+Lê as variáveis de ambiente uma só vez e cria sob demanda o único engine e
+a única fábrica de sessões compartilhados por ``db.py`` e ``db_setup.py``.
+O SQLAlchemy só é importado quando o engine é realmente criado.
+"""
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente
+load_dotenv()
+
+# URL configurada no ambiente (None quando o SQL não está configurado)
+CONFIGURED_DATABASE_URL = os.getenv("DATABASE_URL")
+
+# URL efetiva do banco de dados
+DATABASE_URL = CONFIGURED_DATABASE_URL or "sqlite:///agentewhatsapp.db"
+
+# Configuração do pool de conexões (bancos diferentes de SQLite)
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 1800  # 30 minutos
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Retorna o motor do banco de dados, compartilhado por toda a aplicação"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    if DATABASE_URL.startswith("sqlite"):
+        return create_engine(
+            DATABASE_URL,
+            echo=False,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+    return create_engine(
+        DATABASE_URL,
+        echo=False,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+@lru_cache(maxsize=1)
+def get_session_factory():
+    """Retorna a fábrica de sessões (scoped_session) ligada ao motor compartilhado"""
+    from sqlalchemy.orm import sessionmaker, scoped_session
+
+    return scoped_session(sessionmaker(bind=get_engine()))
@@ -0,0 +1,136 @@
+"""
+Kernel Numba para contagem de palavras em grandes volumes de mensagens.
+
+Usado por ``get_trending_topics`` quando o período possui muitas mensagens.
+Se o Numba não estiver instalado, ``NUMBA_AVAILABLE`` fica False e a
+análise continua usando apenas pandas.
+"""
+from typing import List, Sequence, Tuple
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Tamanho de cada tabela hash por thread (potência de 2)
+TABLE_SIZE = 1 << 18
+
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+# Segundo byte UTF-8 (após 0xC3) das letras acentuadas aceitas por TOKEN_RE:
+# à á â ã ç é ê í ó ô õ ú ü
+_ACCENT_BYTES = np.zeros(256, dtype=np.bool_)
+for _char in 'àáâãçéêíóôõúü':
+    _ACCENT_BYTES[_char.encode('utf-8')[1]] = True
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def count_words(text_bytes, offsets, accent_bytes, n_chunks, table_size):
+        """
+        Conta palavras com 4 ou mais letras em cada documento de ``text_bytes``
+
+        Cada chunk de documentos usa sua própria tabela de endereçamento aberto
+        indexada pelo hash FNV-1a da palavra. Para cada entrada guarda também a
+        posição da primeira ocorrência, permitindo recuperar a palavra depois.
+
+        Returns:
+            Tupla (hashes, contagens, inícios, tamanhos) com uma linha por chunk
+        """
+        n_docs = offsets.size - 1
+        mask = np.uint64(table_size - 1)
+        hashes = np.zeros((n_chunks, table_size), np.uint64)
+        counts = np.zeros((n_chunks, table_size), np.int64)
+        starts = np.zeros((n_chunks, table_size), np.int64)
+        lengths = np.zeros((n_chunks, table_size), np.int64)
+        per_chunk = (n_docs + n_chunks - 1) // n_chunks
+
+        for c in prange(n_chunks):
+            lo = c * per_chunk
+            hi = min(n_docs, lo + per_chunk)
+            for d in range(lo, hi):
+                i = offsets[d]
+                end = offsets[d + 1]
+                while i < end:
+                    h = FNV_OFFSET
+                    start = i
+                    n_chars = 0
+                    while i < end:
+                        b = text_bytes[i]
+                        if b >= 97 and b <= 122:
+                            h = (h ^ np.uint64(b)) * FNV_PRIME
+                            i += 1
+                            n_chars += 1
+                        elif b == 0xC3 and i + 1 < end and accent_bytes[text_bytes[i + 1]]:
+                            h = (h ^ np.uint64(b)) * FNV_PRIME
+                            h = (h ^ np.uint64(text_bytes[i + 1])) * FNV_PRIME
+                            i += 2
+                            n_chars += 1
+                        else:
+                            break
+
+                    if n_chars >= 4:
+                        if h == 0:
+                            h = np.uint64(1)
+                        slot = h & mask
+                        for _ in range(table_size):
+                            if hashes[c, slot] == h:
+                                counts[c, slot] += 1
+                                break
+                            if hashes[c, slot] == 0:
+                                hashes[c, slot] = h
+                                counts[c, slot] = 1
+                                starts[c, slot] = start
+                                lengths[c, slot] = i - start
+                                break
+                            slot = (slot + np.uint64(1)) & mask
+
+                    if i == start:
+                        # Byte que não faz parte de palavra
+                        i += 1
+
+        return hashes, counts, starts, lengths
+
+
+def top_words(contents: Sequence[str], limit: int) -> List[Tuple[str, int]]:
+    """
+    Retorna as ``limit`` palavras mais frequentes nos textos informados
+
+    Args:
+        contents: Textos já convertidos para minúsculas
+        limit: Número máximo de palavras a retornar
+
+    Returns:
+        Lista de tuplas (palavra, frequência) em ordem decrescente
+    """
+    encoded = [content.encode('utf-8') for content in contents]
+    text_bytes = np.frombuffer(b'\x00'.join(encoded) + b'\x00', dtype=np.uint8)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.fromiter((len(b) + 1 for b in encoded), np.int64, len(encoded)))
+
+    n_chunks = max(1, min(get_num_threads(), len(encoded)))
+    hashes, counts, starts, lengths = count_words(
+        text_bytes, offsets, _ACCENT_BYTES, n_chunks, TABLE_SIZE
+    )
+
+    # Merge das tabelas de cada thread
+    used = hashes != 0
+    hashes, counts, starts, lengths = hashes[used], counts[used], starts[used], lengths[used]
+    if hashes.size == 0:
+        return []
+    unique_hashes, first_index, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    totals = np.bincount(inverse, weights=counts).astype(np.int64)
+
+    k = min(limit, totals.size)
+    top = np.argpartition(-totals, k - 1)[:k]
+    top = top[np.argsort(-totals[top], kind='stable')]
+
+    raw = text_bytes.tobytes()
+    result = []
+    for idx in top:
+        pos = first_index[idx]
+        word = raw[starts[pos]:starts[pos] + lengths[pos]].decode('utf-8')
+        result.append((word, int(totals[idx])))
+    return result
@@ -1,11 +1,120 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
 from firebase_admin import firestore
 from .firebase_db import get_firestore_db
+from .cache import cached
+from . import _topics_numba
 
 logger = logging.getLogger(__name__)
 
+# Palavras com 4 ou mais letras (inclui acentuação do português)
+TOKEN_RE = re.compile(r"[a-záéíóúãõâêôçàü]{4,}")
+
+# Palavras comuns do português ignoradas na identificação de tópicos
+STOPWORDS = frozenset({
+    'para', 'como', 'esta', 'este', 'isto', 'isso', 'esse', 'essa', 'esses', 'essas',
+    'aqui', 'mais', 'mesmo', 'mesma', 'muito', 'muita', 'muitos', 'muitas', 'pelo',
+    'pela', 'pelos', 'pelas', 'entre', 'quando', 'onde', 'qual', 'quais', 'porque',
+    'então', 'também', 'ainda', 'sobre', 'depois', 'antes', 'agora', 'nosso', 'nossa',
+    'você', 'vocês', 'dele', 'dela', 'deles', 'delas', 'eles', 'elas', 'seus', 'suas',
+    'minha', 'meus', 'minhas', 'tudo', 'todo', 'toda', 'todos', 'todas', 'cada',
+    'outro', 'outra', 'outros', 'outras', 'está', 'estão', 'estou', 'estava', 'estar',
+    'tenho', 'temos', 'tinha', 'pode', 'podem', 'poderia', 'fazer', 'seria', 'será',
+    'sido', 'foram', 'apenas', 'assim', 'nada', 'algum', 'alguma', 'pois'
+})
+
+# Timeout (segundos) para a leitura de cada página das consultas de análise
+STREAM_TIMEOUT = 300
+
+# Número de documentos lidos por página nas varreduras de análise
+FIRESTORE_PAGE_SIZE = 1000
+
+# Pool compartilhado para executar consultas de análise em paralelo
+ANALYTICS_MAX_WORKERS = 8
+_executor = ThreadPoolExecutor(max_workers=ANALYTICS_MAX_WORKERS, thread_name_prefix='analytics')
+
+# A partir deste volume de mensagens a contagem usa o kernel Numba
+NUMBA_MIN_MESSAGES = 200_000
+
+def _stream_pages(query) -> Iterator:
+    """
+    Percorre os documentos de uma consulta em páginas de FIRESTORE_PAGE_SIZE
+    
+    Cada página é uma requisição limitada com cursor no último documento lido,
+    evitando um único stream longo sujeito a timeout em varreduras grandes.
+    A projeção da consulta deve incluir o campo usado no filtro de intervalo,
+    pois o cursor depende dele.
+    
+    Args:
+        query: Consulta do Firestore
+        
+    Returns:
+        Iterador de documentos
+    """
+    last_doc = None
+    while True:
+        page_query = query.limit(FIRESTORE_PAGE_SIZE)
+        if last_doc is not None:
+            page_query = page_query.start_after(last_doc)
+        
+        docs = page_query.get(timeout=STREAM_TIMEOUT)
+        yield from docs
+        
+        if len(docs) < FIRESTORE_PAGE_SIZE:
+            return
+        last_doc = docs[-1]
+
+@cached(pattern='analytics:*')
+def _conversation_metrics(start_date: datetime, end_date: datetime) -> Dict:
+    """Calcula as métricas gerais das conversas; erros são propagados para não ficarem em cache"""
+    db = get_firestore_db()
+    
+    # Consulta conversas no período
+    conversations_ref = db.collection('conversas').where(
+        filter=firestore.FieldFilter('data_inicio', '>=', start_date)
+    ).where(
+        filter=firestore.FieldFilter('data_inicio', '<=', end_date)
+    ).select(['status', 'tempo_resposta', 'data_inicio'])
+    
+    total_conversas = 0
+    conversas_ativas = 0
+    conversas_finalizadas = 0
+    tempo_medio_resposta = 0
+    total_tempo_resposta = 0
+    contador_tempo_resposta = 0
+    
+    for doc in _stream_pages(conversations_ref):
+        data = doc.to_dict()
+        total_conversas += 1
+        
+        if data.get('status') == 'ativo':
+            conversas_ativas += 1
+        elif data.get('status') == 'finalizado':
+            conversas_finalizadas += 1
+            
+        # Calcular tempo médio de resposta
+        if 'tempo_resposta' in data:
+            total_tempo_resposta += data['tempo_resposta']
+            contador_tempo_resposta += 1
+    
+    if contador_tempo_resposta > 0:
+        tempo_medio_resposta = total_tempo_resposta / contador_tempo_resposta
+    
+    return {
+        'total_conversas': total_conversas,
+        'conversas_ativas': conversas_ativas,
+        'conversas_finalizadas': conversas_finalizadas,
+        'tempo_medio_resposta': tempo_medio_resposta,
+        'periodo': {
+            'inicio': start_date,
+            'fim': end_date
+        }
+    }
+
 def get_conversation_metrics(start_date: datetime, end_date: datetime) -> Dict:
     """
     Obtém métricas gerais das conversas em um período
@@ -18,53 +127,58 @@ def get_conversation_metrics(start_date: datetime, end_date: datetime) -> Dict:
         Dict com métricas das conversas
     """
     try:
-        db = get_firestore_db()
-        
-        # Consulta conversas no período
-        conversations_ref = db.collection('conversas').where(
-            filter=firestore.FieldFilter('data_inicio', '>=', start_date)
-        ).where(
-            filter=firestore.FieldFilter('data_inicio', '<=', end_date)
-        )
+        return _conversation_metrics(start_date, end_date)
+    except Exception as e:
+        logger.error(f"Erro ao calcular métricas de conversas: {e}")
+        return {}
+
+@cached(pattern='analytics:*')
+def _satisfaction_metrics(start_date: datetime, end_date: datetime) -> Dict:
+    """Calcula as métricas de satisfação; erros são propagados para não ficarem em cache"""
+    db = get_firestore_db()
+    
+    # Consulta avaliações no período
+    avaliacoes_ref = db.collection('avaliacoes').where(
+        filter=firestore.FieldFilter('data_criacao', '>=', start_date)
+    ).where(
+        filter=firestore.FieldFilter('data_criacao', '<=', end_date)
+    ).select(['nota', 'categoria', 'data_criacao'])
+    
+    total_avaliacoes = 0
+    soma_notas = 0
+    notas_por_categoria = {}
+    
+    for doc in _stream_pages(avaliacoes_ref):
+        data = doc.to_dict()
+        total_avaliacoes += 1
         
-        total_conversas = 0
-        conversas_ativas = 0
-        conversas_finalizadas = 0
-        tempo_medio_resposta = 0
-        total_tempo_resposta = 0
-        contador_tempo_resposta = 0
+        nota = data.get('nota', 0)
+        categoria = data.get('categoria', 'geral')
         
-        for doc in conversations_ref.stream():
-            data = doc.to_dict()
-            total_conversas += 1
-            
-            if data.get('status') == 'ativo':
-                conversas_ativas += 1
-            elif data.get('status') == 'finalizado':
-                conversas_finalizadas += 1
-                
-            # Calcular tempo médio de resposta
-            if 'tempo_resposta' in data:
-                total_tempo_resposta += data['tempo_resposta']
-                contador_tempo_resposta += 1
+        soma_notas += nota
         
-        if contador_tempo_resposta > 0:
-            tempo_medio_resposta = total_tempo_resposta / contador_tempo_resposta
+        if categoria not in notas_por_categoria:
+            notas_por_categoria[categoria] = {'total': 0, 'soma': 0}
         
-        return {
-            'total_conversas': total_conversas,
-            'conversas_ativas': conversas_ativas,
-            'conversas_finalizadas': conversas_finalizadas,
-            'tempo_medio_resposta': tempo_medio_resposta,
-            'periodo': {
-                'inicio': start_date,
-                'fim': end_date
-            }
+        notas_por_categoria[categoria]['total'] += 1
+        notas_por_categoria[categoria]['soma'] += nota
+    
+    # Calcular médias
+    media_geral = soma_notas / total_avaliacoes if total_avaliacoes > 0 else 0
+    
+    medias_por_categoria = {}
+    for categoria, dados in notas_por_categoria.items():
+        medias_por_categoria[categoria] = dados['soma'] / dados['total']
+    
+    return {
+        'total_avaliacoes': total_avaliacoes,
+        'media_geral': media_geral,
+        'medias_por_categoria': medias_por_categoria,
+        'periodo': {
+            'inicio': start_date,
+            'fim': end_date
         }
-        
-    except Exception as e:
-        logger.error(f"Erro ao calcular métricas de conversas: {e}")
-        return {}
+    }
 
 def get_satisfaction_metrics(start_date: datetime, end_date: datetime) -> Dict:
     """
@@ -78,55 +192,58 @@ def get_satisfaction_metrics(start_date: datetime, end_date: datetime) -> Dict:
         Dict com métricas de satisfação
     """
     try:
-        db = get_firestore_db()
-        
-        # Consulta avaliações no período
-        avaliacoes_ref = db.collection('avaliacoes').where(
-            filter=firestore.FieldFilter('data_criacao', '>=', start_date)
-        ).where(
-            filter=firestore.FieldFilter('data_criacao', '<=', end_date)
-        )
-        
-        total_avaliacoes = 0
-        soma_notas = 0
-        notas_por_categoria = {}
-        
-        for doc in avaliacoes_ref.stream():
-            data = doc.to_dict()
-            total_avaliacoes += 1
-            
-            nota = data.get('nota', 0)
-            categoria = data.get('categoria', 'geral')
-            
-            soma_notas += nota
-            
-            if categoria not in notas_por_categoria:
-                notas_por_categoria[categoria] = {'total': 0, 'soma': 0}
-            
-            notas_por_categoria[categoria]['total'] += 1
-            notas_por_categoria[categoria]['soma'] += nota
-        
-        # Calcular médias
-        media_geral = soma_notas / total_avaliacoes if total_avaliacoes > 0 else 0
-        
-        medias_por_categoria = {}
-        for categoria, dados in notas_por_categoria.items():
-            medias_por_categoria[categoria] = dados['soma'] / dados['total']
-        
-        return {
-            'total_avaliacoes': total_avaliacoes,
-            'media_geral': media_geral,
-            'medias_por_categoria': medias_por_categoria,
-            'periodo': {
-                'inicio': start_date,
-                'fim': end_date
-            }
-        }
-        
+        return _satisfaction_metrics(start_date, end_date)
     except Exception as e:
         logger.error(f"Erro ao calcular métricas de satisfação: {e}")
         return {}
 
+@cached(pattern='analytics:*')
+def _performance_metrics(start_date: datetime, end_date: datetime) -> Dict:
+    """Calcula as métricas de performance; erros são propagados para não ficarem em cache"""
+    db = get_firestore_db()
+    
+    # Consulta solicitações no período
+    solicitacoes_ref = db.collection('solicitacoes').where(
+        filter=firestore.FieldFilter('data_criacao', '>=', start_date)
+    ).where(
+        filter=firestore.FieldFilter('data_criacao', '<=', end_date)
+    ).select(['status', 'data_resolucao', 'data_criacao'])
+    
+    total_solicitacoes = 0
+    solicitacoes_resolvidas = 0
+    tempo_medio_resolucao = 0
+    total_tempo_resolucao = 0
+    contador_tempo_resolucao = 0
+    
+    for doc in _stream_pages(solicitacoes_ref):
+        data = doc.to_dict()
+        total_solicitacoes += 1
+        
+        if data.get('status') == 'resolvido':
+            solicitacoes_resolvidas += 1
+            
+            # Calcular tempo de resolução
+            if 'data_resolucao' in data and 'data_criacao' in data:
+                tempo_resolucao = (data['data_resolucao'] - data['data_criacao']).total_seconds()
+                total_tempo_resolucao += tempo_resolucao
+                contador_tempo_resolucao += 1
+    
+    if contador_tempo_resolucao > 0:
+        tempo_medio_resolucao = total_tempo_resolucao / contador_tempo_resolucao
+    
+    taxa_resolucao = (solicitacoes_resolvidas / total_solicitacoes * 100) if total_solicitacoes > 0 else 0
+    
+    return {
+        'total_solicitacoes': total_solicitacoes,
+        'solicitacoes_resolvidas': solicitacoes_resolvidas,
+        'taxa_resolucao': taxa_resolucao,
+        'tempo_medio_resolucao': tempo_medio_resolucao,
+        'periodo': {
+            'inicio': start_date,
+            'fim': end_date
+        }
+    }
+
 def get_performance_metrics(start_date: datetime, end_date: datetime) -> Dict:
     """
     Obtém métricas de performance do atendimento em um período
@@ -139,54 +256,46 @@ def get_performance_metrics(start_date: datetime, end_date: datetime) -> Dict:
         Dict com métricas de performance
     """
     try:
-        db = get_firestore_db()
-        
-        # Consulta solicitações no período
-        solicitacoes_ref = db.collection('solicitacoes').where(
-            filter=firestore.FieldFilter('data_criacao', '>=', start_date)
-        ).where(
-            filter=firestore.FieldFilter('data_criacao', '<=', end_date)
-        )
-        
-        total_solicitacoes = 0
-        solicitacoes_resolvidas = 0
-        tempo_medio_resolucao = 0
-        total_tempo_resolucao = 0
-        contador_tempo_resolucao = 0
-        
-        for doc in solicitacoes_ref.stream():
-            data = doc.to_dict()
-            total_solicitacoes += 1
-            
-            if data.get('status') == 'resolvido':
-                solicitacoes_resolvidas += 1
-                
-                # Calcular tempo de resolução
-                if 'data_resolucao' in data and 'data_criacao' in data:
-                    tempo_resolucao = (data['data_resolucao'] - data['data_criacao']).total_seconds()
-                    total_tempo_resolucao += tempo_resolucao
-                    contador_tempo_resolucao += 1
-        
-        if contador_tempo_resolucao > 0:
-            tempo_medio_resolucao = total_tempo_resolucao / contador_tempo_resolucao
-        
-        taxa_resolucao = (solicitacoes_resolvidas / total_solicitacoes * 100) if total_solicitacoes > 0 else 0
-        
-        return {
-            'total_solicitacoes': total_solicitacoes,
-            'solicitacoes_resolvidas': solicitacoes_resolvidas,
-            'taxa_resolucao': taxa_resolucao,
-            'tempo_medio_resolucao': tempo_medio_resolucao,
-            'periodo': {
-                'inicio': start_date,
-                'fim': end_date
-            }
-        }
-        
+        return _performance_metrics(start_date, end_date)
     except Exception as e:
         logger.error(f"Erro ao calcular métricas de performance: {e}")
         return {}
 
+@cached(pattern='analytics:*')
+def _trending_topics(start_date: datetime, end_date: datetime, limit: int = 10) -> List[Dict]:
+    """Conta os tópicos mais frequentes; erros são propagados para não ficarem em cache"""
+    db = get_firestore_db()
+    
+    # Consulta mensagens no período em todas as coleções 'mensagens',
+    # incluindo as subcoleções das conversas, em uma única varredura
+    messages_ref = db.collection_group('mensagens').where(
+        filter=firestore.FieldFilter('data_hora', '>=', start_date)
+    ).where(
+        filter=firestore.FieldFilter('data_hora', '<=', end_date)
+    ).select(['conteudo', 'data_hora'])
+    
+    # Carrega o conteúdo das mensagens em lote para tokenização vetorizada
+    contents = pd.Series(
+        [doc.to_dict().get('conteudo') or '' for doc in _stream_pages(messages_ref)],
+        dtype='string'
+    )
+    if contents.empty:
+        return []
+    
+    # TODO: Implementar análise de sentimento e extração de tópicos
+    # Por enquanto, apenas conta palavras simples
+    if _topics_numba.NUMBA_AVAILABLE and len(contents) >= NUMBA_MIN_MESSAGES:
+        # Busca candidatos extras para compensar as stopwords descartadas
+        top_words = _topics_numba.top_words(contents.str.lower().tolist(), limit + len(STOPWORDS))
+        top_words = [(topic, count) for topic, count in top_words if topic not in STOPWORDS]
+        return [{'topico': topic, 'frequencia': count} for topic, count in top_words[:limit]]
+    
+    tokens = contents.str.lower().str.findall(TOKEN_RE).explode().dropna()
+    tokens = tokens[~tokens.isin(STOPWORDS)]
+    top = tokens.value_counts(sort=False).nlargest(limit)
+    
+    return [{'topico': topic, 'frequencia': int(count)} for topic, count in top.items()]
+
 def get_trending_topics(start_date: datetime, end_date: datetime, limit: int = 10) -> List[Dict]:
     """
     Identifica os tópicos mais frequentes nas conversas em um período
@@ -200,37 +309,51 @@ def get_trending_topics(start_date: datetime, end_date: datetime, limit: int = 1
         Lista de tópicos mais frequentes
     """
     try:
-        db = get_firestore_db()
-        
-        # Consulta mensagens no período
-        messages_ref = db.collection('mensagens').where(
-            filter=firestore.FieldFilter('data_hora', '>=', start_date)
-        ).where(
-            filter=firestore.FieldFilter('data_hora', '<=', end_date)
-        )
-        
-        # Contagem de palavras-chave
-        keywords_count = {}
-        
-        for doc in messages_ref.stream():
-            data = doc.to_dict()
-            content = data.get('conteudo', '').lower()
-            
-            # TODO: Implementar análise de sentimento e extração de tópicos
-            # Por enquanto, apenas conta palavras simples
-            words = content.split()
-            for word in words:
-                if len(word) > 3:  # Ignora palavras muito curtas
-                    keywords_count[word] = keywords_count.get(word, 0) + 1
-        
-        # Ordenar e retornar os tópicos mais frequentes
-        sorted_topics = sorted(keywords_count.items(), key=lambda x: x[1], reverse=True)
-        return [{'topico': topic, 'frequencia': count} for topic, count in sorted_topics[:limit]]
-        
+        return _trending_topics(start_date, end_date, limit)
     except Exception as e:
         logger.error(f"Erro ao identificar tópicos em tendência: {e}")
         return []
 
+@cached(pattern='analytics:*')
+def _agent_performance(start_date: datetime, end_date: datetime) -> Dict:
+    """Calcula as métricas por atendente; erros são propagados para não ficarem em cache"""
+    db = get_firestore_db()
+    
+    # Consulta mensagens de atendentes no período, incluindo as subcoleções das conversas
+    messages_ref = db.collection_group('mensagens').where(
+        filter=firestore.FieldFilter('data_hora', '>=', start_date)
+    ).where(
+        filter=firestore.FieldFilter('data_hora', '<=', end_date)
+    ).where(
+        filter=firestore.FieldFilter('remetente_tipo', '==', 'atendente')
+    ).select(['atendente_id', 'tempo_resposta', 'data_hora'])
+    
+    rows = [
+        (data.get('atendente_id'), data.get('tempo_resposta'))
+        for data in (doc.to_dict() for doc in _stream_pages(messages_ref))
+    ]
+    
+    # Agregar por atendente: total de mensagens e média do tempo de resposta
+    agent_metrics = {}
+    if rows:
+        df = pd.DataFrame(rows, columns=['atendente_id', 'tempo_resposta'])
+        df['tempo_resposta'] = pd.to_numeric(df['tempo_resposta'], errors='coerce')
+        grouped = df.groupby('atendente_id', sort=False, dropna=False)['tempo_resposta'].agg(['size', 'mean'])
+        
+        for agent_id, total, mean in zip(grouped.index, grouped['size'], grouped['mean']):
+            agent_metrics[None if pd.isna(agent_id) else agent_id] = {
+                'total_mensagens': int(total),
+                'tempo_medio_resposta': 0 if pd.isna(mean) else float(mean)
+            }
+    
+    return {
+        'periodo': {
+            'inicio': start_date,
+            'fim': end_date
+        },
+        'atendentes': agent_metrics
+    }
+
 def get_agent_performance(start_date: datetime, end_date: datetime) -> Dict:
     """
     Obtém métricas de performance por atendente em um período
@@ -243,53 +366,47 @@ def get_agent_performance(start_date: datetime, end_date: datetime) -> Dict:
         Dict com métricas por atendente
     """
     try:
-        db = get_firestore_db()
-        
-        # Consulta mensagens de atendentes no período
-        messages_ref = db.collection('mensagens').where(
-            filter=firestore.FieldFilter('data_hora', '>=', start_date)
-        ).where(
-            filter=firestore.FieldFilter('data_hora', '<=', end_date)
-        ).where(
-            filter=firestore.FieldFilter('remetente_tipo', '==', 'atendente')
-        )
-        
-        agent_metrics = {}
-        
-        for doc in messages_ref.stream():
-            data = doc.to_dict()
-            agent_id = data.get('atendente_id')
-            
-            if agent_id not in agent_metrics:
-                agent_metrics[agent_id] = {
-                    'total_mensagens': 0,
-                    'tempo_medio_resposta': 0,
-                    'total_tempo_resposta': 0,
-                    'contador_tempo_resposta': 0
-                }
-            
-            agent_metrics[agent_id]['total_mensagens'] += 1
-            
-            # Calcular tempo de resposta
-            if 'tempo_resposta' in data:
-                agent_metrics[agent_id]['total_tempo_resposta'] += data['tempo_resposta']
-                agent_metrics[agent_id]['contador_tempo_resposta'] += 1
-        
-        # Calcular médias
-        for agent_id, metrics in agent_metrics.items():
-            if metrics['contador_tempo_resposta'] > 0:
-                metrics['tempo_medio_resposta'] = metrics['total_tempo_resposta'] / metrics['contador_tempo_resposta']
-            del metrics['total_tempo_resposta']
-            del metrics['contador_tempo_resposta']
-        
-        return {
-            'periodo': {
-                'inicio': start_date,
-                'fim': end_date
-            },
-            'atendentes': agent_metrics
-        }
-        
+        return _agent_performance(start_date, end_date)
     except Exception as e:
         logger.error(f"Erro ao calcular métricas de atendentes: {e}")
-        return {} 
\ No newline at end of file
+        return {}
+
+def get_dashboard_metrics(start_date: datetime, end_date: datetime) -> Dict:
+    """
+    Obtém todas as métricas de análise de um período em paralelo
+    
+    As consultas ao Firestore são independentes e liberam o GIL durante a
+    espera da rede, então o tempo total fica próximo da consulta mais lenta.
+    
+    Args:
+        start_date: Data inicial do período
+        end_date: Data final do período
+        
+    Returns:
+        Dict com as métricas de conversas, satisfação, performance,
+        tópicos em tendência e atendentes
+    """
+    tasks = {
+        'conversas': get_conversation_metrics,
+        'satisfacao': get_satisfaction_metrics,
+        'performance': get_performance_metrics,
+        'topicos_tendencia': get_trending_topics,
+        'atendentes': get_agent_performance
+    }
+    
+    futures = {
+        _executor.submit(func, start_date, end_date): name
+        for name, func in tasks.items()
+    }
+    
+    metrics = {}
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            metrics[name] = future.result()
+        except Exception as e:
+            logger.error(f"Erro ao calcular métricas de {name}: {e}")
+            metrics[name] = [] if name == 'topicos_tendencia' else {}
+    
+    # Mantém a ordem das seções independente da ordem de conclusão
+    return {name: metrics[name] for name in tasks}
@@ -1,11 +1,16 @@
 import os
-import json
+import base64
 import logging
+import time
 import jwt
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import orjson
+from cryptography.hazmat.primitives import hashes, hmac
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+from typing import Dict, Optional, Tuple
 from functools import wraps
-from flask import request, jsonify
+from flask import request
 from firebase_admin import auth as firebase_auth
 from .firebase_db import init_firebase
 
@@ -15,12 +20,76 @@ logger = logging.getLogger(__name__)
 # Inicializa o Firebase
 init_firebase()
 
+# Número máximo de tokens verificados mantidos em cache
+TOKEN_CACHE_SIZE = 4096
+
+# Respostas de erro do require_auth (o Flask serializa dicts como JSON)
+TOKEN_MISSING_RESPONSE = ({'error': 'Token não fornecido'}, 401)
+TOKEN_INVALID_RESPONSE = ({'error': 'Token inválido'}, 401)
+ACCESS_DENIED_RESPONSE = ({'error': 'Acesso negado'}, 403)
+
+# Validade dos tokens criados, em segundos
+TOKEN_TTL = int(timedelta(days=1).total_seconds())
+
+def _b64url_encode(data: bytes) -> bytes:
+    """Codifica em base64url sem padding, como exigido pelo JWT"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
 class AuthManager:
     def __init__(self):
         """Inicializa o gerenciador de autenticação"""
         self.secret_key = os.getenv('JWT_SECRET_KEY')
         if not self.secret_key:
             raise ValueError("JWT_SECRET_KEY não configurada")
+        
+        # Chave HMAC e cabeçalho HS256 fixo, pré-computados para create_token
+        self._hmac_key = self.secret_key.encode('utf-8')
+        self._header_b64 = _b64url_encode(orjson.dumps({'alg': 'HS256', 'typ': 'JWT'}))
+        
+        # Cache de tokens já verificados: token -> (exp, payload)
+        self._token_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._firebase_token_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._cache_lock = Lock()
+    
+    def _get_cached_token(self, cache: OrderedDict, token: str) -> Optional[Dict]:
+        """
+        Obtém o payload de um token verificado anteriormente
+        
+        Args:
+            cache: Cache de tokens
+            token: Token
+            
+        Returns:
+            Payload do token ou None se ausente ou expirado
+        """
+        with self._cache_lock:
+            entry = cache.get(token)
+            if entry is None:
+                return None
+            exp, payload = entry
+            if exp <= time.time():
+                del cache[token]
+                return None
+            cache.move_to_end(token)
+            return payload
+    
+    def _cache_token(self, cache: OrderedDict, token: str, payload: Dict):
+        """
+        Armazena o payload de um token verificado até sua expiração
+        
+        Args:
+            cache: Cache de tokens
+            token: Token
+            payload: Payload decodificado
+        """
+        exp = payload.get('exp')
+        if not isinstance(exp, (int, float)):
+            return
+        with self._cache_lock:
+            cache[token] = (exp, payload)
+            cache.move_to_end(token)
+            if len(cache) > TOKEN_CACHE_SIZE:
+                cache.popitem(last=False)
     
     def create_token(self, user_id: str, roles: list = None) -> str:
         """
@@ -37,9 +106,15 @@ class AuthManager:
             payload = {
                 'user_id': user_id,
                 'roles': roles or [],
-                'exp': datetime.utcnow() + timedelta(days=1)
+                'exp': int(time.time()) + TOKEN_TTL
             }
-            return jwt.encode(payload, self.secret_key, algorithm='HS256')
+            signing_input = self._header_b64 + b'.' + _b64url_encode(orjson.dumps(payload))
+            
+            signer = hmac.HMAC(self._hmac_key, hashes.SHA256())
+            signer.update(signing_input)
+            signature = _b64url_encode(signer.finalize())
+            
+            return (signing_input + b'.' + signature).decode('ascii')
         except Exception as e:
             logger.error(f"Erro ao criar token: {e}")
             raise
@@ -54,8 +129,13 @@ class AuthManager:
         Returns:
             Payload do token ou None se inválido
         """
+        cached_payload = self._get_cached_token(self._token_cache, token)
+        if cached_payload is not None:
+            return cached_payload
+        
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=['HS256'])
+            self._cache_token(self._token_cache, token, payload)
             return payload
         except jwt.ExpiredSignatureError:
             logger.warning("Token expirado")
@@ -77,8 +157,13 @@ class AuthManager:
         Returns:
             Dados do usuário ou None se inválido
         """
+        cached_token = self._get_cached_token(self._firebase_token_cache, token)
+        if cached_token is not None:
+            return cached_token
+        
         try:
             decoded_token = firebase_auth.verify_id_token(token)
+            self._cache_token(self._firebase_token_cache, token, decoded_token)
             return decoded_token
         except Exception as e:
             logger.error(f"Erro ao verificar token do Firebase: {e}")
@@ -108,28 +193,30 @@ class AuthManager:
         Args:
             roles: Lista de papéis requeridos
         """
+        # Papéis requeridos calculados uma única vez, na decoração
+        required_roles = frozenset(roles) if roles else None
+        verify_token = self.verify_token
+        
         def decorator(func):
             @wraps(func)
             def wrapper(*args, **kwargs):
                 # Obtém o token do cabeçalho
                 token = request.headers.get('Authorization')
                 if not token:
-                    return jsonify({'error': 'Token não fornecido'}), 401
+                    return TOKEN_MISSING_RESPONSE
                 
                 # Remove o prefixo 'Bearer ' se presente
-                if token.startswith('Bearer '):
+                if token[:7] == 'Bearer ':
                     token = token[7:]
                 
                 # Verifica o token
-                payload = self.verify_token(token)
+                payload = verify_token(token)
                 if not payload:
-                    return jsonify({'error': 'Token inválido'}), 401
+                    return TOKEN_INVALID_RESPONSE
                 
                 # Verifica os papéis
-                if roles:
-                    user_roles = payload.get('roles', [])
-                    if not any(role in user_roles for role in roles):
-                        return jsonify({'error': 'Acesso negado'}), 403
+                if required_roles is not None and required_roles.isdisjoint(payload.get('roles', ())):
+                    return ACCESS_DENIED_RESPONSE
                 
                 # Adiciona o payload ao contexto da requisição
                 request.user = payload
@@ -1,15 +1,46 @@
+import io
 import os
-import json
 import logging
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
+import orjson
+import zstandard as zstd
 import firebase_admin
-from firebase_admin import firestore, storage
-from .firebase_db import get_firestore_db
+from firebase_admin import firestore
+from google.cloud.storage import transfer_manager
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+from .firebase_db import get_firestore_db, get_storage_bucket
 
 logger = logging.getLogger(__name__)
 
+# Número máximo de coleções processadas em paralelo
+BACKUP_MAX_WORKERS = 8
+
+# Nível de compressão zstd dos arquivos de coleção
+ZSTD_LEVEL = 3
+
+# Número de conexões simultâneas nas transferências do Storage
+STORAGE_TRANSFER_WORKERS = 16
+STORAGE_DELETE_WORKERS = 32
+
+# Tamanho dos blocos de upload resumível para arquivos grandes
+STORAGE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Configuração do BulkWriter usado na restauração
+RESTORE_OPS_PER_SECOND = 500
+RESTORE_MAX_ATTEMPTS = 15
+# Códigos gRPC considerados transitórios: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED,
+# ABORTED, INTERNAL e UNAVAILABLE
+RETRYABLE_WRITE_CODES = frozenset({4, 8, 10, 13, 14})
+
+def _json_default(value: Any) -> str:
+    """Serializa tipos do Firestore não suportados nativamente pelo orjson"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
 class BackupManager:
     def __init__(self, backup_dir: str = 'backups'):
         """
@@ -20,7 +51,7 @@ class BackupManager:
         """
         self.backup_dir = backup_dir
         self.db = get_firestore_db()
-        self.bucket = storage.bucket()
+        self.bucket = get_storage_bucket()
         
         # Criar diretório de backup se não existir
         os.makedirs(backup_dir, exist_ok=True)
@@ -56,20 +87,18 @@ class BackupManager:
             }
             
             # Salvar metadados do backup
-            with open(os.path.join(backup_path, 'metadata.json'), 'w') as f:
-                json.dump(backup_data, f, indent=2)
+            self._write_json(os.path.join(backup_path, 'metadata.json'), backup_data)
             
-            # Fazer backup de cada coleção
-            for collection in collections:
-                self._backup_collection(collection, backup_path)
+            # Fazer backup das coleções em paralelo
+            with ThreadPoolExecutor(max_workers=min(BACKUP_MAX_WORKERS, len(collections) or 1)) as executor:
+                list(executor.map(lambda c: self._backup_collection(c, backup_path), collections))
             
             # Fazer backup de arquivos do Storage
             self._backup_storage(backup_path)
             
             # Atualizar status do backup
             backup_data['status'] = 'concluido'
-            with open(os.path.join(backup_path, 'metadata.json'), 'w') as f:
-                json.dump(backup_data, f, indent=2)
+            self._write_json(os.path.join(backup_path, 'metadata.json'), backup_data)
             
             # Upload do backup para o Firebase Storage
             self._upload_backup(backup_path)
@@ -81,6 +110,19 @@ class BackupManager:
             logger.error(f"Erro ao criar backup: {e}")
             raise
     
+    @staticmethod
+    def _write_json(path: str, data: Any):
+        """
+        Grava dados em um arquivo JSON usando orjson
+        
+        Args:
+            path: Caminho do arquivo
+            data: Dados a serem gravados
+        """
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, default=_json_default,
+                                 option=orjson.OPT_NAIVE_UTC | orjson.OPT_INDENT_2))
+    
     def _backup_collection(self, collection_name: str, backup_path: str):
         """
         Faz backup de uma coleção específica
@@ -90,18 +132,17 @@ class BackupManager:
             backup_path: Caminho do backup
         """
         try:
-            collection_path = os.path.join(backup_path, f"{collection_name}.json")
-            docs = []
-            
-            # Obter todos os documentos da coleção
-            for doc in self.db.collection(collection_name).stream():
-                doc_data = doc.to_dict()
-                doc_data['id'] = doc.id
-                docs.append(doc_data)
-            
-            # Salvar documentos em arquivo JSON
-            with open(collection_path, 'w') as f:
-                json.dump(docs, f, indent=2)
+            collection_path = os.path.join(backup_path, f"{collection_name}.jsonl.zst")
+            compressor = zstd.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+            
+            # Gravar um documento por linha (JSON Lines) à medida que chegam,
+            # mantendo apenas um documento em memória
+            with open(collection_path, 'wb') as f, compressor.stream_writer(f) as writer:
+                for doc in self.db.collection(collection_name).stream():
+                    doc_data = doc.to_dict()
+                    doc_data['id'] = doc.id
+                    writer.write(orjson.dumps(doc_data, default=_json_default,
+                                              option=orjson.OPT_NAIVE_UTC | orjson.OPT_APPEND_NEWLINE))
                 
             logger.info(f"Coleção {collection_name} backup concluído")
             
@@ -120,20 +161,21 @@ class BackupManager:
             storage_path = os.path.join(backup_path, 'storage')
             os.makedirs(storage_path, exist_ok=True)
             
-            # Listar todos os arquivos do bucket
-            blobs = self.bucket.list_blobs()
-            
-            for blob in blobs:
-                # Ignorar backups anteriores
-                if blob.name.startswith('backups/'):
-                    continue
-                    
-                # Criar diretório se necessário
-                file_path = os.path.join(storage_path, blob.name)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                
-                # Download do arquivo
-                blob.download_to_filename(file_path)
+            # Listar todos os arquivos do bucket, ignorando backups anteriores
+            blob_names = [
+                blob.name for blob in self.bucket.list_blobs()
+                if not blob.name.startswith('backups/')
+            ]
+            
+            # Download dos arquivos em paralelo
+            transfer_manager.download_many_to_path(
+                self.bucket,
+                blob_names,
+                destination_directory=storage_path,
+                worker_type=transfer_manager.THREAD,
+                max_workers=STORAGE_TRANSFER_WORKERS,
+                raise_exception=True
+            )
                 
             logger.info("Backup do Storage concluído")
             
@@ -152,15 +194,17 @@ class BackupManager:
             backup_id = os.path.basename(backup_path)
             storage_path = f"backups/{backup_id}"
             
-            # Upload de cada arquivo
-            for root, _, files in os.walk(backup_path):
-                for file in files:
-                    local_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(local_path, backup_path)
-                    blob_path = f"{storage_path}/{relative_path}"
-                    
-                    blob = self.bucket.blob(blob_path)
-                    blob.upload_from_filename(local_path)
+            # Upload dos arquivos em paralelo
+            transfer_manager.upload_many_from_filenames(
+                self.bucket,
+                self._list_local_files(backup_path),
+                source_directory=backup_path,
+                blob_name_prefix=f"{storage_path}/",
+                blob_constructor_kwargs={'chunk_size': STORAGE_CHUNK_SIZE},
+                worker_type=transfer_manager.THREAD,
+                max_workers=STORAGE_TRANSFER_WORKERS,
+                raise_exception=True
+            )
             
             logger.info(f"Backup {backup_id} enviado para o Storage")
             
@@ -168,6 +212,28 @@ class BackupManager:
             logger.error(f"Erro ao fazer upload do backup: {e}")
             raise
     
+    @staticmethod
+    def _list_local_files(base_path: str) -> List[str]:
+        """
+        Lista os arquivos de um diretório local, relativos a ele
+        
+        Args:
+            base_path: Diretório base
+            
+        Returns:
+            Lista de caminhos relativos
+        """
+        def iter_files(path: str, relative: str):
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = f"{relative}{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from iter_files(entry.path, f"{name}/")
+                    else:
+                        yield name
+        
+        return list(iter_files(base_path, ''))
+    
     def restore_backup(self, backup_id: str):
         """
         Restaura um backup específico
@@ -185,8 +251,8 @@ class BackupManager:
             if not os.path.exists(metadata_path):
                 raise ValueError(f"Metadados do backup {backup_id} não encontrados")
             
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
+            with open(metadata_path, 'rb') as f:
+                metadata = orjson.loads(f.read())
             
             # Restaurar cada coleção
             for collection in metadata['collections']:
@@ -213,16 +279,21 @@ class BackupManager:
             storage_path = f"backups/{backup_id}"
             
             # Listar arquivos do backup
-            blobs = self.bucket.list_blobs(prefix=storage_path)
-            
-            for blob in blobs:
-                # Criar diretório se necessário
-                relative_path = os.path.relpath(blob.name, storage_path)
-                file_path = os.path.join(backup_path, relative_path)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                
-                # Download do arquivo
-                blob.download_to_filename(file_path)
+            blob_names = [
+                os.path.relpath(blob.name, storage_path)
+                for blob in self.bucket.list_blobs(prefix=storage_path)
+            ]
+            
+            # Download dos arquivos em paralelo
+            transfer_manager.download_many_to_path(
+                self.bucket,
+                blob_names,
+                destination_directory=backup_path,
+                blob_name_prefix=f"{storage_path}/",
+                worker_type=transfer_manager.THREAD,
+                max_workers=STORAGE_TRANSFER_WORKERS,
+                raise_exception=True
+            )
             
             logger.info(f"Backup {backup_id} baixado com sucesso")
             
@@ -230,6 +301,48 @@ class BackupManager:
             logger.error(f"Erro ao baixar backup: {e}")
             raise
     
+    def _read_collection_backup(self, collection_name: str, backup_path: str) -> Optional[Iterator[Dict]]:
+        """
+        Lê os documentos do backup de uma coleção
+        
+        Backups em JSON Lines (comprimidos com zstd ou não) são lidos linha a
+        linha; backups antigos em um único arquivo JSON continuam suportados.
+        
+        Args:
+            collection_name: Nome da coleção
+            backup_path: Caminho do backup
+            
+        Returns:
+            Iterador de documentos ou None se não houver arquivo de backup
+        """
+        zst_path = os.path.join(backup_path, f"{collection_name}.jsonl.zst")
+        jsonl_path = os.path.join(backup_path, f"{collection_name}.jsonl")
+        json_path = os.path.join(backup_path, f"{collection_name}.json")
+        
+        def read_lines(lines):
+            for line in lines:
+                if line.strip():
+                    yield orjson.loads(line)
+        
+        if os.path.exists(zst_path):
+            def read_compressed():
+                with open(zst_path, 'rb') as f:
+                    reader = zstd.ZstdDecompressor().stream_reader(f)
+                    yield from read_lines(io.BufferedReader(reader))
+            return read_compressed()
+        
+        if os.path.exists(jsonl_path):
+            def read_plain():
+                with open(jsonl_path, 'rb') as f:
+                    yield from read_lines(f)
+            return read_plain()
+        
+        if os.path.exists(json_path):
+            with open(json_path, 'rb') as f:
+                return iter(orjson.loads(f.read()))
+        
+        return None
+    
     def _restore_collection(self, collection_name: str, backup_path: str):
         """
         Restaura uma coleção específica
@@ -239,34 +352,37 @@ class BackupManager:
             backup_path: Caminho do backup
         """
         try:
-            collection_path = os.path.join(backup_path, f"{collection_name}.json")
+            docs = self._read_collection_backup(collection_name, backup_path)
             
-            if not os.path.exists(collection_path):
+            if docs is None:
                 logger.warning(f"Arquivo de backup para coleção {collection_name} não encontrado")
                 return
             
-            # Ler documentos do backup
-            with open(collection_path, 'r') as f:
-                docs = json.load(f)
+            # Restaurar documentos com escrita em lote paralela
+            failures = []
+            
+            def on_write_error(error, bulk_writer) -> bool:
+                if error.code in RETRYABLE_WRITE_CODES and error.attempts < RESTORE_MAX_ATTEMPTS:
+                    return True
+                failures.append(error)
+                return False
             
-            # Restaurar documentos
-            batch = self.db.batch()
-            batch_size = 0
-            max_batch_size = 500
+            bulk_writer = self.db.bulk_writer(
+                BulkWriterOptions(initial_ops_per_second=RESTORE_OPS_PER_SECOND)
+            )
+            bulk_writer.on_write_error(on_write_error)
             
+            collection_ref = self.db.collection(collection_name)
             for doc in docs:
                 doc_id = doc.pop('id')
-                doc_ref = self.db.collection(collection_name).document(doc_id)
-                batch.set(doc_ref, doc)
-                batch_size += 1
-                
-                if batch_size >= max_batch_size:
-                    batch.commit()
-                    batch = self.db.batch()
-                    batch_size = 0
+                bulk_writer.set(collection_ref.document(doc_id), doc)
             
-            if batch_size > 0:
-                batch.commit()
+            bulk_writer.close()
+            
+            if failures:
+                raise RuntimeError(
+                    f"{len(failures)} documentos não puderam ser restaurados: {failures[0].message}"
+                )
             
             logger.info(f"Coleção {collection_name} restaurada com sucesso")
             
@@ -288,14 +404,16 @@ class BackupManager:
                 logger.warning("Diretório de backup do Storage não encontrado")
                 return
             
-            # Upload de cada arquivo
-            for root, _, files in os.walk(storage_path):
-                for file in files:
-                    local_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(local_path, storage_path)
-                    
-                    blob = self.bucket.blob(relative_path)
-                    blob.upload_from_filename(local_path)
+            # Upload dos arquivos em paralelo
+            transfer_manager.upload_many_from_filenames(
+                self.bucket,
+                self._list_local_files(storage_path),
+                source_directory=storage_path,
+                blob_constructor_kwargs={'chunk_size': STORAGE_CHUNK_SIZE},
+                worker_type=transfer_manager.THREAD,
+                max_workers=STORAGE_TRANSFER_WORKERS,
+                raise_exception=True
+            )
             
             logger.info("Storage restaurado com sucesso")
             
@@ -311,23 +429,20 @@ class BackupManager:
             Lista de backups
         """
         try:
-            backups = []
-            
-            # Listar backups do Storage
-            blobs = self.bucket.list_blobs(prefix='backups/')
-            backup_dirs = set()
-            
-            for blob in blobs:
-                backup_id = blob.name.split('/')[1]
-                backup_dirs.add(backup_id)
-            
-            # Obter metadados de cada backup
-            for backup_id in backup_dirs:
-                metadata_blob = self.bucket.blob(f"backups/{backup_id}/metadata.json")
-                
-                if metadata_blob.exists():
-                    metadata = json.loads(metadata_blob.download_as_text())
-                    backups.append(metadata)
+            # Listar apenas os metadados dos backups; a listagem já confirma
+            # a existência de cada arquivo
+            metadata_blobs = [
+                blob for blob in self.bucket.list_blobs(
+                    prefix='backups/', match_glob='backups/*/metadata.json'
+                )
+                if blob.name.count('/') == 2
+            ]
+            
+            # Download dos metadados em paralelo
+            with ThreadPoolExecutor(max_workers=STORAGE_TRANSFER_WORKERS) as executor:
+                backups = list(executor.map(
+                    lambda blob: orjson.loads(blob.download_as_bytes()), metadata_blobs
+                ))
             
             return sorted(backups, key=lambda x: x['timestamp'], reverse=True)
             
@@ -346,11 +461,11 @@ class BackupManager:
             bool: True se deletado com sucesso
         """
         try:
-            # Deletar do Storage
-            blobs = self.bucket.list_blobs(prefix=f"backups/{backup_id}")
+            # Deletar do Storage em paralelo
+            blobs = list(self.bucket.list_blobs(prefix=f"backups/{backup_id}/"))
             
-            for blob in blobs:
-                blob.delete()
+            with ThreadPoolExecutor(max_workers=STORAGE_DELETE_WORKERS) as executor:
+                list(executor.map(lambda blob: blob.delete(), blobs))
             
             # Deletar localmente
             backup_path = os.path.join(self.backup_dir, backup_id)
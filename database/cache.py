@@ -1,34 +1,242 @@
-from functools import lru_cache, wraps
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Callable
+import fnmatch
+import heapq
+import itertools
+import math
+import re
+import time
+import threading
+from contextlib import contextmanager
+from functools import lru_cache, wraps, _make_key
+from typing import Dict, Hashable, Iterable, List, Optional, Any, Callable, Set, Tuple, Union
 import logging
 from firebase_admin import firestore
-from collections import defaultdict
+from collections import Counter, deque
+from cachetools import TTLCache
+from ._cache_redis import RedisBackend, create_backend
 
 logger = logging.getLogger(__name__)
 
+# Número de locks (potência de 2) que protegem as chaves do cache
+LOCK_STRIPES = 16
+
+# Separador dos segmentos das chaves indexadas na trie de invalidação
+KEY_SEPARATOR = ':'
+
+# v-LRU: fração das entradas menos recentes avaliadas em cada evicção
+VLRU_SAMPLE_RATIO = 0.1
+# v-LRU: constante δ do score e_i = log(v_i + h_i + δ)
+VLRU_DELTA = 1e-6
+
+# Permite padrões glob que a trie não resolve ('conversation:*:messages',
+# 'user:?'), com varredura das chaves do cache
+ENABLE_GLOB_INVALIDATION = True
+
+# A cada quantas leituras as entradas expiradas são removidas do cache
+SWEEP_INTERVAL = 64
+
+# Caminho de uma chave na trie: segmentos de uma string separados por ':' ou
+# os próprios elementos de uma chave tupla
+KeyPath = Tuple[Hashable, ...]
+
+class RadixNode:
+    """Nó da trie de chaves do cache, indexada pelos segmentos de cada chave"""
+    __slots__ = ('children', 'leaf_keys')
+    
+    def __init__(self):
+        self.children: Dict[Hashable, 'RadixNode'] = {}
+        self.leaf_keys: Set[Hashable] = set()
+        
+    def collect_keys(self) -> List[Hashable]:
+        """
+        Coleta as chaves de toda a subárvore
+        
+        Returns:
+            Lista de chaves do nó e de seus descendentes
+        """
+        keys = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            keys.extend(node.leaf_keys)
+            stack.extend(node.children.values())
+        return keys
+
+class _TTLStore(TTLCache):
+    """
+    TTLCache com evicção v-LRU que avisa o CacheManager sobre chaves removidas
+    
+    Ao encher, em vez de descartar sempre a entrada menos recente, avalia as
+    VLRU_SAMPLE_RATIO entradas menos recentes e remove a de menor score
+    e_i = log(v_i + h_i + δ), onde v_i é o peso informado no set e h_i o
+    número de acertos da chave. Assim uma entrada antiga mas valiosa não é
+    descartada só por ter sido inserida um instante antes.
+    
+    Entradas expiradas ficam na lista do TTLCache ordenada por prazo; expire()
+    remove a partir do início dela e é chamado em cada escrita e, pelo
+    CacheManager, a cada SWEEP_INTERVAL leituras.
+    """
+    
+    def __init__(self, maxsize: int, ttl: int, hit_counts: Counter,
+                 on_evict: Callable[[Hashable], None], on_expire: Callable[[Hashable], None]):
+        super().__init__(maxsize, ttl, timer=time.monotonic)
+        self._hit_counts = hit_counts
+        self._on_evict = on_evict
+        self._on_expire = on_expire
+        # Chave -> ordem do último acesso e chave -> peso (apenas pesos != 1.0)
+        self._last_access: Dict[Hashable, int] = {}
+        self._weights: Dict[Hashable, float] = {}
+        self._tick = itertools.count()
+        
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self._last_access[key] = next(self._tick)
+        return value
+        
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._last_access[key] = next(self._tick)
+        
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._last_access.pop(key, None)
+        self._weights.pop(key, None)
+        
+    def get(self, key, default=None):
+        # Uma única busca (com verificação de expiração) em vez de
+        # ``key in self`` seguido de ``self[key]`` como em Cache.get
+        try:
+            return self[key]
+        except KeyError:
+            return default
+            
+    def set_weight(self, key: Hashable, weight: float):
+        """
+        Define o valor de manter a chave em cache (v_i do v-LRU)
+        
+        Args:
+            key: Chave do cache
+            weight: Peso da entrada (1.0 é o padrão)
+        """
+        if weight == 1.0:
+            self._weights.pop(key, None)
+        else:
+            self._weights[key] = weight
+            
+    def _eviction_score(self, key: Hashable) -> float:
+        return math.log(self._weights.get(key, 1.0) + self._hit_counts.get(key, 0) + VLRU_DELTA)
+        
+    def popitem(self):
+        self.expire()
+        if not self._last_access:
+            raise KeyError('%s is empty' % type(self).__name__)
+            
+        sample_size = int(self.maxsize * VLRU_SAMPLE_RATIO) + 1
+        candidates = heapq.nsmallest(sample_size, self._last_access, key=self._last_access.__getitem__)
+        key = min(candidates, key=self._eviction_score)
+        value = self.pop(key)
+        self._on_evict(key)
+        return key, value
+        
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, _ in expired:
+            self._last_access.pop(key, None)
+            self._weights.pop(key, None)
+            self._on_expire(key)
+        return expired
+
+# Marcador para diferenciar chave ausente de valor None
+_MISSING = object()
+
+@lru_cache(maxsize=256)
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """Compila um padrão glob uma única vez (registro limitado por LRU)"""
+    return re.compile(fnmatch.translate(pattern))
+
+def _is_glob_pattern(pattern: Union[str, Tuple]) -> bool:
+    """Indica se o padrão usa glob além de um '*' final, exigindo varredura"""
+    return isinstance(pattern, str) and (
+        '*' in pattern[:-1] or '?' in pattern or '[' in pattern
+    )
+
+class _MetricCounter:
+    """
+    Contador de métricas sem lock
+    
+    O incremento usa next() em itertools.count, atômico em C. O valor lido é o
+    último devolvido por next(); sob concorrência pode ficar alguns passos
+    atrás até o próximo incremento.
+    """
+    __slots__ = ('_count', 'value')
+    
+    def __init__(self):
+        self._count = itertools.count(1)
+        self.value = 0
+        
+    def incr(self):
+        """Soma 1 ao contador"""
+        self.value = next(self._count)
+        
+    def add(self, n: int):
+        """Soma n ao contador, sem laço em Python"""
+        last = deque(itertools.islice(self._count, n), maxlen=1)
+        if last:
+            self.value = last[0]
+
 class CacheManager:
-    def __init__(self, maxsize: int = 1000, ttl: int = 300):
+    def __init__(self, maxsize: int = 1000, ttl: int = 300, backend: Optional[RedisBackend] = None):
         """
         Inicializa o gerenciador de cache
         
         Args:
             maxsize: Tamanho máximo do cache
             ttl: Time To Live em segundos
+            backend: Camada Redis compartilhada entre processos (opcional); o
+                cache em memória continua sendo consultado primeiro
         """
         self.maxsize = maxsize
         self.ttl = ttl
-        self._cache = {}
-        self._timestamps = {}
+        self._backend = backend
+        # Número de acertos por chave presente no cache
+        self._hit_counts: Counter = Counter()
+        # Cache com expiração (cachetools) e evicção v-LRU, usando relógio monotônico
+        self._cache = self._new_store()
+        # Contadores de métricas, incrementados sem lock
         self._metrics = {
-            'hits': 0,
-            'misses': 0,
-            'evictions': 0,
-            'invalidations': 0
+            'hits': _MetricCounter(),
+            'misses': _MetricCounter(),
+            'evictions': _MetricCounter(),
+            'invalidations': _MetricCounter()
         }
-        self._pattern_cache = defaultdict(set)
+        self._hits = self._metrics['hits']
+        self._misses = self._metrics['misses']
+        # Contador de leituras para a varredura periódica de expirados
+        self._reads = itertools.count(1)
+        # Trie de segmentos das chaves: invalidar 'conversation:*' remove uma
+        # única subárvore em vez de percorrer todas as chaves
+        self._trie = RadixNode()
+        self._trie_lock = threading.Lock()
+        # Os containers do cachetools não são thread-safe: cada operação em
+        # _cache é feita sob _store_lock, mantido só durante a operação.
+        # Os locks em faixas serializam a sequência verificar-e-alterar de
+        # cada chave, de modo que chaves independentes não se bloqueiam.
+        # Os contadores de métricas são atualizados sem lock e podem ser
+        # aproximados sob concorrência.
+        self._store_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # Locks por chave para que apenas um chamador recalcule um valor ausente
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # Invalidações feitas por outros processos chegam pelo Redis
+        if backend is not None:
+            backend.start_listener(self._invalidate_local, self._clear_local)
+        
+    def _new_store(self) -> _TTLStore:
+        """Cria o armazenamento LRU/TTL do cache"""
+        return _TTLStore(self.maxsize, self.ttl, self._hit_counts,
+                         on_evict=self._on_evict, on_expire=self._forget)
         
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: Hashable) -> Optional[Any]:
         """
         Obtém um valor do cache
         
@@ -38,150 +246,584 @@ class CacheManager:
         Returns:
             Valor armazenado ou None se expirado/não encontrado
         """
-        if key not in self._cache:
-            self._metrics['misses'] += 1
-            return None
-            
-        if self._is_expired(key):
-            self.delete(key)
-            self._metrics['misses'] += 1
+        # Caminho rápido do acerto: uma única busca no armazenamento, sem o
+        # lock da faixa (a leitura é uma operação única sob _store_lock)
+        with self._store_lock:
+            if next(self._reads) % SWEEP_INTERVAL == 0:
+                self._cache.expire()
+            value = self._cache.get(key)
+            if value is not None:
+                self._hit_counts[key] += 1
+                
+        if value is None and self._backend is not None:
+            value = self._backend.get(key)
+            if value is not None:
+                self._set_local(key, value)
+                
+        if value is None:
+            self._misses.incr()
             return None
             
-        self._metrics['hits'] += 1
-        return self._cache[key]
+        self._hits.incr()
+        return value
         
-    def set(self, key: str, value: Any):
+    def set(self, key: Hashable, value: Any, weight: float = 1.0):
         """
         Armazena um valor no cache
         
         Args:
             key: Chave do cache
             value: Valor a ser armazenado
+            weight: Valor de manter a entrada em cache na evicção v-LRU
+                (ex.: custo de recalcular); 1.0 por padrão
+        """
+        self._set_local(key, value, weight)
+        if self._backend is not None:
+            self._backend.mset({key: value}, self.ttl)
+            
+    def _set_local(self, key: Hashable, value: Any, weight: float = 1.0):
+        """
+        Armazena um valor apenas no cache em memória
+        
+        Args:
+            key: Chave do cache
+            value: Valor a ser armazenado
+            weight: Peso da entrada na evicção v-LRU
+        """
+        with self._lock_for(key):
+            # Indexa antes de armazenar: uma evicção posterior remove da trie
+            self._index_key(key)
+            with self._store_lock:
+                self._cache[key] = value
+                self._cache.set_weight(key, weight)
+            
+    def mget(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+        """
+        Obtém vários valores do cache em uma única passada
+        
+        Args:
+            keys: Chaves do cache
+            
+        Returns:
+            Tupla (valores encontrados por chave, lista de chaves ausentes/expiradas)
+        """
+        hits: Dict[Hashable, Any] = {}
+        misses: List[Hashable] = []
+        
+        with self._store_lock:
+            cache_get = self._cache.get
+            for key in keys:
+                value = cache_get(key, _MISSING)
+                if value is _MISSING:
+                    misses.append(key)
+                else:
+                    hits[key] = value
+            self._hit_counts.update(hits.keys())
+            
+        if misses and self._backend is not None:
+            shared = self._backend.mget(misses)
+            if shared:
+                self._mset_local(shared)
+                hits.update(shared)
+                misses = [key for key in misses if key not in shared]
+                
+        self._hits.add(len(hits))
+        self._misses.add(len(misses))
+        return hits, misses
+        
+    def mset(self, mapping: Dict[Hashable, Any]):
+        """
+        Armazena vários valores no cache
+        
+        Args:
+            mapping: Dicionário de chave -> valor
+        """
+        self._mset_local(mapping)
+        if self._backend is not None:
+            self._backend.mset(mapping, self.ttl)
+            
+    def _mset_local(self, mapping: Dict[Hashable, Any]):
+        """
+        Armazena vários valores apenas no cache em memória
+        
+        Args:
+            mapping: Dicionário de chave -> valor
         """
-        self._cache[key] = value
-        self._timestamps[key] = datetime.now()
+        for key in mapping:
+            self._index_key(key)
+        with self._store_lock:
+            self._cache.update(mapping)
+            
+    def get_or_compute(self, key: Hashable, compute_fn: Callable[[], Any]) -> Any:
+        """
+        Obtém um valor do cache ou o calcula, uma única vez por chave
+        
+        Chamadores concorrentes para a mesma chave ausente aguardam o
+        primeiro cálculo e reutilizam seu resultado.
         
-        # Limitar tamanho do cache
-        if len(self._cache) > self.maxsize:
-            self._evict_oldest()
+        Args:
+            key: Chave do cache
+            compute_fn: Função sem argumentos que calcula o valor
             
-    def delete(self, key: str):
+        Returns:
+            Valor armazenado ou recém-calculado
+        """
+        value = self.get(key)
+        if value is not None:
+            logger.debug("Cache hit: %s", key)
+            return value
+        
+        with self._locks_guard:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+        
+        with lock:
+            # Outro chamador pode ter calculado o valor enquanto aguardávamos
+            with self._store_lock:
+                value = self._cache.get(key)
+            if value is not None:
+                return value
+            
+            # Outro processo pode já ter calculado o valor
+            if self._backend is not None:
+                value = self._backend.get(key)
+                if value is not None:
+                    self._set_local(key, value)
+                    return value
+            
+            try:
+                logger.debug("Cache miss: %s", key)
+                value = compute_fn()
+                self.set(key, value)
+                return value
+            finally:
+                with self._locks_guard:
+                    self._key_locks.pop(key, None)
+            
+    def delete(self, key: Hashable):
         """
         Remove um valor do cache
         
         Args:
             key: Chave do cache
         """
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._timestamps:
-            del self._timestamps[key]
+        with self._lock_for(key):
+            with self._store_lock:
+                if self._cache.pop(key, _MISSING) is not _MISSING:
+                    self._forget(key)
+        if self._backend is not None:
+            # Chaves de @cached terminam nos argumentos, que não atravessam o
+            # canal; os demais processos invalidam todas as chamadas da função
+            self._backend.invalidate(key[:-1] if isinstance(key, tuple) else key)
+            
+    def _on_evict(self, key: Hashable):
+        """
+        Chamado pelo armazenamento ao remover o item menos recentemente usado
+        
+        Args:
+            key: Chave removida
+        """
+        self._metrics['evictions'].incr()
+        self._forget(key)
+        
+    def _forget(self, key: Hashable):
+        """
+        Remove da trie e das contagens de acerto uma chave que saiu do cache
+        
+        Args:
+            key: Chave removida
+        """
+        self._hit_counts.pop(key, None)
+        self._unindex_key(key)
             
     def clear(self):
         """Limpa todo o cache"""
-        self._cache.clear()
-        self._timestamps.clear()
-        self._pattern_cache.clear()
-        
-    def _is_expired(self, key: str) -> bool:
+        self._clear_local()
+        if self._backend is not None:
+            self._backend.clear()
+            
+    def _clear_local(self):
+        """Limpa o cache em memória"""
+        with self._all_stripes(), self._store_lock, self._trie_lock:
+            self._cache = self._new_store()
+            self._trie = RadixNode()
+            self._hit_counts.clear()
+            
+    @staticmethod
+    def _key_path(key: Hashable) -> Optional[KeyPath]:
         """
-        Verifica se um item do cache expirou
+        Retorna o caminho da chave na trie
         
         Args:
             key: Chave do cache
             
         Returns:
-            bool: True se expirado
+            Segmentos da chave, ou None se ela não é indexada (nem str nem tupla)
+        """
+        if isinstance(key, str):
+            return tuple(key.split(KEY_SEPARATOR))
+        if isinstance(key, tuple):
+            return key
+        return None
+        
+    def _index_key(self, key: Hashable):
         """
-        if key not in self._timestamps:
-            return True
+        Registra uma chave no nó da trie correspondente ao seu caminho
+        
+        Args:
+            key: Chave do cache
+        """
+        path = self._key_path(key)
+        if path is None:
+            return
+        with self._trie_lock:
+            node = self._trie
+            for segment in path:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = RadixNode()
+                node = child
+            node.leaf_keys.add(key)
             
-        age = (datetime.now() - self._timestamps[key]).total_seconds()
-        return age > self.ttl
+    def _unindex_key(self, key: Hashable):
+        """
+        Remove uma chave da trie, descartando os nós que ficarem vazios
         
-    def _evict_oldest(self):
-        """Remove o item mais antigo do cache"""
-        if not self._timestamps:
+        Args:
+            key: Chave do cache
+        """
+        path = self._key_path(key)
+        if path is None:
             return
+        with self._trie_lock:
+            visited = []
+            node = self._trie
+            for segment in path:
+                child = node.children.get(segment)
+                if child is None:
+                    return
+                visited.append((node, segment))
+                node = child
+            node.leaf_keys.discard(key)
+            self._prune(visited)
+            
+    @staticmethod
+    def _prune(visited: List[Tuple[RadixNode, Hashable]]):
+        """
+        Remove, de baixo para cima, os nós do caminho que ficaram vazios
+        (o lock da trie deve estar adquirido)
+        
+        Args:
+            visited: Pares (nó pai, segmento) do caminho percorrido
+        """
+        for parent, segment in reversed(visited):
+            child = parent.children.get(segment)
+            if child is None:
+                continue
+            if child.leaf_keys or child.children:
+                break
+            del parent.children[segment]
+            
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        """
+        Retorna o lock da faixa responsável pela chave
+        
+        Args:
+            key: Chave do cache
             
-        oldest_key = min(self._timestamps.items(), key=lambda x: x[1])[0]
-        self.delete(oldest_key)
-        self._metrics['evictions'] += 1
+        Returns:
+            threading.Lock: Lock da faixa
+        """
+        return self._stripes[hash(key) & (LOCK_STRIPES - 1)]
+        
+    @contextmanager
+    def _all_stripes(self):
+        """Adquire todos os locks, sempre na mesma ordem, para operações globais"""
+        for lock in self._stripes:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._stripes):
+                lock.release()
         
-    def invalidate_pattern(self, pattern: str):
+    def invalidate_pattern(self, pattern: Union[str, KeyPath]):
         """
         Invalida todas as chaves que correspondem ao padrão
         
+        Em um padrão string, um '*' no final do último segmento remove toda a
+        subárvore correspondente ('conversation:*', 'conv*'); sem '*' apenas
+        a chave exata é invalidada. Um padrão tupla é um prefixo de segmentos
+        e remove toda a subárvore (ex.: todas as chaves de uma função @cached).
+        
         Args:
             pattern: Padrão de chaves a serem invalidadas
         """
-        if pattern in self._pattern_cache:
-            for key in self._pattern_cache[pattern]:
-                self.delete(key)
-            del self._pattern_cache[pattern]
-        self._metrics['invalidations'] += 1
+        self._invalidate_local(pattern)
+        if self._backend is not None:
+            self._backend.invalidate(pattern)
+            
+    def _invalidate_local(self, pattern: Union[str, KeyPath]):
+        """
+        Invalida no cache em memória as chaves que correspondem ao padrão
         
-    def get_metrics(self) -> Dict[str, int]:
+        Args:
+            pattern: Padrão no formato de invalidate_pattern
+        """
+        if ENABLE_GLOB_INVALIDATION and _is_glob_pattern(pattern):
+            self._invalidate_glob(pattern)
+            return
+            
+        if isinstance(pattern, tuple):
+            segments, last = list(pattern), '*'
+        else:
+            segments = pattern.split(KEY_SEPARATOR)
+            last = segments.pop()
+        keys: List[Hashable] = []
+        
+        with self._all_stripes():
+            with self._trie_lock:
+                visited = []
+                node = self._trie
+                for segment in segments:
+                    child = node.children.get(segment)
+                    if child is None:
+                        break
+                    visited.append((node, segment))
+                    node = child
+                else:
+                    if isinstance(pattern, tuple):
+                        keys.extend(node.collect_keys())
+                        node.leaf_keys.clear()
+                        node.children.clear()
+                    elif last.endswith('*'):
+                        prefix = last[:-1]
+                        matches = [
+                            name for name in node.children
+                            if not prefix or (isinstance(name, str) and name.startswith(prefix))
+                        ]
+                        for name in matches:
+                            keys.extend(node.children.pop(name).collect_keys())
+                    else:
+                        child = node.children.get(last)
+                        if child is not None:
+                            keys.extend(child.leaf_keys)
+                            child.leaf_keys.clear()
+                            visited.append((node, last))
+                    # Não deixa nós vazios para trás após a invalidação
+                    self._prune(visited)
+                        
+            with self._store_lock:
+                for key in keys:
+                    self._cache.pop(key, None)
+                    self._hit_counts.pop(key, None)
+        self._metrics['invalidations'].incr()
+        
+    def update_pattern(self, pattern: KeyPath, update_fn: Callable[[Hashable, Any], Any]) -> int:
+        """
+        Substitui atomicamente os valores em cache de uma subárvore (write-through)
+        
+        Args:
+            pattern: Prefixo de segmentos, ex.: ('conversation', conversation_id)
+            update_fn: Função que recebe a chave e o valor atual e retorna o novo
+                valor; executada com os locks adquiridos, portanto deve ser rápida
+            
+        Returns:
+            Número de entradas atualizadas
+        """
+        updated: Dict[Hashable, Any] = {}
+        with self._all_stripes():
+            with self._trie_lock:
+                node = self._trie
+                for segment in pattern:
+                    node = node.children.get(segment)
+                    if node is None:
+                        return 0
+                keys = node.collect_keys()
+                
+            with self._store_lock:
+                for key in keys:
+                    value = self._cache.get(key)
+                    if value is None:
+                        continue
+                    updated[key] = self._cache[key] = update_fn(key, value)
+                    
+        if self._backend is not None:
+            # Os demais processos descartam suas cópias; o Redis recebe os novos valores
+            self._backend.invalidate(pattern)
+            if updated:
+                self._backend.mset(updated, self.ttl)
+        return len(updated)
+        
+    def _invalidate_glob(self, pattern: str):
+        """
+        Invalida por varredura as chaves cujo caminho casa com um padrão glob
+        
+        Args:
+            pattern: Padrão glob, ex.: 'conversation:*:messages'
+        """
+        match = _compile_pattern(pattern).match
+        
+        with self._all_stripes():
+            with self._store_lock:
+                for key in list(self._cache.keys()):
+                    path = self._key_path(key)
+                    if path is None or not match(KEY_SEPARATOR.join(map(str, path))):
+                        continue
+                    if self._cache.pop(key, _MISSING) is not _MISSING:
+                        self._forget(key)
+        self._metrics['invalidations'].incr()
+        
+    def get_metrics(self) -> Dict[str, float]:
         """
         Retorna as métricas do cache
         
+        Além dos contadores, inclui a taxa de acerto (hits / acessos), a taxa
+        de erro e o speedup estimado (1 + hits / misses).
+        
         Returns:
             Dict com métricas do cache
         """
-        return self._metrics.copy()
+        metrics = {name: counter.value for name, counter in self._metrics.items()}
+        hits, misses = metrics['hits'], metrics['misses']
+        accesses = hits + misses
+        metrics['hit_ratio'] = hits / accesses if accesses else 0.0
+        metrics['miss_ratio'] = misses / accesses if accesses else 0.0
+        metrics['speedup'] = 1 + hits / max(misses, 1)
+        return metrics
         
-    def register_pattern(self, pattern: str, key: str):
+    def get_hot_keys(self, limit: int = 10) -> List[Tuple[Hashable, int]]:
         """
-        Registra uma chave em um padrão para invalidação
+        Retorna as chaves com mais acertos
         
         Args:
-            pattern: Padrão de invalidação
-            key: Chave do cache
+            limit: Número máximo de chaves
+            
+        Returns:
+            Lista de tuplas (chave, acertos) em ordem decrescente
         """
-        self._pattern_cache[pattern].add(key)
+        with self._store_lock:
+            return self._hit_counts.most_common(limit)
+        
 
-# Instância global do cache
-cache_manager = CacheManager()
+# Instância global do cache, compartilhada via Redis quando REDIS_URL está definida
+cache_manager = CacheManager(backend=create_backend())
 
-def cached(ttl: int = 300, pattern: Optional[str] = None):
+def _pattern_path(pattern: Optional[str]) -> KeyPath:
+    """
+    Converte um padrão de invalidação no prefixo das chaves geradas pelos decoradores
+    
+    Args:
+        pattern: Padrão como 'conversation:*'
+        
+    Returns:
+        Segmentos do padrão sem o '*' final, ex.: ('conversation',)
+    """
+    if not pattern:
+        return ()
+    segments = pattern.split(KEY_SEPARATOR)
+    if segments[-1] == '*':
+        segments.pop()
+    return tuple(segments)
+
+def cached(ttl: int = 300, pattern: Optional[str] = None,
+           key_fn: Optional[Callable[..., str]] = None):
     """
     Decorador para cache de funções
     
     Args:
         ttl: Time To Live em segundos
         pattern: Padrão para invalidação do cache
+        key_fn: Função que recebe os argumentos da chamada e retorna a tag da
+            entrada (ex.: 'conversation:{id}'); substitui o padrão como prefixo,
+            permitindo invalidar só as chamadas daquela tag
     """
     def decorator(func: Callable) -> Callable:
+        # A chave é o caminho na trie: (*padrão ou tag, módulo, função, argumentos),
+        # então invalidar o padrão ou a tag remove a subárvore com as chamadas
+        base = _pattern_path(pattern)
+        suffix = (func.__module__, func.__qualname__)
+        
+        def cache_key(*args, **kwargs) -> KeyPath:
+            # Gerar chave única para o cache (mesmo mecanismo do lru_cache)
+            prefix = _pattern_path(key_fn(*args, **kwargs)) if key_fn else base
+            return prefix + suffix + (_make_key(args, kwargs, typed=False),)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Gerar chave única para o cache
-            key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
-            
-            # Registrar padrão se fornecido
-            if pattern:
-                cache_manager.register_pattern(pattern, key)
-            
-            # Tentar obter do cache
-            cached_value = cache_manager.get(key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {key}")
-                return cached_value
+            try:
+                key = cache_key(*args, **kwargs)
+                hash(key)
+            except TypeError:
+                # Argumentos não hasheáveis: executa sem cache
+                return func(*args, **kwargs)
+            
+            # Obter do cache ou executar a função (uma única vez por chave)
+            return cache_manager.get_or_compute(key, lambda: func(*args, **kwargs))
+            
+        # Permite que escritas atualizem a entrada de uma chamada (write-through)
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
+
+def cached_batch(key_fn: Callable[[Any], Hashable], ttl: int = 300, pattern: Optional[str] = None):
+    """
+    Decorador para cache de funções que buscam vários itens de uma vez
+    
+    A função decorada recebe a lista de ids como primeiro argumento e retorna
+    um dicionário id -> valor. Somente os ids ausentes do cache são repassados
+    a ela, em uma única chamada.
+    
+    Args:
+        key_fn: Função que gera a chave do cache a partir de um id
+        ttl: Time To Live em segundos
+        pattern: Padrão para invalidação do cache
+    """
+    def decorator(func: Callable) -> Callable:
+        prefix = _pattern_path(pattern)
+        
+        def make_key(item_id: Any) -> Hashable:
+            key = key_fn(item_id)
+            return prefix + (key,) if prefix else key
+        
+        @wraps(func)
+        def wrapper(ids: Iterable[Any], *args, **kwargs) -> Dict[Any, Any]:
+            keys = {item_id: make_key(item_id) for item_id in ids}
+            hits, misses = cache_manager.mget(keys.values())
+            
+            results = {}
+            missing_ids = []
+            for item_id, key in keys.items():
+                if key in hits and hits[key] is not None:
+                    results[item_id] = hits[key]
+                else:
+                    missing_ids.append(item_id)
+                    
+            if missing_ids:
+                logger.debug("Cache miss em lote: %d de %d", len(missing_ids), len(keys))
+                fetched = func(missing_ids, *args, **kwargs) or {}
+                to_store = {}
+                for item_id, value in fetched.items():
+                    key = keys[item_id] if item_id in keys else make_key(item_id)
+                    to_store[key] = value
+                cache_manager.mset(to_store)
+                results.update(fetched)
                 
-            # Executar função e armazenar resultado
-            logger.debug(f"Cache miss: {key}")
-            result = func(*args, **kwargs)
-            cache_manager.set(key, result)
-            return result
+            return results
             
         return wrapper
     return decorator
 
-def invalidate_cache(*patterns: str):
+def invalidate_cache(*patterns: str, key_fn: Optional[Callable[..., Union[str, Iterable[str]]]] = None):
     """
     Decorador para invalidar cache após operações de escrita
     
     Args:
         patterns: Padrões de chaves do cache a serem invalidadas
+        key_fn: Função que recebe os argumentos da chamada e retorna a tag (ou
+            lista de tags) afetada, ex.: 'conversation:{id}'; cada tag remove
+            apenas a sua subárvore, em vez do namespace inteiro
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -192,6 +834,17 @@ def invalidate_cache(*patterns: str):
             for pattern in patterns:
                 cache_manager.invalidate_pattern(pattern)
                 
+            if key_fn is not None:
+                try:
+                    tags = key_fn(*args, **kwargs)
+                except Exception as e:
+                    # Sem saber o que foi alterado, não há como manter o cache
+                    logger.warning(f"Erro ao gerar tags de invalidação para {func.__qualname__}: {e}")
+                    cache_manager.clear()
+                    return result
+                for tag in ([tags] if isinstance(tags, str) else tags):
+                    cache_manager.invalidate_pattern(_pattern_path(tag))
+                
             return result
             
         return wrapper
@@ -199,13 +852,18 @@ def invalidate_cache(*patterns: str):
 
 # Exemplos de uso:
 """
-@cached(ttl=300, pattern='conversation:*')
+@cached(ttl=300, key_fn=lambda conversation_id: f'conversation:{conversation_id}')
 def get_conversation(conversation_id: str) -> Optional[Dict]:
     # Implementação existente
     pass
 
-@invalidate_cache('conversation:*')
+@cached_batch(key_fn=lambda conversation_id: f'conversation:{conversation_id}')
+def get_conversations_by_ids(conversation_ids: List[str]) -> Dict[str, Dict]:
+    # Busca apenas os ids ausentes do cache, em uma única consulta
+    pass
+
+@invalidate_cache(key_fn=lambda conversation_id, data: f'conversation:{conversation_id}')
 def update_conversation(conversation_id: str, data: Dict) -> bool:
-    # Implementação existente
+    # Invalida apenas as entradas desta conversa
     pass
 """ 
\ No newline at end of file
@@ -1,35 +1,22 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.ext.declarative import declarative_base
-from dotenv import load_dotenv
+from contextlib import contextmanager
 from .models import Base
+from ._engine import get_engine, get_session_factory
 
-# Carrega as variáveis de ambiente
-load_dotenv()
-
-# Obtém a URL do banco de dados a partir das variáveis de ambiente
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///agentewhatsapp.db")
-
-# Cria o motor de banco de dados
-engine = create_engine(DATABASE_URL, echo=False)
-
-# Cria uma fábrica de sessões
-session_factory = sessionmaker(bind=engine)
-SessionLocal = scoped_session(session_factory)
+# Motor e fábrica de sessões únicos, compartilhados com db_setup
+engine = get_engine()
+SessionLocal = get_session_factory()
 
 def init_db():
     """Inicializa o banco de dados criando todas as tabelas definidas"""
     Base.metadata.create_all(bind=engine)
 
+@contextmanager
 def get_db():
-    """Obtém uma sessão do banco de dados"""
+    """Obtém uma sessão do banco de dados, fechada ao sair do bloco with"""
     db = SessionLocal()
     try:
-        return db
+        yield db
     finally:
         db.close()
-
-def get_engine():
-    """Retorna o motor do banco de dados"""
-    return engine 
\ No newline at end of file
+        # Descarta a sessão da thread e devolve a conexão ao pool
+        SessionLocal.remove() 
\ No newline at end of file
@@ -1,52 +1,116 @@
-# Stub para SQLAlchemy - desabilitado temporariamente para permitir execução do sistema
-# devido a incompatibilidade com Python 3.13
+# Configuração do banco de dados SQL (SQLAlchemy)
+# O SQL só é habilitado quando DATABASE_URL está definida; caso contrário as
+# funções abaixo não fazem nada e o sistema usa apenas o Firebase.
 
-import os
-from dotenv import load_dotenv
 from loguru import logger
-import contextlib
+import functools
+from ._engine import CONFIGURED_DATABASE_URL, get_session_factory
 
-# Carrega variáveis de ambiente
-load_dotenv()
+# Decidido uma única vez, na importação do módulo
+ENABLE_SQL = bool(CONFIGURED_DATABASE_URL)
 
-# Classe stub para simular DatabaseManager
+if not ENABLE_SQL:
+    logger.warning("DATABASE_URL não definida - recursos de banco de dados SQL estão desabilitados, usando apenas Firebase")
+
+# Gerenciador simples do estado da conexão SQL
 class DatabaseManager:
     def __init__(self):
         self.connected = False
-    
+
     def connect(self):
-        logger.warning("SQLAlchemy stub sendo utilizado - recursos de banco de dados SQL estão desabilitados")
         self.connected = True
         return self
-        
+
     def disconnect(self):
         self.connected = False
         return self
-    
+
     def is_connected(self):
         return self.connected
 
 # Inicializa o banco de dados
 def init_db():
     """
-    Stub para inicializar o banco de dados.
+    Cria as tabelas do banco de dados SQL, se habilitado.
     """
-    logger.warning("SQLAlchemy desabilitado - usando apenas Firebase")
+    if ENABLE_SQL:
+        try:
+            from .db import init_db as init_sql_db
+        except ImportError as e:
+            # Os modelos SQL ainda são stubs, sem Base declarativa
+            logger.warning(f"Modelos SQL indisponíveis ({e}) - tabelas não criadas, usando apenas Firebase")
+            return True
+        init_sql_db()
     return True
 
 # Obtém uma sessão do banco de dados
 def get_session():
     """
-    Stub para obter uma sessão do banco de dados.
+    Obtém uma sessão do banco de dados SQL, ou None se desabilitado.
     """
-    logger.warning("SQLAlchemy desabilitado - usando apenas Firebase")
-    return None
+    if not ENABLE_SQL:
+        return None
+    return get_session_factory()()
 
-# Contexto de sessão de banco de dados
-@contextlib.contextmanager
-def with_db_session():
+# Escopo de sessão de banco de dados
+class _SessionScope:
     """
-    Stub para gerenciador de contexto de sessão.
+    Escopo de sessão usado por with_db_session, como contexto ou decorador.
+
+    Em modo de escrita faz commit ao final (rollback em caso de erro), fecha a
+    sessão e descarta a sessão da thread. Em modo somente leitura não faz
+    commit e mantém a sessão da thread para reutilização, mas também a fecha,
+    devolvendo a conexão ao pool.
+    """
+
+    def __init__(self, readonly=False):
+        self.readonly = readonly
+        self.session = None
+
+    def __enter__(self):
+        if ENABLE_SQL:
+            self.session = get_session_factory()()
+        return self.session
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        session, self.session = self.session, None
+        if session is None:
+            return False
+        try:
+            if exc_type is not None:
+                session.rollback()
+            elif not self.readonly:
+                try:
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
+        finally:
+            # Fechar devolve a conexão ao pool mesmo em modo somente leitura
+            session.close()
+            if not self.readonly:
+                get_session_factory().remove()
+        return False
+
+    def __call__(self, func):
+        readonly = self.readonly
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _SessionScope(readonly) as db:
+                return func(*args, db=db, **kwargs)
+
+        return wrapper
+
+def with_db_session(func=None, *, readonly=False):
+    """
+    Gerenciador de contexto ou decorador de sessão; fornece None se o SQL estiver desabilitado.
+
+    Uso:
+        with with_db_session() as db: ...
+        @with_db_session / @with_db_session(readonly=True), recebendo o argumento db
     """
-    logger.warning("SQLAlchemy desabilitado - usando apenas Firebase")
-    yield None 
\ No newline at end of file
+    scope = _SessionScope(readonly)
+    if callable(func):
+        return scope(func)
+    return scope
@@ -1,17 +1,38 @@
 import os
-import json
+import base64
+import asyncio
+import atexit
+import weakref
+import itertools
+import re
+import threading
+import orjson
+import zstandard as zstd
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 from functools import lru_cache
-from typing import Dict, List, Optional, Union, Any, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Union, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from firebase_admin import initialize_app, storage
-from google.cloud.firestore import Client
-from .cache import cached, invalidate_cache, cache_manager
-from threading import Lock
+from google.cloud.firestore import AsyncClient, Client, FieldFilter, Query, SERVER_TIMESTAMP
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.services.firestore import client as firestore_client
+from google.cloud.firestore_v1.services.firestore.transports.grpc import FirestoreGrpcTransport
+from google.api_core import exceptions as google_exceptions
+from google.api_core.retry import Retry, if_exception_type
+from .cache import cached, cached_batch, invalidate_cache, cache_manager
+from threading import BoundedSemaphore, RLock
+
+# Parser ISO 8601 em C, opcional; sem ele _parse_ts usa a expressão regular
+try:
+    import ciso8601
+    CISO8601_AVAILABLE = True
+except ImportError:
+    CISO8601_AVAILABLE = False
 
 # Configuração de logging
 logger = logging.getLogger(__name__)
@@ -22,13 +43,131 @@ load_dotenv()
 # Verificar se já foi inicializado
 firebase_app = None
 
+# Ordenação decrescente das consultas, resolvida uma única vez
+_DESCENDING = Query.DESCENDING
+
+# Filtros fixos das listagens dos agentes coletor e avaliador, criados uma única vez
+_ACTIVE_STATUS_FILTER = FieldFilter('status', 'in', ['em_andamento', 'reaberta'])
+_CLOSED_FILTER = FieldFilter('status', '==', 'encerrada')
+_NOT_EVALUATED_FILTER = FieldFilter('avaliada', '==', False)
+
 # Configuração do cache
 CACHE_SIZE = 1000
 CACHE_TTL = 300  # 5 minutos
 
-# Locks para operações concorrentes
-conversation_locks = {}
-global_lock = Lock()
+# Limites de uma escrita em lote no Firestore (500 operações e 10 MiB por
+# commit); o limite de bytes deixa folga para os metadados da requisição
+FIRESTORE_BATCH_SIZE = 500
+FIRESTORE_BATCH_MAX_BYTES = 9 * 1024 * 1024
+
+# Documentos lidos por página ao percorrer uma coleção inteira (backup)
+BACKUP_PAGE_SIZE = 500
+
+# Coleções incluídas em backup_data
+BACKUP_COLLECTIONS = ('conversas', 'mensagens', 'avaliacoes')
+
+# Nível de compressão zstd do arquivo de backup_data
+BACKUP_ZSTD_LEVEL = 3
+
+# Escritas paralelas: as RPCs do Firestore são limitadas pela rede e o gRPC
+# libera o GIL, então várias escritas simultâneas aumentam a vazão
+WRITE_MAX_WORKERS = 40
+# Máximo de escritas em andamento, bem abaixo do limite de ~10 mil
+# escritas/s por coleção do Firestore
+MAX_IN_FLIGHT_WRITES = 500
+
+# Retentativa com backoff exponencial para erros transitórios de escrita
+WRITE_RETRY = Retry(
+    predicate=if_exception_type(
+        google_exceptions.Aborted,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.ServiceUnavailable,
+    ),
+    initial=0.5,
+    maximum=10.0,
+    multiplier=2.0,
+    timeout=60.0,
+)
+
+_write_slots = BoundedSemaphore(MAX_IN_FLIGHT_WRITES)
+
+# Leituras independentes disparadas em paralelo (ex.: subcoleção e coleção
+# separada de mensagens)
+READ_MAX_WORKERS = 16
+
+# Campos de conversa que podem chegar como string e são gravados como datetime
+_TS_FIELDS = frozenset(['dataHoraInicio', 'dataHoraEncerramento', 'ultimaMensagem', 'lastMessageAt', 'createdAt'])
+
+# Formatos aceitos: 'YYYY-MM-DDTHH:MM:SS[.ffffff][Z]' e 'YYYY-MM-DD HH:MM:SS'
+_TS_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z?')
+
+# Número de clientes Firestore (cada um com seu próprio canal gRPC) usados
+# em rodízio pelas threads, evitando disputa por um único canal
+FIRESTORE_CLIENT_POOL_SIZE = int(os.getenv('FIRESTORE_CLIENT_POOL_SIZE', '4'))
+
+# Opção de canal dos clientes adicionais: com os mesmos argumentos, canais
+# gRPC compartilham a subconexão global, ou seja, a mesma conexão HTTP/2
+POOL_CHANNEL_OPTIONS = (('grpc.use_local_subchannel_pool', 1),)
+
+# Clientes assíncronos, um por event loop (o canal gRPC aio pertence ao loop)
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]' = weakref.WeakKeyDictionary()
+
+# Cliente atribuído a cada thread
+_thread_db = threading.local()
+_thread_counter = itertools.count()
+
+# Listas de conversas em cache que dependem de cada campo da conversa
+_CONVERSATION_LIST_TAGS = {
+    'status': ('conversations:status', 'collector:*', 'evaluator:*'),
+    'tags': ('conversations:tag',),
+    'avaliada': ('evaluator:*',),
+}
+
+# Padrões de cache com dados lidos de cada coleção, usados ao restaurar ou
+# substituir uma coleção inteira
+COLLECTION_CACHE_PATTERNS = {
+    'conversas': ('conversation:*', 'conversations:*', 'collector:*', 'evaluator:*'),
+    'mensagens': ('messages:*', 'collector:*'),
+    'solicitacoes': ('solicitacoes:*', 'requests:*'),
+    'avaliacoes': ('avaliacoes:*', 'evaluations:*'),
+    'consolidada_atendimentos': ('consolidado:*', 'consolidated:*'),
+}
+
+# Campos de uma conversa exibidos em listagens (projeção com select)
+CONVERSATION_SUMMARY_FIELDS = ('status', 'ultimaMensagem', 'cliente.nome')
+
+# Campos usados pelas listagens dos agentes coletor e avaliador
+ACTIVE_CONVERSATION_FIELDS = ('status', 'ultimaMensagem')
+EVALUATION_LISTING_FIELDS = ('status', 'avaliada', 'dataHoraEncerramento')
+
+# Validade das URLs assinadas de mídia, em segundos (1 hora)
+MEDIA_URL_EXPIRATION = 3600
+
+# Folga entre o fim do cache de uma URL assinada e o fim da sua validade, em segundos
+SIGNED_URL_SAFETY_MARGIN = 600
+
+# Máximo de valores aceitos por um filtro 'in' do Firestore
+FIRESTORE_IN_MAX_VALUES = 30
+
+# Número de locks compartilhados entre as conversas (potência de 2)
+CONVERSATION_LOCK_SHARDS = 1024
+
+# Conversas recentes cujo shard de lock fica memorizado em get_conversation_lock
+CONVERSATION_LOCK_CACHE_SIZE = 4096
+
+# Locks para operações concorrentes; cada conversa usa sempre o mesmo shard
+_conversation_locks = tuple(RLock() for _ in range(CONVERSATION_LOCK_SHARDS))
+
+# Valores de escrita que o servidor transforma (Increment, ArrayUnion, DELETE_FIELD...);
+# o resultado só é conhecido relendo o documento
+_TRANSFORM_TYPES = (
+    transforms.Sentinel,
+    transforms.ArrayUnion,
+    transforms.ArrayRemove,
+    transforms.Increment,
+    transforms.Maximum,
+    transforms.Minimum
+)
 
 def init_firebase():
     """Inicializa a conexão com o Firebase"""
@@ -44,7 +183,7 @@ def init_firebase():
         
         if cred_json:
             # Usar credenciais como JSON string
-            cred_info = json.loads(cred_json)
+            cred_info = orjson.loads(cred_json)
             cred = credentials.Certificate(cred_info)
         elif cred_path:
             # Usar arquivo de credenciais
@@ -64,25 +203,356 @@ def init_firebase():
         logger.error(f"Erro ao inicializar Firebase: {e}")
         raise
 
+@lru_cache(maxsize=1)
 def get_firestore_db() -> Client:
-    """Retorna uma instância do cliente Firestore"""
+    """Retorna a instância compartilhada do cliente Firestore"""
     if not firebase_app:
         init_firebase()
     
     return firestore.client()
 
+def _parse_ts(value: str) -> Optional[datetime]:
+    """
+    Converte um timestamp em string para datetime
+    
+    Args:
+        value: Timestamp em formato ISO 8601 ou 'YYYY-MM-DD HH:MM:SS'
+        
+    Returns:
+        datetime correspondente ou None se o formato não for reconhecido
+    """
+    if CISO8601_AVAILABLE:
+        try:
+            parsed = ciso8601.parse_datetime(value)
+        except ValueError:
+            return None
+        # O 'Z' final é descartado, como no parser por expressão regular
+        if parsed.tzinfo is timezone.utc:
+            parsed = parsed.replace(tzinfo=None)
+        return parsed
+    
+    match = _TS_RE.fullmatch(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                        int(fraction.ljust(6, '0')) if fraction else 0)
+    except ValueError:
+        return None
+
+def _normalize_timestamps(data: Dict[str, Any]) -> None:
+    """
+    Converte, no próprio dicionário, os campos de timestamp em string para datetime
+    
+    Args:
+        data: Dados da conversa
+    """
+    for field in _TS_FIELDS:
+        value = data.get(field)
+        if isinstance(value, str):
+            parsed = _parse_ts(value)
+            if parsed is None:
+                logger.warning(f"Não foi possível converter timestamp para o campo {field}: {value}")
+            else:
+                data[field] = parsed
+
+def _estimate_document_size(data: Dict[str, Any]) -> int:
+    """Estima o tamanho serializado de um documento, em bytes"""
+    return len(orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS))
+
+def _commit_in_batches(writes: Iterable[Tuple[Any, Dict[str, Any]]]) -> int:
+    """
+    Grava documentos com WriteBatch, em commits de até FIRESTORE_BATCH_SIZE
+    operações e FIRESTORE_BATCH_MAX_BYTES bytes
+    
+    Args:
+        writes: Pares (referência do documento, dados)
+        
+    Returns:
+        int: Número de documentos gravados
+    """
+    db = _pick_db()
+    batch = db.batch()
+    ops = 0
+    size = 0
+    written = 0
+    
+    for doc_ref, data in writes:
+        doc_size = _estimate_document_size(data)
+        if ops and (ops >= FIRESTORE_BATCH_SIZE or size + doc_size > FIRESTORE_BATCH_MAX_BYTES):
+            batch.commit()
+            written += ops
+            batch = db.batch()
+            ops = 0
+            size = 0
+        batch.set(doc_ref, data)
+        ops += 1
+        size += doc_size
+        
+    if ops:
+        batch.commit()
+        written += ops
+    return written
+
+@lru_cache(maxsize=1)
+def _get_write_executor() -> ThreadPoolExecutor:
+    """Retorna o pool de threads compartilhado para escritas paralelas"""
+    return ThreadPoolExecutor(max_workers=WRITE_MAX_WORKERS, thread_name_prefix='firestore-write')
+
+def _run_parallel(fn: Callable[..., Any], calls: Iterable[Tuple]) -> List[Any]:
+    """
+    Executa chamadas de escrita em paralelo no pool compartilhado
+    
+    Args:
+        fn: Função de escrita
+        calls: Tuplas de argumentos, uma por chamada
+        
+    Returns:
+        Lista de resultados na mesma ordem das chamadas
+    """
+    executor = _get_write_executor()
+    futures = []
+    for args in calls:
+        # Limita as escritas em andamento; a vaga é liberada ao concluir
+        _write_slots.acquire()
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            _write_slots.release()
+            raise
+        future.add_done_callback(lambda _: _write_slots.release())
+        futures.append(future)
+    return [future.result() for future in futures]
+
+@lru_cache(maxsize=1)
+def _get_read_executor() -> ThreadPoolExecutor:
+    """Retorna o pool de threads compartilhado para leituras paralelas"""
+    return ThreadPoolExecutor(max_workers=READ_MAX_WORKERS, thread_name_prefix='firestore-read')
+
+def _first_non_empty(primary: Callable[[], Any], fallback: Callable[[], Any]) -> Any:
+    """
+    Executa duas leituras em paralelo e prefere o resultado da principal
+    
+    Args:
+        primary: Leitura preferida
+        fallback: Leitura usada quando a principal não retorna resultado
+        
+    Returns:
+        Resultado da principal se não vazio, senão o da alternativa
+    """
+    fallback_future = _get_read_executor().submit(fallback)
+    result = primary()
+    if result:
+        # A alternativa não é necessária; cancela se ainda não começou
+        fallback_future.cancel()
+        return result
+    return fallback_future.result()
+
+@lru_cache(maxsize=1)
+def get_storage_bucket():
+    """Retorna a instância compartilhada do bucket do Firebase Storage"""
+    if not firebase_app:
+        init_firebase()
+    
+    return storage.bucket()
+
+class _PooledTransport(FirestoreGrpcTransport):
+    """Transporte gRPC dos clientes adicionais, com POOL_CHANNEL_OPTIONS no canal"""
+    
+    @classmethod
+    def create_channel(cls, *args, options=(), **kwargs):
+        return super().create_channel(*args, options=[*options, *POOL_CHANNEL_OPTIONS], **kwargs)
+
+class _PooledClient(Client):
+    """Cliente Firestore adicional, igual ao padrão exceto pelo transporte do canal"""
+    
+    @property
+    def _firestore_api(self):
+        return self._firestore_api_helper(
+            _PooledTransport,
+            firestore_client.FirestoreClient,
+            firestore_client
+        )
+
+def _create_pooled_client(primary: Client) -> Client:
+    """
+    Cria um cliente Firestore adicional com conexão HTTP/2 própria
+    
+    Args:
+        primary: Cliente principal, do qual são copiados projeto e banco
+        
+    Returns:
+        Novo cliente Firestore
+    """
+    return _PooledClient(
+        project=primary.project,
+        credentials=firebase_app.credential.get_credential(),
+        database=primary._database
+    )
+
+@lru_cache(maxsize=1)
+def _get_extra_db_clients() -> Tuple[Client, ...]:
+    """Cria uma única vez os clientes Firestore adicionais, usados em rodízio com o principal"""
+    primary = get_firestore_db()
+    try:
+        return tuple(_create_pooled_client(primary) for _ in range(FIRESTORE_CLIENT_POOL_SIZE - 1))
+    except Exception as e:
+        logger.warning(f"Não foi possível criar clientes Firestore adicionais, usando apenas o principal: {e}")
+        return ()
+
+def _pick_db() -> Client:
+    """Retorna o cliente Firestore da thread atual, atribuído em rodízio"""
+    slot = getattr(_thread_db, 'slot', None)
+    if slot is None:
+        slot = _thread_db.slot = next(_thread_counter) % max(FIRESTORE_CLIENT_POOL_SIZE, 1)
+    if slot:
+        clients = _get_extra_db_clients()
+        if clients:
+            return clients[(slot - 1) % len(clients)]
+    # O cliente principal é sempre obtido de get_firestore_db
+    return get_firestore_db()
+
+def get_firestore_async_db() -> AsyncClient:
+    """
+    Retorna o cliente Firestore assíncrono do event loop em execução
+    
+    Deve ser chamado de dentro de uma corrotina.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        primary = get_firestore_db()
+        client = _async_clients[loop] = AsyncClient(
+            project=primary.project,
+            credentials=firebase_app.credential.get_credential(),
+            database=primary._database
+        )
+    return client
+
+@atexit.register
+def _close_firestore_client():
+    """Fecha os canais gRPC dos clientes Firestore ao encerrar o processo"""
+    clients = []
+    if get_firestore_db.cache_info().currsize:
+        clients.append(get_firestore_db())
+    if _get_extra_db_clients.cache_info().currsize:
+        clients.extend(_get_extra_db_clients())
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar cliente Firestore: {e}")
+
+def _get_documents_by_ids(collection: str, doc_ids: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Lê vários documentos de uma coleção com uma única requisição BatchGetDocuments
+    
+    Args:
+        collection: Nome da coleção
+        doc_ids: IDs dos documentos
+        
+    Returns:
+        Dicionário de ID -> dados dos documentos existentes
+    """
+    doc_ids = list(dict.fromkeys(doc_ids))
+    if not doc_ids:
+        return {}
+    db = _pick_db()
+    refs = [db.collection(collection).document(doc_id) for doc_id in doc_ids]
+    return {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+
+def _conversation_tags(conversation_id: Optional[str], fields: Iterable[str] = ()) -> List[str]:
+    """
+    Retorna as tags de cache afetadas por uma escrita em uma conversa
+    
+    Args:
+        conversation_id: ID da conversa (None quando ainda não é conhecido)
+        fields: Campos da conversa que foram gravados
+        
+    Returns:
+        Tags a serem invalidadas: a própria conversa e as listas que filtram pelos campos alterados
+    """
+    tags = [f'conversation:{conversation_id}'] if conversation_id else []
+    for field in fields:
+        tags.extend(_CONVERSATION_LIST_TAGS.get(field, ()))
+    return tags
+
+def _resolve_for_cache(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Prepara os dados gravados para serem aplicados ao cache (write-through)
+    
+    SERVER_TIMESTAMP é substituído pelo horário atual, que difere do gravado
+    pelo servidor apenas pela latência da requisição.
+    
+    Args:
+        data: Dados enviados ao Firestore
+        
+    Returns:
+        Cópia dos dados, ou None se houver caminhos com '.' ou transformações
+        cujo resultado só o servidor conhece
+    """
+    now = datetime.now(timezone.utc)
+    resolved = {}
+    for field, value in data.items():
+        if '.' in field:
+            return None
+        if value is SERVER_TIMESTAMP:
+            value = now
+        elif isinstance(value, _TRANSFORM_TYPES):
+            return None
+        elif isinstance(value, dict):
+            value = _resolve_for_cache(value)
+            if value is None:
+                return None
+        resolved[field] = value
+    return resolved
+
+def _write_through_conversation(conversation_id: str, update_data: Dict[str, Any]) -> None:
+    """
+    Aplica uma atualização gravada às entradas em cache da conversa, ou as
+    invalida quando o novo valor não pode ser calculado localmente
+    
+    Args:
+        conversation_id: ID da conversa
+        update_data: Dados gravados na conversa
+    """
+    resolved = _resolve_for_cache(update_data)
+    if resolved is None:
+        cache_manager.invalidate_pattern(('conversation', conversation_id))
+        return
+    cache_manager.update_pattern(('conversation', conversation_id),
+                                 lambda key, conversation: {**conversation, **resolved})
+
 # Funções para a coleção 'conversas'
-@cached(ttl=CACHE_TTL, pattern='conversation:*')
+@cached(ttl=CACHE_TTL, key_fn=lambda conversation_id: f'conversation:{conversation_id}')
 def get_conversation(conversation_id: str) -> Optional[Dict]:
-    """Obtém uma conversa pelo ID"""
+    """Obtém uma conversa pelo ID (para vários IDs use get_conversations_by_ids)"""
     try:
-        doc = get_firestore_db().collection('conversas').document(conversation_id).get()
+        doc = _pick_db().collection('conversas').document(conversation_id).get()
         return doc.to_dict() if doc.exists else None
     except Exception as e:
         logger.error(f"Erro ao obter conversa {conversation_id}: {e}")
         return None
 
-@invalidate_cache('conversation:*')
+@cached_batch(key_fn=lambda conversation_id: f'conversation:{conversation_id}', ttl=CACHE_TTL)
+def get_conversations_by_ids(conversation_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Obtém várias conversas pelos IDs em uma única requisição
+    
+    Args:
+        conversation_ids: IDs das conversas
+        
+    Returns:
+        Dicionário de ID -> dados das conversas encontradas
+    """
+    try:
+        return _get_documents_by_ids('conversas', conversation_ids)
+    except Exception as e:
+        logger.error(f"Erro ao obter conversas {conversation_ids}: {e}")
+        return {}
+
+@invalidate_cache(key_fn=lambda conversation_data: _conversation_tags(conversation_data.get('id'), conversation_data))
 def create_conversation(conversation_data: Dict[str, Any]) -> Optional[str]:
     """
     Cria uma nova conversa no Firebase.
@@ -99,20 +569,10 @@ def create_conversation(conversation_data: Dict[str, Any]) -> Optional[str]:
         ID da conversa criada ou None em caso de erro
     """
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         
         # Converte timestamps em string para datetime, se necessário
-        for field in ['dataHoraInicio', 'dataHoraEncerramento', 'ultimaMensagem', 'lastMessageAt', 'createdAt']:
-            if field in conversation_data and isinstance(conversation_data[field], str):
-                try:
-                    for fmt in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                        try:
-                            conversation_data[field] = datetime.strptime(conversation_data[field], fmt)
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    logger.warning(f"Não foi possível converter timestamp para o campo {field}: {e}")
+        _normalize_timestamps(conversation_data)
         
         # Verifica se já possui ID personalizado
         custom_id = conversation_data.get('id')
@@ -126,26 +586,24 @@ def create_conversation(conversation_data: Dict[str, Any]) -> Optional[str]:
             
             # Cria documento com ID personalizado
             doc_ref = db.collection('conversas').document(custom_id)
-            doc_ref.set(conversation_data_copy)
+            doc_ref.set(conversation_data_copy, retry=WRITE_RETRY)
             conversation_id = custom_id
-            logger.info(f"Conversa criada com ID personalizado: {custom_id}")
+            logger.info("Conversa criada com ID personalizado: %s", custom_id)
         else:
             # Gera um ID usando o phoneNumber no formato adequado
             phone_number = conversation_data.get('phoneNumber', '')
             if phone_number:
                 # Gera um formato como phoneNumber_YYYYMMDD_HHMMSS
-                now = datetime.datetime.now()
-                timestamp_fmt = now.strftime("%Y%m%d_%H%M%S")
-                conversation_id = f"{phone_number}_{timestamp_fmt}"
+                conversation_id = f"{phone_number}_{datetime.now():%Y%m%d_%H%M%S}"
                 doc_ref = db.collection('conversas').document(conversation_id)
-                doc_ref.set(conversation_data)
-                logger.info(f"Conversa criada com ID baseado em phoneNumber: {conversation_id}")
+                doc_ref.set(conversation_data, retry=WRITE_RETRY)
+                logger.info("Conversa criada com ID baseado em phoneNumber: %s", conversation_id)
             else:
                 # Se não tiver phoneNumber, gera ID automático
                 doc_ref = db.collection('conversas').document()
-                doc_ref.set(conversation_data)
+                doc_ref.set(conversation_data, retry=WRITE_RETRY)
                 conversation_id = doc_ref.id
-                logger.info(f"Conversa criada com ID automático: {conversation_id}")
+                logger.info("Conversa criada com ID automático: %s", conversation_id)
         
         return conversation_id
     except Exception as e:
@@ -153,7 +611,46 @@ def create_conversation(conversation_data: Dict[str, Any]) -> Optional[str]:
         logger.exception("Detalhes do erro:")
         return None
 
-@invalidate_cache('conversation:*')
+def create_conversations_parallel(conversations: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """
+    Cria várias conversas em paralelo.
+    
+    Args:
+        conversations: Lista de dados das conversas, no formato de create_conversation
+        
+    Returns:
+        Lista com o ID de cada conversa criada (None nas que falharam), na mesma ordem
+    """
+    return _run_parallel(create_conversation, ((data,) for data in conversations))
+
+def update_conversations_parallel(updates: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+    """
+    Atualiza várias conversas em paralelo.
+    
+    Args:
+        updates: Dicionário de ID da conversa -> dados a serem atualizados
+        
+    Returns:
+        Dicionário de ID da conversa -> True se a atualização foi bem-sucedida
+    """
+    results = _run_parallel(update_conversation, updates.items())
+    return dict(zip(updates.keys(), results))
+
+def save_messages_parallel(messages: List[Tuple[str, Dict]]) -> List[str]:
+    """
+    Salva mensagens de várias conversas em paralelo.
+    
+    Mensagens de uma mesma conversa continuam serializadas pelo lock da conversa.
+    
+    Args:
+        messages: Lista de tuplas (ID da conversa, dados da mensagem)
+        
+    Returns:
+        Lista de IDs das mensagens salvas, na mesma ordem
+    """
+    return _run_parallel(save_message, messages)
+
+@invalidate_cache(key_fn=lambda conversation_id, update_data: _conversation_tags(None, update_data))
 def update_conversation(conversation_id: str, update_data: Dict[str, Any]) -> bool:
     """
     Atualiza uma conversa existente no Firebase.
@@ -166,36 +663,28 @@ def update_conversation(conversation_id: str, update_data: Dict[str, Any]) -> bo
         bool: True se a atualização foi bem-sucedida, False caso contrário
     """
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         
         # Converte timestamps em string para datetime, se necessário
-        for field in ['dataHoraInicio', 'dataHoraEncerramento', 'ultimaMensagem', 'lastMessageAt', 'createdAt']:
-            if field in update_data and isinstance(update_data[field], str):
-                try:
-                    for fmt in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                        try:
-                            update_data[field] = datetime.strptime(update_data[field], fmt)
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    logger.warning(f"Não foi possível converter timestamp para o campo {field}: {e}")
+        _normalize_timestamps(update_data)
         
         # Adiciona timestamp de atualização
-        update_data['updated_at'] = firestore.SERVER_TIMESTAMP
+        update_data['updated_at'] = SERVER_TIMESTAMP
         
-        # Atualiza o documento
+        # Atualiza o documento e, com o lock da conversa, as entradas em cache
         doc_ref = db.collection('conversas').document(conversation_id)
-        doc_ref.update(update_data)
+        with get_conversation_lock(conversation_id):
+            doc_ref.update(update_data, retry=WRITE_RETRY)
+            _write_through_conversation(conversation_id, update_data)
         
-        logger.info(f"Conversa {conversation_id} atualizada com sucesso")
+        logger.info("Conversa %s atualizada com sucesso", conversation_id)
         return True
     except Exception as e:
         logger.error(f"Erro ao atualizar conversa {conversation_id}: {e}")
         logger.exception("Detalhes do erro:")
         return False
 
-@invalidate_cache('conversation:*')
+@invalidate_cache(key_fn=lambda conversation_id, status: _conversation_tags(None, ('status',)))
 def update_conversation_status(conversation_id: str, status: str) -> None:
     """
     Atualiza o status de uma conversa no Firebase.
@@ -205,23 +694,26 @@ def update_conversation_status(conversation_id: str, status: str) -> None:
         status: Novo status da conversa (ACTIVE, CLOSED, etc)
     """
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         conversation_ref = db.collection('conversas').document(conversation_id)
         
         # Atualiza o status e o timestamp da última atualização
-        conversation_ref.update({
+        update_data = {
             'status': status,
-            'updated_at': firestore.SERVER_TIMESTAMP
-        })
+            'updated_at': SERVER_TIMESTAMP
+        }
+        with get_conversation_lock(conversation_id):
+            conversation_ref.update(update_data)
+            _write_through_conversation(conversation_id, update_data)
         
-        logger.info(f"Status da conversa {conversation_id} atualizado para {status}")
+        logger.info("Status da conversa %s atualizado para %s", conversation_id, status)
         
     except Exception as e:
         logger.error(f"Erro ao atualizar status da conversa {conversation_id}: {e}")
         raise
 
 # Funções para a coleção 'mensagens'
-@cached(ttl=CACHE_TTL, pattern='messages:*')
+@cached(ttl=CACHE_TTL, key_fn=lambda conversation_id, limit=100: f'messages:{conversation_id}:{limit}')
 def get_messages_by_conversation(conversation_id: str, limit: int = 100) -> List[Dict]:
     """
     Obtém mensagens de uma conversa, verificando tanto na subcoleção quanto na coleção separada.
@@ -234,37 +726,31 @@ def get_messages_by_conversation(conversation_id: str, limit: int = 100) -> List
         List[Dict]: Lista de mensagens da conversa
     """
     try:
-        db = get_firestore_db()
-        messages = []
+        db = _pick_db()
+        
+        def read_messages(query) -> List[Dict]:
+            return [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
         
-        # Primeiro, tenta buscar mensagens na subcoleção do documento da conversa
-        subcollection_msgs = (db.collection('conversas')
+        # Subcoleção do documento da conversa (preferida)
+        subcollection_query = (db.collection('conversas')
                                .document(conversation_id)
                                .collection('mensagens')
-                               .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                               .limit(limit)
-                               .stream())
-        
-        for doc in subcollection_msgs:
-            msg_data = doc.to_dict()
-            msg_data['id'] = doc.id
-            messages.append(msg_data)
-        
-        # Se não encontrou mensagens na subcoleção, tenta na coleção separada
-        if not messages:
-            collection_msgs = (db.collection('mensagens')
-                                .where(filter=firestore.FieldFilter('conversation_id', '==', conversation_id))
-                                .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                                .limit(limit)
-                                .stream())
-            
-            for doc in collection_msgs:
-                msg_data = doc.to_dict()
-                msg_data['id'] = doc.id
-                messages.append(msg_data)
+                               .order_by('timestamp', direction=_DESCENDING)
+                               .limit(limit))
+        
+        # Coleção separada, consultada em paralelo para o caso da subcoleção estar vazia
+        collection_query = (db.collection('mensagens')
+                            .where(filter=FieldFilter('conversation_id', '==', conversation_id))
+                            .order_by('timestamp', direction=_DESCENDING)
+                            .limit(limit))
+        
+        messages = _first_non_empty(
+            lambda: read_messages(subcollection_query),
+            lambda: read_messages(collection_query)
+        )
         
         # Registra o resultado
-        logger.info(f"Recuperadas {len(messages)} mensagens para a conversa {conversation_id}")
+        logger.info("Recuperadas %d mensagens para a conversa %s", len(messages), conversation_id)
         
         return messages
     except Exception as e:
@@ -272,7 +758,7 @@ def get_messages_by_conversation(conversation_id: str, limit: int = 100) -> List
         logger.exception("Detalhes do erro:")
         return []
 
-@invalidate_cache('messages:*')
+@invalidate_cache(key_fn=lambda conversation_id, message_data: f'messages:{conversation_id}')
 def save_message(conversation_id: str, message_data: Dict[str, Any]) -> bool:
     """
     Salva uma mensagem na subcoleção de mensagens de uma conversa.
@@ -289,7 +775,7 @@ def save_message(conversation_id: str, message_data: Dict[str, Any]) -> bool:
         bool: True se salvou com sucesso, False caso contrário
     """
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         
         # Referência para a subcoleção de mensagens da conversa
         messages_ref = db.collection('conversas').document(conversation_id).collection('mensagens')
@@ -297,24 +783,63 @@ def save_message(conversation_id: str, message_data: Dict[str, Any]) -> bool:
         # Adiciona a mensagem
         messages_ref.add(message_data)
         
-        logger.info(f"Mensagem salva com sucesso na conversa {conversation_id}")
+        logger.info("Mensagem salva com sucesso na conversa %s", conversation_id)
         return True
         
     except Exception as e:
         logger.error(f"Erro ao salvar mensagem: {e}")
         return False
 
+@invalidate_cache(key_fn=lambda conversation_id, messages: f'messages:{conversation_id}')
+def save_messages_bulk(conversation_id: str, messages: List[Dict[str, Any]]) -> int:
+    """
+    Salva várias mensagens na subcoleção de uma conversa com escritas em lote.
+    
+    Args:
+        conversation_id: ID da conversa
+        messages: Lista de mensagens no mesmo formato de save_message
+        
+    Returns:
+        int: Número de mensagens salvas (0 em caso de erro)
+    """
+    try:
+        messages_ref = (_pick_db()
+                        .collection('conversas')
+                        .document(conversation_id)
+                        .collection('mensagens'))
+        
+        saved = _commit_in_batches((messages_ref.document(), message) for message in messages)
+        logger.info("%d mensagens salvas em lote na conversa %s", saved, conversation_id)
+        return saved
+        
+    except Exception as e:
+        logger.error(f"Erro ao salvar mensagens em lote na conversa {conversation_id}: {e}")
+        return 0
+
 # Funções para a coleção 'solicitacoes'
 @cached(ttl=CACHE_TTL, pattern='solicitacoes:*')
-def get_solicitacoes_by_status(status: str, limit: int = 50) -> List[Dict]:
-    """Obtém solicitações por status"""
+def get_solicitacoes_by_status(status: str, limit: int = 50,
+                               fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+    """
+    Obtém solicitações por status
+    
+    Args:
+        status: Status das solicitações
+        limit: Número máximo de solicitações a retornar
+        fields: Campos a retornar (projeção no servidor); None retorna o documento inteiro
+        
+    Returns:
+        List[Dict]: Lista de solicitações
+    """
     try:
         solicitacoes = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('solicitacoes')
-                .where(filter=firestore.FieldFilter('status', '==', status))
-                .order_by('data_criacao', direction=firestore.Query.DESCENDING)
+                .where(filter=FieldFilter('status', '==', status))
+                .order_by('data_criacao', direction=_DESCENDING)
                 .limit(limit))
+        if fields:
+            query = query.select(fields)
         
         for doc in query.stream():
             solicitacoes.append(doc.to_dict())
@@ -328,10 +853,10 @@ def get_solicitacoes_by_status(status: str, limit: int = 50) -> List[Dict]:
 def create_solicitacao(solicitacao_data: Dict) -> str:
     """Cria uma nova solicitação"""
     try:
-        doc_ref = get_firestore_db().collection('solicitacoes').document()
+        doc_ref = _pick_db().collection('solicitacoes').document()
         solicitacao_data.update({
-            'data_criacao': firestore.SERVER_TIMESTAMP,
-            'ultima_atualizacao': firestore.SERVER_TIMESTAMP
+            'data_criacao': SERVER_TIMESTAMP,
+            'ultima_atualizacao': SERVER_TIMESTAMP
         })
         doc_ref.set(solicitacao_data)
         return doc_ref.id
@@ -339,12 +864,38 @@ def create_solicitacao(solicitacao_data: Dict) -> str:
         logger.error(f"Erro ao criar solicitação: {e}")
         raise
 
+@invalidate_cache('solicitacoes:*')
+def create_solicitacoes_bulk(solicitacoes: List[Dict]) -> List[str]:
+    """
+    Cria várias solicitações com escritas em lote
+    
+    Args:
+        solicitacoes: Lista de dados das solicitações
+        
+    Returns:
+        Lista de IDs das solicitações criadas
+    """
+    try:
+        collection = _pick_db().collection('solicitacoes')
+        writes = []
+        for solicitacao_data in solicitacoes:
+            solicitacao_data.update({
+                'data_criacao': SERVER_TIMESTAMP,
+                'ultima_atualizacao': SERVER_TIMESTAMP
+            })
+            writes.append((collection.document(), solicitacao_data))
+        _commit_in_batches(writes)
+        return [doc_ref.id for doc_ref, _ in writes]
+    except Exception as e:
+        logger.error(f"Erro ao criar solicitações em lote: {e}")
+        raise
+
 @invalidate_cache('solicitacoes:*')
 def update_solicitacao(solicitacao_id: str, update_data: Dict) -> bool:
     """Atualiza uma solicitação existente"""
     try:
-        db = get_firestore_db()
-        update_data['ultima_atualizacao'] = firestore.SERVER_TIMESTAMP
+        db = _pick_db()
+        update_data['ultima_atualizacao'] = SERVER_TIMESTAMP
         db.collection('solicitacoes').document(solicitacao_id).update(update_data)
         return True
     except Exception as e:
@@ -353,24 +904,41 @@ def update_solicitacao(solicitacao_id: str, update_data: Dict) -> bool:
 
 @cached(ttl=CACHE_TTL, pattern='solicitacoes:*')
 def get_solicitacao(solicitacao_id: str) -> Optional[Dict]:
-    """Obtém uma solicitação específica"""
+    """Obtém uma solicitação específica (para vários IDs use get_solicitacoes_by_ids)"""
     try:
-        doc = get_firestore_db().collection('solicitacoes').document(solicitacao_id).get()
+        doc = _pick_db().collection('solicitacoes').document(solicitacao_id).get()
         return doc.to_dict() if doc.exists else None
     except Exception as e:
         logger.error(f"Erro ao obter solicitação: {e}")
         return None
 
+@cached_batch(key_fn=lambda solicitacao_id: f'solicitacoes:{solicitacao_id}', ttl=CACHE_TTL)
+def get_solicitacoes_by_ids(solicitacao_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Obtém várias solicitações pelos IDs em uma única requisição
+    
+    Args:
+        solicitacao_ids: IDs das solicitações
+        
+    Returns:
+        Dicionário de ID -> dados das solicitações encontradas
+    """
+    try:
+        return _get_documents_by_ids('solicitacoes', solicitacao_ids)
+    except Exception as e:
+        logger.error(f"Erro ao obter solicitações {solicitacao_ids}: {e}")
+        return {}
+
 # Funções para a coleção 'avaliacoes'
 @cached(ttl=CACHE_TTL, pattern='avaliacoes:*')
 def get_avaliacoes_by_conversation(conversation_id: str) -> List[Dict]:
     """Obtém avaliações de uma conversa"""
     try:
         avaliacoes = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('avaliacoes')
-                .where(filter=firestore.FieldFilter('conversation_id', '==', conversation_id))
-                .order_by('data_criacao', direction=firestore.Query.DESCENDING))
+                .where(filter=FieldFilter('conversation_id', '==', conversation_id))
+                .order_by('data_criacao', direction=_DESCENDING))
         
         for doc in query.stream():
             avaliacoes.append(doc.to_dict())
@@ -384,9 +952,9 @@ def get_avaliacoes_by_conversation(conversation_id: str) -> List[Dict]:
 def create_avaliacao(avaliacao_data: Dict) -> str:
     """Cria uma nova avaliação"""
     try:
-        doc_ref = get_firestore_db().collection('avaliacoes').document()
+        doc_ref = _pick_db().collection('avaliacoes').document()
         avaliacao_data.update({
-            'data_criacao': firestore.SERVER_TIMESTAMP
+            'data_criacao': SERVER_TIMESTAMP
         })
         doc_ref.set(avaliacao_data)
         return doc_ref.id
@@ -394,35 +962,147 @@ def create_avaliacao(avaliacao_data: Dict) -> str:
         logger.error(f"Erro ao criar avaliação: {e}")
         raise
 
+@invalidate_cache('avaliacoes:*')
+def create_avaliacoes_bulk(avaliacoes: List[Dict]) -> List[str]:
+    """
+    Cria várias avaliações com escritas em lote
+    
+    Args:
+        avaliacoes: Lista de dados das avaliações
+        
+    Returns:
+        Lista de IDs das avaliações criadas
+    """
+    try:
+        collection = _pick_db().collection('avaliacoes')
+        writes = []
+        for avaliacao_data in avaliacoes:
+            avaliacao_data.update({
+                'data_criacao': SERVER_TIMESTAMP
+            })
+            writes.append((collection.document(), avaliacao_data))
+        _commit_in_batches(writes)
+        return [doc_ref.id for doc_ref, _ in writes]
+    except Exception as e:
+        logger.error(f"Erro ao criar avaliações em lote: {e}")
+        raise
+
 @cached(ttl=CACHE_TTL, pattern='avaliacoes:*')
 def get_avaliacao(avaliacao_id: str) -> Optional[Dict]:
-    """Obtém uma avaliação específica"""
+    """Obtém uma avaliação específica (para vários IDs use get_avaliacoes_by_ids)"""
     try:
-        doc = get_firestore_db().collection('avaliacoes').document(avaliacao_id).get()
+        doc = _pick_db().collection('avaliacoes').document(avaliacao_id).get()
         return doc.to_dict() if doc.exists else None
     except Exception as e:
         logger.error(f"Erro ao obter avaliação: {e}")
         return None
 
+@cached_batch(key_fn=lambda avaliacao_id: f'avaliacoes:{avaliacao_id}', ttl=CACHE_TTL)
+def get_avaliacoes_by_ids(avaliacao_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Obtém várias avaliações pelos IDs em uma única requisição
+    
+    Args:
+        avaliacao_ids: IDs das avaliações
+        
+    Returns:
+        Dicionário de ID -> dados das avaliações encontradas
+    """
+    try:
+        return _get_documents_by_ids('avaliacoes', avaliacao_ids)
+    except Exception as e:
+        logger.error(f"Erro ao obter avaliações {avaliacao_ids}: {e}")
+        return {}
+
 # Funções para a coleção 'consolidada_atendimentos'
+def _as_utc(value: datetime) -> datetime:
+    """Converte uma data para UTC; datas sem fuso são tratadas como UTC, como no Firestore"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _period_bucket(value: datetime) -> str:
+    """Retorna o bucket mensal (YYYYMM) de uma data, usado nas consultas por período"""
+    return _as_utc(value).strftime('%Y%m')
+
+def _period_buckets(start_date: datetime, end_date: datetime) -> List[str]:
+    """Retorna os buckets mensais de start_date até end_date, inclusive"""
+    start, end = _as_utc(start_date), _as_utc(end_date)
+    year, month = start.year, start.month
+    buckets = []
+    while (year, month) <= (end.year, end.month):
+        buckets.append(f'{year:04d}{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
 @cached(ttl=CACHE_TTL, pattern='consolidado:*')
 def get_consolidado_by_period(start_date: datetime, end_date: datetime) -> Optional[Dict]:
-    """Obtém dados consolidados por período"""
+    """
+    Obtém dados consolidados por período
+    
+    Consulta por igualdade no campo period_bucket (mês de data_inicio), que usa
+    o índice simples do campo, e filtra as datas exatas em memória, em vez de
+    combinar dois filtros de intervalo em campos diferentes. Se nada for
+    encontrado, consulta por data_inicio os registros antigos sem period_bucket.
+    
+    Args:
+        start_date: Início do período
+        end_date: Fim do período
+        
+    Returns:
+        Primeiro registro com data_inicio >= start_date e data_fim <= end_date, ou None
+    """
     try:
-        query = (get_firestore_db()
-                .collection('consolidada_atendimentos')
-                .where(filter=firestore.FieldFilter('data_inicio', '>=', start_date))
-                .where(filter=firestore.FieldFilter('data_fim', '<=', end_date))
-                .limit(1))
+        collection = _pick_db().collection('consolidada_atendimentos')
+        start, end = _as_utc(start_date), _as_utc(end_date)
+        buckets = _period_buckets(start_date, end_date)
+        
+        def first_in_period(query) -> Optional[Dict]:
+            for doc in query.stream():
+                data = doc.to_dict()
+                data_inicio, data_fim = data.get('data_inicio'), data.get('data_fim')
+                if not isinstance(data_inicio, datetime) or not isinstance(data_fim, datetime):
+                    continue
+                if _as_utc(data_inicio) >= start and _as_utc(data_fim) <= end:
+                    return data
+            return None
         
-        for doc in query.stream():
-            return doc.to_dict()
-            
-        return None
+        for i in range(0, len(buckets), FIRESTORE_IN_MAX_VALUES):
+            data = first_in_period(collection.where(filter=FieldFilter(
+                'period_bucket', 'in', buckets[i:i + FIRESTORE_IN_MAX_VALUES]
+            )))
+            if data is not None:
+                return data
+        
+        # Registros gravados antes do period_bucket (ainda não migrados por
+        # MigrationManager.migrate_consolidado) só são achados por data_inicio
+        return first_in_period(collection
+                               .where(filter=FieldFilter('data_inicio', '>=', start_date))
+                               .where(filter=FieldFilter('data_inicio', '<=', end_date)))
     except Exception as e:
         logger.error(f"Erro ao obter dados consolidados: {e}")
         return None
 
+@invalidate_cache('consolidado:*')
+def create_consolidado(consolidado_data: Dict) -> str:
+    """
+    Cria um registro consolidado
+    
+    Args:
+        consolidado_data: Dados do registro, contendo data_inicio e data_fim
+        
+    Returns:
+        ID do registro criado
+    """
+    try:
+        consolidado_data['period_bucket'] = _period_bucket(consolidado_data['data_inicio'])
+        doc_ref = _pick_db().collection('consolidada_atendimentos').document()
+        doc_ref.set(consolidado_data, retry=WRITE_RETRY)
+        return doc_ref.id
+    except Exception as e:
+        logger.error(f"Erro ao criar registro consolidado: {e}")
+        raise
+
 @invalidate_cache('consolidated:*')
 def save_consolidated_attendance(consolidated_data: Dict) -> Optional[str]:
     """
@@ -447,7 +1127,7 @@ def save_consolidated_attendance(consolidated_data: Dict) -> Optional[str]:
             
         # Garante que temos um timestamp de criação
         if 'created_at' not in consolidated_data:
-            consolidated_data['created_at'] = datetime.datetime.now()
+            consolidated_data['created_at'] = datetime.now()
         
         # Garante que o status é válido
         if 'statusFinal' not in consolidated_data:
@@ -466,22 +1146,14 @@ def save_consolidated_attendance(consolidated_data: Dict) -> Optional[str]:
                 consolidated_data['notaGeral'] = 0
             
         # Conecta ao Firestore
-        db = get_firestore_db()
+        db = _pick_db()
         
         # Usa o conversation_id como ID do documento para evitar duplicidade
         doc_id = consolidated_data['conversation_id']
         
-        # Verifica se já existe um documento com este ID
-        existing_doc = db.collection('consolidadoAtendimentos').document(doc_id).get()
-        
-        if existing_doc.exists:
-            # Se já existe, atualiza os dados
-            db.collection('consolidadoAtendimentos').document(doc_id).update(consolidated_data)
-            logger.info(f"Atendimento consolidado atualizado para conversa {doc_id}")
-        else:
-            # Se não existe, cria um novo documento
-            db.collection('consolidadoAtendimentos').document(doc_id).set(consolidated_data)
-            logger.info(f"Novo atendimento consolidado criado para conversa {doc_id}")
+        # Cria o documento ou mescla os dados no existente, em uma única escrita
+        db.collection('consolidadoAtendimentos').document(doc_id).set(consolidated_data, merge=True)
+        logger.info("Atendimento consolidado salvo para conversa %s", doc_id)
         
         return doc_id
     except Exception as e:
@@ -492,108 +1164,94 @@ def save_consolidated_attendance(consolidated_data: Dict) -> Optional[str]:
 
 @cached(ttl=CACHE_TTL, pattern='consolidado:*')
 def get_consolidado(consolidado_id: str) -> Optional[Dict]:
-    """Obtém um registro consolidado específico"""
+    """Obtém um registro consolidado específico (para vários IDs use get_consolidados_by_ids)"""
     try:
-        doc = get_firestore_db().collection('consolidada_atendimentos').document(consolidado_id).get()
+        doc = _pick_db().collection('consolidada_atendimentos').document(consolidado_id).get()
         return doc.to_dict() if doc.exists else None
     except Exception as e:
         logger.error(f"Erro ao obter registro consolidado: {e}")
         return None
 
+@cached_batch(key_fn=lambda consolidado_id: f'consolidado:{consolidado_id}', ttl=CACHE_TTL)
+def get_consolidados_by_ids(consolidado_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Obtém vários registros consolidados pelos IDs em uma única requisição
+    
+    Args:
+        consolidado_ids: IDs dos registros consolidados
+        
+    Returns:
+        Dicionário de ID -> dados dos registros encontrados
+    """
+    try:
+        return _get_documents_by_ids('consolidada_atendimentos', consolidado_ids)
+    except Exception as e:
+        logger.error(f"Erro ao obter registros consolidados {consolidado_ids}: {e}")
+        return {}
+
 # Funções de consulta
-def get_conversations(limit: int = 50) -> List[Dict]:
+def get_conversations(limit: int = 50, fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
     """
     Obtém as conversas mais recentes.
     
     Args:
         limit: Número máximo de conversas a retornar
+        fields: Campos a retornar (projeção no servidor, ex.: CONVERSATION_SUMMARY_FIELDS);
+            None retorna o documento inteiro
         
     Returns:
         Lista de conversas ordenadas por data de última atualização
     """
     try:
-        conversations = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('conversas')
-                .order_by('ultimaMensagem', direction=firestore.Query.DESCENDING)
+                .order_by('ultimaMensagem', direction=_DESCENDING)
                 .limit(limit))
+        if fields:
+            query = query.select(fields)
         
-        for doc in query.stream():
-            data = doc.to_dict()
-            data['id'] = doc.id
-            conversations.append(data)
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
             
-        logger.info(f"Recuperadas {len(conversations)} conversas recentes")
+        logger.info("Recuperadas %d conversas recentes", len(conversations))
         return conversations
     
     except Exception as e:
         logger.error(f"Erro ao obter conversas: {e}")
         return []
 
-def get_solicitacoes_by_status(status: str, limit: int = 50) -> List[Dict]:
-    """Obtém solicitações por status"""
-    try:
-        solicitacoes = []
-        query = (get_firestore_db()
-                .collection('solicitacoes')
-                .where(filter=firestore.FieldFilter('status', '==', status))
-                .order_by('data_criacao', direction=firestore.Query.DESCENDING)
-                .limit(limit))
-        
-        for doc in query.stream():
-            solicitacoes.append(doc.to_dict())
-            
-        return solicitacoes
-    
-    except Exception as e:
-        logger.error(f"Erro ao obter solicitações: {e}")
-        return []
-
-def get_avaliacoes_by_conversation(conversation_id: str) -> List[Dict]:
-    """Obtém avaliações de uma conversa"""
-    try:
-        avaliacoes = []
-        query = (get_firestore_db()
-                .collection('avaliacoes')
-                .where(filter=firestore.FieldFilter('conversation_id', '==', conversation_id))
-                .order_by('data_criacao', direction=firestore.Query.DESCENDING))
-        
-        for doc in query.stream():
-            avaliacoes.append(doc.to_dict())
-            
-        return avaliacoes
-    
-    except Exception as e:
-        logger.error(f"Erro ao obter avaliações: {e}")
-        return []
-
 def clear_all_caches():
     """Limpa todos os caches"""
     cache_manager.clear()
     logger.info("Todos os caches foram limpos")
 
+def invalidate_collection_cache(collection: str):
+    """
+    Invalida as entradas de cache com dados de uma coleção
+    
+    Args:
+        collection: Nome da coleção; para coleções sem padrões conhecidos
+            todo o cache é limpo
+    """
+    patterns = COLLECTION_CACHE_PATTERNS.get(collection)
+    if patterns is None:
+        clear_all_caches()
+        return
+    for pattern in patterns:
+        cache_manager.invalidate_pattern(pattern)
+
 # Funções para gerenciamento de mídia
 def upload_media(file_path: str, content_type: str, conversation_id: str) -> str:
     """Upload de arquivo de mídia para o Firebase Storage"""
     try:
-        if not firebase_app:
-            init_firebase()
-            
-        bucket = storage.bucket()
+        bucket = get_storage_bucket()
         filename = os.path.basename(file_path)
         blob_name = f"media/{conversation_id}/{filename}"
         
         blob = bucket.blob(blob_name)
         blob.upload_from_filename(file_path, content_type=content_type)
         
-        # Gera URL pública com token de acesso
-        url = blob.generate_signed_url(
-            version="v4",
-            expiration=3600,  # URL válida por 1 hora
-            method="GET"
-        )
-        
-        return url
+        # Gera URL pública com token de acesso, já em cache para as leituras seguintes
+        return _signed_media_url(blob_name)
     except Exception as e:
         logger.error(f"Erro ao fazer upload de mídia: {e}")
         raise
@@ -601,10 +1259,7 @@ def upload_media(file_path: str, content_type: str, conversation_id: str) -> str
 def delete_media(media_url: str) -> bool:
     """Deleta um arquivo de mídia do Firebase Storage"""
     try:
-        if not firebase_app:
-            init_firebase()
-            
-        bucket = storage.bucket()
+        bucket = get_storage_bucket()
         # Extrai o nome do blob da URL
         blob_name = media_url.split('/')[-1]
         blob = bucket.blob(blob_name)
@@ -615,26 +1270,50 @@ def delete_media(media_url: str) -> bool:
         logger.error(f"Erro ao deletar mídia: {e}")
         return False
 
+@cached(ttl=MEDIA_URL_EXPIRATION - SIGNED_URL_SAFETY_MARGIN,
+        key_fn=lambda blob_name, method="GET": f'signed_url:{blob_name}')
+def _signed_media_url(blob_name: str, method: str = "GET") -> str:
+    """
+    Gera a URL assinada (v4) de um arquivo; a assinatura é local, sem requisição ao Storage
+    
+    A URL fica em cache por menos tempo que a sua validade, então uma URL
+    reutilizada nunca está perto de expirar.
+    
+    Args:
+        blob_name: Caminho do arquivo no bucket
+        method: Método HTTP autorizado pela URL
+        
+    Returns:
+        URL assinada
+    """
+    return get_storage_bucket().blob(blob_name).generate_signed_url(
+        version="v4",
+        expiration=MEDIA_URL_EXPIRATION,
+        method=method
+    )
+
 def get_media_url(media_id: str) -> Optional[str]:
-    """Obtém a URL de um arquivo de mídia"""
+    """
+    Obtém a URL de um arquivo de mídia
+    
+    Não verifica se o arquivo existe: para um arquivo ausente a URL retorna 404.
+    Use get_media_url_strict quando a existência precisar ser confirmada.
+    """
     try:
-        if not firebase_app:
-            init_firebase()
-            
-        bucket = storage.bucket()
-        blob = bucket.blob(f"media/{media_id}")
+        return _signed_media_url(f"media/{media_id}")
+    except Exception as e:
+        logger.error(f"Erro ao obter URL da mídia: {e}")
+        return None
+
+def get_media_url_strict(media_id: str) -> Optional[str]:
+    """Obtém a URL de um arquivo de mídia, ou None se o arquivo não existir"""
+    try:
+        blob = get_storage_bucket().blob(f"media/{media_id}")
         
         if not blob.exists():
             return None
             
-        # Gera URL pública com token de acesso
-        url = blob.generate_signed_url(
-            version="v4",
-            expiration=3600,  # URL válida por 1 hora
-            method="GET"
-        )
-        
-        return url
+        return _signed_media_url(blob.name)
     except Exception as e:
         logger.error(f"Erro ao obter URL da mídia: {e}")
         return None
@@ -655,50 +1334,40 @@ def get_last_message_time(conversation_id: str) -> Optional[Union[float, datetim
         Optional[Union[float, datetime]]: Timestamp da última mensagem ou None se não houver mensagens
     """
     try:
-        db = get_firestore_db()
-        
-        # Primeiro, tenta buscar as mensagens na subcoleção de mensagens da conversa
-        messages_ref = db.collection('conversas').document(conversation_id).collection('mensagens')
-        last_message_query = messages_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1).get()
-        
-        if len(last_message_query) > 0:
-            timestamp = last_message_query[0].get('timestamp')
-            # Retorna o timestamp conforme encontrado (pode ser datetime ou numérico)
-            return timestamp
-            
-        # Se não encontrou na subcoleção, tenta na coleção separada de mensagens
-        messages_ref = db.collection('mensagens')
-        last_message_query = messages_ref.where(
-            filter=firestore.FieldFilter('conversation_id', '==', conversation_id)
-        ).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1).get()
-        
-        if len(last_message_query) > 0:
-            timestamp = last_message_query[0].get('timestamp')
-            # Retorna o timestamp conforme encontrado (pode ser datetime ou numérico)
-            return timestamp
-        
-        # Se ainda não encontrou, busca no documento da conversa
+        # save_message grava 'ultimaMensagem' no documento da conversa no mesmo
+        # commit da mensagem, então basta a leitura (em cache) da conversa
         conversation = get_conversation(conversation_id)
-        if conversation and 'ultimaMensagem' in conversation:
+        if conversation and conversation.get('ultimaMensagem') is not None:
             # Tenta converter o timestamp do formato string para datetime ou numérico
-            ultima_mensagem = conversation.get('ultimaMensagem')
+            ultima_mensagem = conversation['ultimaMensagem']
             if isinstance(ultima_mensagem, str):
-                try:
-                    # Tenta parser vários formatos de data/hora em string
-                    for fmt in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                        try:
-                            return datetime.strptime(ultima_mensagem, fmt)
-                        except ValueError:
-                            continue
-                    
-                    # Se chegou aqui, nenhum dos formatos funcionou
-                    logger.warning(f"Formato de data/hora não reconhecido: {ultima_mensagem}")
-                except Exception as parse_error:
-                    logger.error(f"Erro ao converter timestamp da string: {parse_error}")
+                parsed = _parse_ts(ultima_mensagem)
+                if parsed is not None:
+                    return parsed
+                logger.warning(f"Formato de data/hora não reconhecido: {ultima_mensagem}")
             
             # Se não for string ou não puder converter, retorna como está
             return ultima_mensagem
         
+        # Conversas antigas sem o campo: busca a última mensagem na subcoleção
+        # e, em paralelo, na coleção separada de mensagens
+        db = _pick_db()
+        subcollection_query = (db.collection('conversas')
+                               .document(conversation_id)
+                               .collection('mensagens')
+                               .order_by('timestamp', direction=_DESCENDING)
+                               .limit(1))
+        collection_query = (db.collection('mensagens')
+                            .where(filter=FieldFilter('conversation_id', '==', conversation_id))
+                            .order_by('timestamp', direction=_DESCENDING)
+                            .limit(1))
+        
+        last_message_query = _first_non_empty(subcollection_query.get, collection_query.get)
+        
+        if len(last_message_query) > 0:
+            # Retorna o timestamp conforme encontrado (pode ser datetime ou numérico)
+            return last_message_query[0].get('timestamp')
+        
         # Se chegou aqui é porque não encontrou informação de timestamp
         logger.warning(f"Nenhuma mensagem ou timestamp encontrado para a conversa {conversation_id}")
         return None
@@ -707,29 +1376,30 @@ def get_last_message_time(conversation_id: str) -> Optional[Union[float, datetim
         logger.error(f"Erro ao obter última mensagem da conversa {conversation_id}: {e}")
         return None
 
-@cached(ttl=CACHE_TTL, pattern='conversations:*')
-def get_conversations_by_status(status: str, limit: int = 50) -> List[Dict]:
+@cached(ttl=CACHE_TTL, key_fn=lambda status, limit=50, fields=None: f'conversations:status:{status}')
+def get_conversations_by_status(status: str, limit: int = 50,
+                                fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
     """
     Obtém conversas com um determinado status.
     
     Args:
         status: Status das conversas a serem retornadas
         limit: Número máximo de conversas a retornar
+        fields: Campos a retornar (projeção no servidor, ex.: CONVERSATION_SUMMARY_FIELDS);
+            None retorna o documento inteiro
         
     Returns:
         List[Dict]: Lista de conversas com o status especificado
     """
     try:
-        conversations = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('conversas')
-                .where(filter=firestore.FieldFilter('status', '==', status))
+                .where(filter=FieldFilter('status', '==', status))
                 .limit(limit))
+        if fields:
+            query = query.select(fields)
         
-        for doc in query.stream():
-            conversation = doc.to_dict()
-            conversation['id'] = doc.id
-            conversations.append(conversation)
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
         
         return conversations
         
@@ -737,38 +1407,43 @@ def get_conversations_by_status(status: str, limit: int = 50) -> List[Dict]:
         logger.error(f"Erro ao obter conversas com status {status}: {e}")
         return []
 
-@cached(ttl=CACHE_TTL, pattern='conversations:*')
-def get_conversations_by_tag(tag: str, limit: int = 50) -> List[Dict]:
+@cached(ttl=CACHE_TTL, key_fn=lambda tag, limit=50, fields=None: f'conversations:tag:{tag}')
+def get_conversations_by_tag(tag: str, limit: int = 50,
+                             fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
     """
     Obtém conversas que possuem uma determinada tag.
     
     Args:
         tag: Tag a ser buscada nas conversas
         limit: Número máximo de conversas a retornar
+        fields: Campos a retornar (projeção no servidor, ex.: CONVERSATION_SUMMARY_FIELDS);
+            None retorna o documento inteiro
         
     Returns:
         List[Dict]: Lista de conversas com a tag especificada
     """
     try:
-        conversations = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('conversas')
-                .where(filter=firestore.FieldFilter('tags', 'array_contains', tag))
+                .where(filter=FieldFilter('tags', 'array_contains', tag))
                 .limit(limit))
+        if fields:
+            query = query.select(fields)
         
-        for doc in query.stream():
-            conversation = doc.to_dict()
-            conversation['id'] = doc.id
-            conversations.append(conversation)
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
         
-        logger.info(f"Recuperadas {len(conversations)} conversas com a tag '{tag}'")
+        logger.info("Recuperadas %d conversas com a tag '%s'", len(conversations), tag)
         return conversations
         
     except Exception as e:
         logger.error(f"Erro ao obter conversas com tag {tag}: {e}")
         return []
 
-@invalidate_cache('requests:*')
+def _request_tag(conversation_id: Optional[str]) -> str:
+    """Tag das listas de solicitações em cache de uma conversa (todas, se desconhecida)"""
+    return f'requests:{conversation_id}' if conversation_id else 'requests:*'
+
+@invalidate_cache(key_fn=lambda request_data: _request_tag(request_data.get('conversation_id')))
 def create_request(request_data: Dict) -> str:
     """
     Cria uma nova solicitação no Firebase.
@@ -780,10 +1455,10 @@ def create_request(request_data: Dict) -> str:
         ID da solicitação criada
     """
     try:
-        doc_ref = get_firestore_db().collection('solicitacoes').document()
+        doc_ref = _pick_db().collection('solicitacoes').document()
         request_data.update({
-            'created_at': firestore.SERVER_TIMESTAMP,
-            'updated_at': firestore.SERVER_TIMESTAMP,
+            'created_at': SERVER_TIMESTAMP,
+            'updated_at': SERVER_TIMESTAMP,
             'status': 'PENDING'
         })
         doc_ref.set(request_data)
@@ -792,11 +1467,14 @@ def create_request(request_data: Dict) -> str:
         logger.error(f"Erro ao criar solicitação: {e}")
         raise
 
-@invalidate_cache('requests:*')
+@invalidate_cache(key_fn=lambda request_id, update_data: _request_tag(update_data.get('conversation_id')))
 def update_request(request_id: str, update_data: Dict) -> bool:
     """
     Atualiza uma solicitação existente no Firebase.
     
+    Sem 'conversation_id' em update_data, todas as listas de solicitações em
+    cache são invalidadas, pois a conversa da solicitação não é conhecida.
+    
     Args:
         request_id: ID da solicitação
         update_data: Dados a serem atualizados
@@ -805,15 +1483,15 @@ def update_request(request_id: str, update_data: Dict) -> bool:
         True se a atualização foi bem sucedida, False caso contrário
     """
     try:
-        db = get_firestore_db()
-        update_data['updated_at'] = firestore.SERVER_TIMESTAMP
+        db = _pick_db()
+        update_data['updated_at'] = SERVER_TIMESTAMP
         db.collection('solicitacoes').document(request_id).update(update_data)
         return True
     except Exception as e:
         logger.error(f"Erro ao atualizar solicitação {request_id}: {e}")
         return False
 
-@cached(ttl=CACHE_TTL, pattern='requests:*')
+@cached(ttl=CACHE_TTL, key_fn=lambda conversation_id, limit=50: _request_tag(conversation_id))
 def get_requests_by_conversation(conversation_id: str, limit: int = 50) -> List[Dict]:
     """
     Obtém solicitações de uma conversa específica.
@@ -826,26 +1504,27 @@ def get_requests_by_conversation(conversation_id: str, limit: int = 50) -> List[
         Lista de solicitações da conversa
     """
     try:
-        requests = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('solicitacoes')
-                .where(filter=firestore.FieldFilter('conversation_id', '==', conversation_id))
-                .order_by('created_at', direction=firestore.Query.DESCENDING)
+                .where(filter=FieldFilter('conversation_id', '==', conversation_id))
+                .order_by('created_at', direction=_DESCENDING)
                 .limit(limit))
         
-        for doc in query.stream():
-            request = doc.to_dict()
-            request['id'] = doc.id
-            requests.append(request)
+        requests = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
             
         return requests
     except Exception as e:
         logger.error(f"Erro ao obter solicitações da conversa {conversation_id}: {e}")
         return []
 
-@invalidate_cache('evaluations:*')
+@invalidate_cache('evaluations:*', key_fn=lambda evaluation_data: _conversation_tags(None, ('avaliada',)))
 def save_evaluation(evaluation_data: Dict) -> str:
-    """Salva uma avaliação para o Agente Avaliador"""
+    """
+    Salva uma avaliação para o Agente Avaliador
+    
+    A avaliação e a marcação da conversa como avaliada são gravadas em um
+    único commit atômico.
+    """
     try:
         conversation_id = evaluation_data.get('conversation_id')
         if not conversation_id:
@@ -853,22 +1532,25 @@ def save_evaluation(evaluation_data: Dict) -> str:
             raise ValueError("conversation_id é obrigatório nos dados de avaliação")
             
         with get_conversation_lock(conversation_id):
-            doc_ref = (get_firestore_db()
-                      .collection('conversas')
-                      .document(conversation_id)
-                      .collection('avaliacoes')
-                      .document())
+            db = _pick_db()
+            conversation_ref = db.collection('conversas').document(conversation_id)
+            doc_ref = conversation_ref.collection('avaliacoes').document()
             
             evaluation_data.update({
-                'data_avaliacao': firestore.SERVER_TIMESTAMP
+                'data_avaliacao': SERVER_TIMESTAMP
             })
-            doc_ref.set(evaluation_data)
             
-            # Atualiza status da conversa
-            update_conversation(conversation_id, {
+            # Grava a avaliação e o status da conversa em um único commit
+            conversation_update = {
                 'avaliada': True,
-                'ultima_avaliacao': firestore.SERVER_TIMESTAMP
-            })
+                'ultima_avaliacao': SERVER_TIMESTAMP,
+                'updated_at': SERVER_TIMESTAMP
+            }
+            batch = db.batch()
+            batch.set(doc_ref, evaluation_data)
+            batch.update(conversation_ref, conversation_update)
+            batch.commit(retry=WRITE_RETRY)
+            _write_through_conversation(conversation_id, conversation_update)
             
             return doc_ref.id
     except Exception as e:
@@ -877,20 +1559,25 @@ def save_evaluation(evaluation_data: Dict) -> str:
 
 # Funções específicas para o Agente Coletor
 @cached(ttl=CACHE_TTL, pattern='collector:*')
-def get_active_conversations(limit: int = 50) -> List[Dict]:
-    """Obtém conversas ativas para o Agente Coletor"""
+def get_active_conversations(limit: int = 50,
+                             fields: Optional[Tuple[str, ...]] = ACTIVE_CONVERSATION_FIELDS) -> List[Dict]:
+    """
+    Obtém conversas ativas para o Agente Coletor
+    
+    Args:
+        limit: Número máximo de conversas a retornar
+        fields: Campos a retornar (projeção no servidor); None retorna o documento inteiro
+    """
     try:
-        conversations = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('conversas')
-                .where(filter=firestore.FieldFilter('status', 'in', ['em_andamento', 'reaberta']))
-                .order_by('ultimaMensagem', direction=firestore.Query.DESCENDING)
+                .where(filter=_ACTIVE_STATUS_FILTER)
+                .order_by('ultimaMensagem', direction=_DESCENDING)
                 .limit(limit))
+        if fields:
+            query = query.select(fields)
         
-        for doc in query.stream():
-            data = doc.to_dict()
-            data['id'] = doc.id
-            conversations.append(data)
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
             
         return conversations
     except Exception as e:
@@ -902,21 +1589,34 @@ def save_message(conversation_id: str, message_data: Dict) -> str:
     """Salva uma nova mensagem para o Agente Coletor"""
     try:
         with get_conversation_lock(conversation_id):
-            doc_ref = (get_firestore_db()
-                      .collection('conversas')
-                      .document(conversation_id)
-                      .collection('mensagens')
-                      .document())
+            db = _pick_db()
+            conversation_ref = db.collection('conversas').document(conversation_id)
+            doc_ref = conversation_ref.collection('mensagens').document()
             
             message_data.update({
-                'timestamp': firestore.SERVER_TIMESTAMP
+                'timestamp': SERVER_TIMESTAMP
             })
-            doc_ref.set(message_data)
             
-            # Atualiza última mensagem da conversa
-            update_conversation(conversation_id, {
-                'ultimaMensagem': firestore.SERVER_TIMESTAMP
-            })
+            # Grava a mensagem e a última mensagem da conversa em um único commit
+            conversation_update = {
+                'ultimaMensagem': SERVER_TIMESTAMP,
+                'updated_at': SERVER_TIMESTAMP
+            }
+            batch = db.batch()
+            batch.set(doc_ref, message_data)
+            batch.update(conversation_ref, conversation_update)
+            batch.commit(retry=WRITE_RETRY)
+            
+            # Write-through: a mensagem entra no início (ordem decrescente) das
+            # listas em cache; a chave de cada lista é (messages, id, limit, ...)
+            message = _resolve_for_cache(message_data)
+            if message is None:
+                cache_manager.invalidate_pattern(('messages', conversation_id))
+            else:
+                message['id'] = doc_ref.id
+                cache_manager.update_pattern(('messages', conversation_id),
+                                             lambda key, messages: ([message] + messages)[:int(key[2])])
+            _write_through_conversation(conversation_id, conversation_update)
             
             return doc_ref.id
     except Exception as e:
@@ -925,21 +1625,26 @@ def save_message(conversation_id: str, message_data: Dict) -> str:
 
 # Funções específicas para o Agente Avaliador
 @cached(ttl=CACHE_TTL, pattern='evaluator:*')
-def get_conversations_to_evaluate(limit: int = 50) -> List[Dict]:
-    """Obtém conversas para avaliação"""
+def get_conversations_to_evaluate(limit: int = 50,
+                                  fields: Optional[Tuple[str, ...]] = EVALUATION_LISTING_FIELDS) -> List[Dict]:
+    """
+    Obtém conversas para avaliação
+    
+    Args:
+        limit: Número máximo de conversas a retornar
+        fields: Campos a retornar (projeção no servidor); None retorna o documento inteiro
+    """
     try:
-        conversations = []
-        query = (get_firestore_db()
+        query = (_pick_db()
                 .collection('conversas')
-                .where(filter=firestore.FieldFilter('status', '==', 'encerrada'))
-                .where(filter=firestore.FieldFilter('avaliada', '==', False))
-                .order_by('dataHoraEncerramento', direction=firestore.Query.DESCENDING)
+                .where(filter=_CLOSED_FILTER)
+                .where(filter=_NOT_EVALUATED_FILTER)
+                .order_by('dataHoraEncerramento', direction=_DESCENDING)
                 .limit(limit))
+        if fields:
+            query = query.select(fields)
         
-        for doc in query.stream():
-            data = doc.to_dict()
-            data['id'] = doc.id
-            conversations.append(data)
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
             
         return conversations
     except Exception as e:
@@ -947,38 +1652,121 @@ def get_conversations_to_evaluate(limit: int = 50) -> List[Dict]:
         return []
 
 # Funções de gerenciamento de locks
-def get_conversation_lock(conversation_id: str) -> Lock:
-    """Obtém ou cria um lock para uma conversa específica"""
-    with global_lock:
-        if conversation_id not in conversation_locks:
-            conversation_locks[conversation_id] = Lock()
-        return conversation_locks[conversation_id]
+@lru_cache(maxsize=CONVERSATION_LOCK_CACHE_SIZE)
+def get_conversation_lock(conversation_id: str) -> RLock:
+    """
+    Obtém o lock de uma conversa específica
+    
+    O lock vem de uma tabela fixa indexada pelo hash do ID, sem lock global
+    nem crescimento do dicionário a cada conversa nova. As conversas
+    recentes são resolvidas direto pelo lru_cache (em C), sem executar a
+    função. O lock é reentrante
+    (funções de escrita podem chamar outras com ele adquirido), mas
+    conversas diferentes podem compartilhar o mesmo lock, portanto não
+    adquira o lock de uma conversa enquanto segura o de outra.
+    """
+    return _conversation_locks[hash(conversation_id) & (CONVERSATION_LOCK_SHARDS - 1)]
 
 # Funções de cache e rate limiting
 def clear_conversation_cache(conversation_id: str):
     """Limpa o cache de uma conversa específica"""
-    cache_manager.clear_pattern(f'*:{conversation_id}')
+    cache_manager.invalidate_pattern(('conversation', conversation_id))
+    cache_manager.invalidate_pattern(('messages', conversation_id))
 
 # Funções de backup e recuperação
 def backup_conversation(conversation_id: str) -> Dict:
-    """Cria um backup de uma conversa específica"""
+    """
+    Cria um backup de uma conversa específica
+    
+    As quatro leituras são independentes e executadas em paralelo. Usa um
+    pool próprio: get_messages_by_conversation já ocupa o pool de leitura
+    compartilhado e esperar por ele de dentro do mesmo pool poderia travar.
+    """
     try:
-        conversation = get_conversation(conversation_id)
-        messages = get_messages_by_conversation(conversation_id)
-        requests = get_requests_by_conversation(conversation_id)
-        evaluations = get_avaliacoes_by_conversation(conversation_id)
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix='conversation-backup') as executor:
+            messages_future = executor.submit(get_messages_by_conversation, conversation_id)
+            requests_future = executor.submit(get_requests_by_conversation, conversation_id)
+            evaluations_future = executor.submit(get_avaliacoes_by_conversation, conversation_id)
+            conversation = get_conversation(conversation_id)
+            messages = messages_future.result()
+            requests = requests_future.result()
+            evaluations = evaluations_future.result()
         
         return {
             'conversation': conversation,
             'messages': messages,
             'requests': requests,
             'evaluations': evaluations,
-            'backup_time': datetime.datetime.now().isoformat()
+            'backup_time': datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Erro ao criar backup da conversa {conversation_id}: {e}")
         raise
 
+def _encode_cursor(value: Any, doc_id: str) -> str:
+    """
+    Gera o cursor de paginação a partir da chave de ordenação do último documento
+    
+    Args:
+        value: Valor do campo de ordenação no último documento da página
+        doc_id: ID do último documento (desempate entre valores iguais)
+        
+    Returns:
+        Cursor opaco (base64 de JSON), sem necessidade de reler o documento
+    """
+    if isinstance(value, datetime):
+        value = {'$dt': value.isoformat()}
+    return base64.urlsafe_b64encode(orjson.dumps([value, doc_id])).decode('ascii')
+
+def _decode_cursor(cursor: str) -> Optional[Tuple[Any, str]]:
+    """
+    Decodifica um cursor gerado por _encode_cursor
+    
+    Args:
+        cursor: Cursor recebido da página anterior
+        
+    Returns:
+        Tupla (valor de ordenação, ID do documento), ou None se não for um cursor
+        nesse formato (ex.: ID de documento das versões anteriores)
+    """
+    try:
+        value, doc_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value['$dt'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not isinstance(doc_id, str):
+        return None
+    return value, doc_id
+
+def _start_after_cursor(base_query, collection_ref, order_field: str, cursor: Optional[str]):
+    """
+    Posiciona uma consulta ordenada (decrescente) após o cursor da página anterior
+    
+    Args:
+        base_query: Consulta ordenada por order_field
+        collection_ref: Coleção consultada, para cursores no formato antigo
+        order_field: Campo de ordenação da consulta
+        cursor: Cursor da página anterior ou None para a primeira página
+        
+    Returns:
+        Consulta a ser limitada e executada
+    """
+    if not cursor:
+        return base_query
+    
+    position = _decode_cursor(cursor)
+    if position is not None:
+        # Desempate explícito pelo ID, igual ao implícito do Firestore (mesmo índice)
+        order_value, doc_id = position
+        return (base_query
+                .order_by('__name__', direction=_DESCENDING)
+                .start_after({order_field: order_value, '__name__': doc_id}))
+    
+    # Cursor antigo (ID do documento): é preciso ler o documento
+    start_doc = collection_ref.document(cursor).get()
+    return base_query.start_after(start_doc) if start_doc.exists else base_query
+
 def get_conversation_messages(conversation_id: str, limit: int = 10, start_after: Optional[str] = None):
     """
     Obtém as mensagens de uma conversa específica com suporte a paginação.
@@ -986,47 +1774,34 @@ def get_conversation_messages(conversation_id: str, limit: int = 10, start_after
     Args:
         conversation_id: ID da conversa
         limit: Número máximo de mensagens a retornar
-        start_after: ID da mensagem a partir da qual continuar a consulta (para paginação)
+        start_after: Cursor retornado pela página anterior (para paginação)
         
     Returns:
-        Tupla com (lista de mensagens, ID da última mensagem para paginação)
+        Tupla com (lista de mensagens, cursor da próxima página)
     """
     if not conversation_id:
         logger.error("ID de conversa inválido")
         return [], None
         
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         # Coleção 'conversas' > documento com ID da conversa > subcoleção 'mensagens'
         messages_ref = db.collection('conversas').document(conversation_id).collection('mensagens')
         
         # Query base ordenada por timestamp (mais recentes primeiro)
-        base_query = messages_ref.order_by('timestamp', direction=firestore.Query.DESCENDING)
+        base_query = messages_ref.order_by('timestamp', direction=_DESCENDING)
         
         # Aplicar paginação se houver um ponto de partida
-        if start_after:
-            start_doc = messages_ref.document(start_after).get()
-            if start_doc.exists:
-                query = base_query.start_after(start_doc).limit(limit)
-            else:
-                query = base_query.limit(limit)
-        else:
-            query = base_query.limit(limit)
+        query = _start_after_cursor(base_query, messages_ref, 'timestamp', start_after).limit(limit)
         
         # Executar a consulta
-        messages = []
-        docs = list(query.stream())
-        
-        for doc in docs:
-            message_data = doc.to_dict()
-            message_data['id'] = doc.id
-            messages.append(message_data)
+        messages = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
         
-        # Retornar o último ID para paginação futura
-        last_doc_id = docs[-1].id if docs else None
+        # Cursor com a chave de ordenação da última mensagem, para a próxima página
+        cursor = _encode_cursor(messages[-1].get('timestamp'), messages[-1]['id']) if messages else None
         
-        logger.info(f"Recuperadas {len(messages)} mensagens da conversa {conversation_id}")
-        return messages, last_doc_id
+        logger.info("Recuperadas %d mensagens da conversa %s", len(messages), conversation_id)
+        return messages, cursor
         
     except Exception as e:
         logger.error(f"Erro ao buscar mensagens da conversa {conversation_id}: {e}")
@@ -1040,50 +1815,37 @@ def get_conversations_with_pagination(status: Optional[str] = None, limit: int =
     Args:
         status: Status das conversas a serem retornadas (opcional)
         limit: Número máximo de conversas por página
-        start_after: ID do documento a partir do qual continuar a consulta (para paginação)
+        start_after: Cursor retornado pela página anterior (para paginação)
         
     Returns:
-        Tupla com (lista de conversas, ID do último documento para paginação)
+        Tupla com (lista de conversas, cursor da próxima página)
     """
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         collection_ref = db.collection('conversas')
         
         # Construir a query base
         if status:
             base_query = collection_ref.where(
-                filter=firestore.FieldFilter('status', '==', status)
+                filter=FieldFilter('status', '==', status)
             )
         else:
             base_query = collection_ref
             
         # Ordenar por data de última atualização
-        base_query = base_query.order_by('ultimaMensagem', direction=firestore.Query.DESCENDING)
+        base_query = base_query.order_by('ultimaMensagem', direction=_DESCENDING)
         
         # Aplicar paginação se houver um ponto de partida
-        if start_after:
-            start_doc = collection_ref.document(start_after).get()
-            if start_doc.exists:
-                query = base_query.start_after(start_doc).limit(limit)
-            else:
-                query = base_query.limit(limit)
-        else:
-            query = base_query.limit(limit)
+        query = _start_after_cursor(base_query, collection_ref, 'ultimaMensagem', start_after).limit(limit)
         
         # Executar a consulta
-        conversations = []
-        docs = list(query.stream())
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
         
-        for doc in docs:
-            conversation = doc.to_dict()
-            conversation['id'] = doc.id
-            conversations.append(conversation)
+        # Cursor com a chave de ordenação da última conversa, para a próxima página
+        cursor = _encode_cursor(conversations[-1].get('ultimaMensagem'), conversations[-1]['id']) if conversations else None
         
-        # Retornar o último ID para paginação futura
-        last_doc_id = docs[-1].id if docs else None
-        
-        logger.info(f"Recuperadas {len(conversations)} conversas com paginação")
-        return conversations, last_doc_id
+        logger.info("Recuperadas %d conversas com paginação", len(conversations))
+        return conversations, cursor
         
     except Exception as e:
         logger.error(f"Erro ao obter conversas paginadas: {e}")
@@ -1097,46 +1859,33 @@ def get_messages_with_pagination(conversation_id: str, limit: int = 50,
     Args:
         conversation_id: ID da conversa
         limit: Número máximo de mensagens por página
-        start_after: ID da mensagem a partir da qual continuar a consulta
+        start_after: Cursor retornado pela página anterior
         
     Returns:
-        Tupla com (lista de mensagens, ID da última mensagem para paginação)
+        Tupla com (lista de mensagens, cursor da próxima página)
     """
     try:
-        db = get_firestore_db()
+        db = _pick_db()
         
         # Referência para a coleção de mensagens
         messages_ref = db.collection('mensagens')
         
         # Query base filtrada por ID da conversa
         base_query = messages_ref.where(
-            filter=firestore.FieldFilter('conversation_id', '==', conversation_id)
-        ).order_by('timestamp', direction=firestore.Query.DESCENDING)
+            filter=FieldFilter('conversation_id', '==', conversation_id)
+        ).order_by('timestamp', direction=_DESCENDING)
         
         # Aplicar paginação se houver um ponto de partida
-        if start_after:
-            start_doc = messages_ref.document(start_after).get()
-            if start_doc.exists:
-                query = base_query.start_after(start_doc).limit(limit)
-            else:
-                query = base_query.limit(limit)
-        else:
-            query = base_query.limit(limit)
+        query = _start_after_cursor(base_query, messages_ref, 'timestamp', start_after).limit(limit)
         
         # Executar a consulta
-        messages = []
-        docs = list(query.stream())
+        messages = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
         
-        for doc in docs:
-            message = doc.to_dict()
-            message['id'] = doc.id
-            messages.append(message)
+        # Cursor com a chave de ordenação da última mensagem, para a próxima página
+        cursor = _encode_cursor(messages[-1].get('timestamp'), messages[-1]['id']) if messages else None
         
-        # Retornar o último ID para paginação futura
-        last_doc_id = docs[-1].id if docs else None
-        
-        logger.info(f"Recuperadas {len(messages)} mensagens paginadas para conversa {conversation_id}")
-        return messages, last_doc_id
+        logger.info("Recuperadas %d mensagens paginadas para conversa %s", len(messages), conversation_id)
+        return messages, cursor
         
     except Exception as e:
         logger.error(f"Erro ao obter mensagens paginadas: {e}")
@@ -1147,39 +1896,33 @@ def get_conversations_by_periodo(start_date, end_date):
     Retorna todas as conversas em um período específico.
     
     Args:
-        start_date: Data inicial
-        end_date: Data final
+        start_date: Data inicial (datetime ou string ISO 8601)
+        end_date: Data final (datetime ou string ISO 8601)
         
     Returns:
         List: Lista de conversas
     """
     try:
-        db = get_firestore_db()
-        
-        # Converter datas para string se necessário
-        if isinstance(start_date, datetime.datetime):
-            start_date = start_date.isoformat()
-        if isinstance(end_date, datetime.datetime):
-            end_date = end_date.isoformat()
+        db = _pick_db()
+        
+        # dataHoraInicio é gravado como Timestamp (ver _normalize_timestamps):
+        # datas em string são convertidas para que o filtro use o mesmo tipo
+        if isinstance(start_date, str):
+            start_date = _parse_ts(start_date) or start_date
+        if isinstance(end_date, str):
+            end_date = _parse_ts(end_date) or end_date
             
-        # Query para buscar conversas no período
-        now = datetime.datetime.now()
-        
         # Obter referência à coleção
         conversations_ref = db.collection('conversas')
         
         # Executar query
         query = conversations_ref.where(
-            filter=firestore.FieldFilter('dataHoraInicio', '>=', start_date)
+            filter=FieldFilter('dataHoraInicio', '>=', start_date)
         ).where(
-            filter=firestore.FieldFilter('dataHoraInicio', '<=', end_date)
+            filter=FieldFilter('dataHoraInicio', '<=', end_date)
         )
         
-        conversations = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            data['id'] = doc.id
-            conversations.append(data)
+        conversations = [{**doc.to_dict(), 'id': doc.id} for doc in query.stream()]
             
         return conversations
     except Exception as e:
@@ -1206,76 +1949,166 @@ def save_consolidated_attendance(consolidated_data):
             return False
             
         # Adicionar timestamp de criação
-        consolidated_data['created_at'] = datetime.datetime.now()
+        consolidated_data['created_at'] = datetime.now()
         
         # Salvar no Firestore
-        db = get_firestore_db()
+        db = _pick_db()
         
         # Usar o conversation_id como ID do documento
         doc_id = consolidated_data['conversation_id']
         
-        # Verificar se já existe um documento com este ID
-        existing_doc = db.collection('consolidadoAtendimentos').document(doc_id).get()
-        
-        if existing_doc.exists:
-            # Se já existe, atualiza os dados
-            db.collection('consolidadoAtendimentos').document(doc_id).update(consolidated_data)
-            logger.info(f"Atendimento consolidado atualizado para conversa {doc_id}")
-        else:
-            # Se não existe, cria um novo documento
-            db.collection('consolidadoAtendimentos').document(doc_id).set(consolidated_data)
-            logger.info(f"Novo atendimento consolidado criado para conversa {doc_id}")
+        # Criar o documento ou mesclar os dados no existente, em uma única escrita
+        db.collection('consolidadoAtendimentos').document(doc_id).set(consolidated_data, merge=True)
+        logger.info("Atendimento consolidado salvo para conversa %s", doc_id)
         
         return True
     except Exception as e:
         logger.error(f"Erro ao salvar atendimento consolidado: {e}")
         return False
 
+def _iter_collection(collection: str, page_size: int = BACKUP_PAGE_SIZE) -> Iterable[Dict]:
+    """
+    Percorre todos os documentos de uma coleção em páginas ordenadas pelo ID
+    
+    Args:
+        collection: Nome da coleção
+        page_size: Documentos lidos por requisição
+        
+    Returns:
+        Gerador de documentos; apenas uma página fica em memória
+    """
+    query = _pick_db().collection(collection).order_by('__name__').limit(page_size)
+    last_doc = None
+    while True:
+        page = (query.start_after(last_doc) if last_doc is not None else query).get()
+        for doc in page:
+            yield doc.to_dict()
+        if len(page) < page_size:
+            return
+        last_doc = page[-1]
+
 def backup_data():
     """
     Cria um backup completo do banco de dados.
     
+    Os documentos são gravados no arquivo à medida que cada página é lida,
+    sem carregar as coleções inteiras em memória, e comprimidos com zstd.
+    
     Returns:
-        str: Caminho do arquivo de backup
+        str: Caminho do arquivo de backup (.json.zst)
     """
     try:
-        db = get_firestore_db()
-        data = {}
-        
-        # Backup de conversas
-        conversations = db.collection('conversas').get()
-        data['conversas'] = []
-        for doc in conversations:
-            data['conversas'].append(doc.to_dict())
-            
-        # Backup de mensagens
-        messages = db.collection('mensagens').get()
-        data['mensagens'] = []
-        for doc in messages:
-            data['mensagens'].append(doc.to_dict())
+        db = _pick_db()
+        now = datetime.now()
+        filename = f"backup_{now:%Y%m%d_%H%M%S}.json.zst"
+        
+        # Objeto JSON {coleção: [documentos]} escrito de forma incremental
+        compressor = zstd.ZstdCompressor(level=BACKUP_ZSTD_LEVEL)
+        with open(filename, 'wb') as raw, compressor.stream_writer(raw) as f:
+            f.write(b'{')
+            for index, collection in enumerate(BACKUP_COLLECTIONS):
+                f.write(b'%s\n%s:[' % (b',' if index else b'', orjson.dumps(collection)))
+                separator = b'\n'
+                for doc in _iter_collection(collection):
+                    f.write(separator)
+                    f.write(orjson.dumps(doc, default=str, option=orjson.OPT_NON_STR_KEYS))
+                    separator = b',\n'
+                f.write(b'\n]')
+            f.write(b'\n}\n')
             
-        # Backup de avaliações
-        evaluations = db.collection('avaliacoes').get()
-        data['avaliacoes'] = []
-        for doc in evaluations:
-            data['avaliacoes'].append(doc.to_dict())
-            
-        # Salvar para arquivo JSON
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"backup_{timestamp}.json"
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            
-        logger.info(f"Backup concluído: {filename}")
+        logger.info("Backup concluído: %s", filename)
         
         # Registrar backup no Firestore
         db.collection('backups').add({
             'filename': filename,
-            'backup_time': datetime.datetime.now().isoformat()
+            'backup_time': now.isoformat()
         })
         
         return filename
     except Exception as e:
         logger.error(f"Erro ao fazer backup: {e}")
-        return None 
\ No newline at end of file
+        return None 
+
+# Variantes assíncronas para leituras em massa: chamadores que precisam de
+# muitas leituras podem usar asyncio.gather em vez de ocupar uma thread por RPC
+async def aget_conversation(conversation_id: str) -> Optional[Dict]:
+    """Obtém uma conversa pelo ID (versão assíncrona)"""
+    try:
+        doc = await get_firestore_async_db().collection('conversas').document(conversation_id).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        logger.error(f"Erro ao obter conversa {conversation_id}: {e}")
+        return None
+
+async def aget_conversations_by_ids(conversation_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Obtém várias conversas pelos IDs em uma única requisição BatchGetDocuments (versão assíncrona)
+    
+    Args:
+        conversation_ids: IDs das conversas
+        
+    Returns:
+        Dicionário de ID -> dados das conversas encontradas
+    """
+    try:
+        db = get_firestore_async_db()
+        refs = [db.collection('conversas').document(conversation_id) for conversation_id in conversation_ids]
+        return {doc.id: doc.to_dict() async for doc in db.get_all(refs) if doc.exists}
+    except Exception as e:
+        logger.error(f"Erro ao obter conversas {conversation_ids}: {e}")
+        return {}
+
+async def aget_messages_by_conversation(conversation_id: str, limit: int = 100) -> List[Dict]:
+    """
+    Obtém mensagens de uma conversa, consultando a subcoleção e a coleção separada
+    ao mesmo tempo (versão assíncrona)
+    
+    Args:
+        conversation_id: ID da conversa
+        limit: Número máximo de mensagens a retornar
+        
+    Returns:
+        List[Dict]: Lista de mensagens da conversa
+    """
+    try:
+        db = get_firestore_async_db()
+        
+        async def read_messages(query) -> List[Dict]:
+            return [{**doc.to_dict(), 'id': doc.id} async for doc in query.stream()]
+        
+        subcollection_query = (db.collection('conversas')
+                               .document(conversation_id)
+                               .collection('mensagens')
+                               .order_by('timestamp', direction=_DESCENDING)
+                               .limit(limit))
+        collection_query = (db.collection('mensagens')
+                            .where(filter=FieldFilter('conversation_id', '==', conversation_id))
+                            .order_by('timestamp', direction=_DESCENDING)
+                            .limit(limit))
+        
+        subcollection_msgs, collection_msgs = await asyncio.gather(
+            read_messages(subcollection_query),
+            read_messages(collection_query)
+        )
+        return subcollection_msgs or collection_msgs
+    except Exception as e:
+        logger.error(f"Erro ao obter mensagens da conversa {conversation_id}: {e}")
+        return []
+
+async def aget_solicitacao(solicitacao_id: str) -> Optional[Dict]:
+    """Obtém uma solicitação específica (versão assíncrona)"""
+    try:
+        doc = await get_firestore_async_db().collection('solicitacoes').document(solicitacao_id).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        logger.error(f"Erro ao obter solicitação: {e}")
+        return None
+
+async def aget_avaliacao(avaliacao_id: str) -> Optional[Dict]:
+    """Obtém uma avaliação específica (versão assíncrona)"""
+    try:
+        doc = await get_firestore_async_db().collection('avaliacoes').document(avaliacao_id).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        logger.error(f"Erro ao obter avaliação: {e}")
+        return None
@@ -1,14 +1,37 @@
 import os
-import json
+import string
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Union
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+import zstandard as zstd
 from firebase_admin import firestore
-from .firebase_db import get_firestore_db
-from .cache import cache_manager
+from .firebase_db import FIRESTORE_BATCH_SIZE, _period_bucket, get_firestore_db, invalidate_collection_cache
 
 logger = logging.getLogger(__name__)
 
+# Número máximo de lotes commitados em paralelo na restauração
+RESTORE_MAX_WORKERS = 16
+
+# Número máximo de coleções lidas em paralelo no backup
+BACKUP_MAX_WORKERS = 5
+
+# Nível de compressão zstd dos backups de migração
+BACKUP_ZSTD_LEVEL = 3
+
+# Faixas de IDs de uma coleção lidas em paralelo por _get_collection_data
+COLLECTION_SCAN_PARTITIONS = 8
+
+# Caracteres dos IDs automáticos do Firestore, na ordem em que são comparados
+_ID_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+# Limites entre as faixas de IDs (a primeira e a última são abertas)
+_ID_SPLIT_POINTS = tuple(
+    _ID_ALPHABET[len(_ID_ALPHABET) * i // COLLECTION_SCAN_PARTITIONS]
+    for i in range(1, COLLECTION_SCAN_PARTITIONS)
+)
+
 class MigrationManager:
     def __init__(self):
         self.db = get_firestore_db()
@@ -26,27 +49,67 @@ class MigrationManager:
         return sorted(files)
         
     def _load_migration(self, filename: str) -> Dict:
-        """Carrega um arquivo de migração"""
-        with open(os.path.join(self.migrations_dir, filename), 'r', encoding='utf-8') as f:
-            return json.load(f)
+        """Carrega um arquivo de migração (JSON ou JSON comprimido com zstd)"""
+        path = os.path.join(self.migrations_dir, filename)
+        with open(path, 'rb') as f:
+            if filename.endswith('.zst'):
+                with zstd.ZstdDecompressor().stream_reader(f) as reader:
+                    return orjson.loads(reader.read())
+            return orjson.loads(f.read())
             
     def _save_migration(self, filename: str, data: Dict):
         """Salva um arquivo de migração"""
-        with open(os.path.join(self.migrations_dir, filename), 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(self.migrations_dir, filename), 'wb') as f:
+            f.write(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            
+    def _save_backup(self, filename: str, data: Dict):
+        """Salva um backup em JSON compacto comprimido com zstd"""
+        compressor = zstd.ZstdCompressor(level=BACKUP_ZSTD_LEVEL)
+        with open(os.path.join(self.migrations_dir, filename), 'wb') as raw, compressor.stream_writer(raw) as f:
+            f.write(orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS))
             
     def _get_collection_data(self, collection: str) -> List[Dict]:
-        """Obtém todos os documentos de uma coleção"""
-        docs = self.db.collection(collection).stream()
-        return [doc.to_dict() for doc in docs]
+        """
+        Obtém todos os documentos de uma coleção
+        
+        O espaço de IDs é dividido em COLLECTION_SCAN_PARTITIONS faixas
+        contíguas, lidas em streams paralelos e concatenadas em ordem de ID.
+        """
+        collection_ref = self.db.collection(collection)
+        
+        def read_range(start: Optional[str], end: Optional[str]) -> List[Dict]:
+            query = collection_ref.order_by('__name__')
+            if start is not None:
+                query = query.start_at({'__name__': start})
+            if end is not None:
+                query = query.end_before({'__name__': end})
+            return [doc.to_dict() for doc in query.stream()]
+            
+        bounds = (None, *_ID_SPLIT_POINTS, None)
+        with ThreadPoolExecutor(max_workers=len(bounds) - 1) as executor:
+            ranges = executor.map(read_range, bounds[:-1], bounds[1:])
+            return [doc for docs in ranges for doc in docs]
         
     def _restore_collection_data(self, collection: str, data: List[Dict]):
-        """Restaura dados em uma coleção"""
-        batch = self.db.batch()
-        for doc_data in data:
-            doc_ref = self.db.collection(collection).document()
-            batch.set(doc_ref, doc_data)
-        batch.commit()
+        """
+        Restaura dados em uma coleção
+        
+        Os documentos são gravados em WriteBatch de até FIRESTORE_BATCH_SIZE
+        operações (limite do Firestore), com os commits em paralelo.
+        """
+        collection_ref = self.db.collection(collection)
+        
+        def commit_chunk(chunk: List[Dict]):
+            batch = self.db.batch()
+            for doc_data in chunk:
+                batch.set(collection_ref.document(), doc_data)
+            batch.commit()
+            
+        chunks = [data[i:i + FIRESTORE_BATCH_SIZE] for i in range(0, len(data), FIRESTORE_BATCH_SIZE)]
+        if not chunks:
+            return
+        with ThreadPoolExecutor(max_workers=min(RESTORE_MAX_WORKERS, len(chunks))) as executor:
+            list(executor.map(commit_chunk, chunks))
         
     def backup_all_collections(self):
         """Faz backup de todas as coleções"""
@@ -58,13 +121,13 @@ class MigrationManager:
             'consolidada_atendimentos'
         ]
         
-        backup_data = {}
-        for collection in collections:
-            backup_data[collection] = self._get_collection_data(collection)
+        # As coleções são independentes: lê todas em paralelo
+        with ThreadPoolExecutor(max_workers=min(BACKUP_MAX_WORKERS, len(collections))) as executor:
+            backup_data = dict(zip(collections, executor.map(self._get_collection_data, collections)))
             
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'backup_{timestamp}.json'
-        self._save_migration(filename, backup_data)
+        filename = f'backup_{timestamp}.json.zst'
+        self._save_backup(filename, backup_data)
         
         logger.info(f"Backup criado com sucesso: {filename}")
         return filename
@@ -73,31 +136,62 @@ class MigrationManager:
         """Restaura dados de um backup"""
         backup_data = self._load_migration(filename)
         
-        # Limpa o cache antes da restauração
-        cache_manager.clear()
-        
         for collection, data in backup_data.items():
             self._restore_collection_data(collection, data)
+            # Limpa do cache apenas os dados da coleção restaurada, depois da
+            # escrita, para que leituras durante a restauração não permaneçam
+            invalidate_collection_cache(collection)
             
         logger.info(f"Dados restaurados com sucesso do backup: {filename}")
         
+    def _batched_migrate(self, collection: str, required_field: str,
+                         delta: Union[Dict, Callable[[Dict], Optional[Dict]]]) -> int:
+        """
+        Aplica delta aos documentos de uma coleção que não possuem required_field
+        
+        Apenas os campos de delta são atualizados (update, não set), em
+        WriteBatch de até FIRESTORE_BATCH_SIZE operações.
+        
+        Args:
+            collection: Nome da coleção
+            required_field: Campo cuja ausência indica formato antigo
+            delta: Campos a serem gravados nos documentos antigos, ou função que
+                os calcula a partir dos dados do documento (None o ignora)
+            
+        Returns:
+            int: Número de documentos migrados
+        """
+        batch = self.db.batch()
+        pending = 0
+        migrated_count = 0
+        
+        for doc in self.db.collection(collection).stream():
+            data = doc.to_dict()
+            if required_field in data:
+                continue
+            fields = delta(data) if callable(delta) else delta
+            if not fields:
+                continue
+            batch.update(doc.reference, fields)
+            pending += 1
+            if pending == FIRESTORE_BATCH_SIZE:
+                batch.commit()
+                migrated_count += pending
+                batch = self.db.batch()
+                pending = 0
+                
+        if pending:
+            batch.commit()
+            migrated_count += pending
+        return migrated_count
+        
     def migrate_conversations(self):
         """Migra dados antigos de conversas para o novo formato"""
         try:
-            conversations = self._get_collection_data('conversas')
-            migrated_count = 0
-            
-            for conversation in conversations:
-                # Verifica se precisa de migração
-                if 'data_criacao' not in conversation:
-                    conversation['data_criacao'] = firestore.SERVER_TIMESTAMP
-                    conversation['ultima_atualizacao'] = firestore.SERVER_TIMESTAMP
-                    
-                    # Atualiza o documento
-                    doc_ref = self.db.collection('conversas').document(conversation['id'])
-                    doc_ref.set(conversation)
-                    migrated_count += 1
-                    
+            migrated_count = self._batched_migrate('conversas', 'data_criacao', {
+                'data_criacao': firestore.SERVER_TIMESTAMP,
+                'ultima_atualizacao': firestore.SERVER_TIMESTAMP
+            })
             logger.info(f"Migração de conversas concluída. {migrated_count} documentos migrados.")
             return migrated_count
             
@@ -108,19 +202,7 @@ class MigrationManager:
     def migrate_messages(self):
         """Migra dados antigos de mensagens para o novo formato"""
         try:
-            messages = self._get_collection_data('mensagens')
-            migrated_count = 0
-            
-            for message in messages:
-                # Verifica se precisa de migração
-                if 'timestamp' not in message:
-                    message['timestamp'] = firestore.SERVER_TIMESTAMP
-                    
-                    # Atualiza o documento
-                    doc_ref = self.db.collection('mensagens').document(message['id'])
-                    doc_ref.set(message)
-                    migrated_count += 1
-                    
+            migrated_count = self._batched_migrate('mensagens', 'timestamp', {'timestamp': firestore.SERVER_TIMESTAMP})
             logger.info(f"Migração de mensagens concluída. {migrated_count} documentos migrados.")
             return migrated_count
             
@@ -131,20 +213,10 @@ class MigrationManager:
     def migrate_solicitacoes(self):
         """Migra dados antigos de solicitações para o novo formato"""
         try:
-            solicitacoes = self._get_collection_data('solicitacoes')
-            migrated_count = 0
-            
-            for solicitacao in solicitacoes:
-                # Verifica se precisa de migração
-                if 'data_criacao' not in solicitacao:
-                    solicitacao['data_criacao'] = firestore.SERVER_TIMESTAMP
-                    solicitacao['ultima_atualizacao'] = firestore.SERVER_TIMESTAMP
-                    
-                    # Atualiza o documento
-                    doc_ref = self.db.collection('solicitacoes').document(solicitacao['id'])
-                    doc_ref.set(solicitacao)
-                    migrated_count += 1
-                    
+            migrated_count = self._batched_migrate('solicitacoes', 'data_criacao', {
+                'data_criacao': firestore.SERVER_TIMESTAMP,
+                'ultima_atualizacao': firestore.SERVER_TIMESTAMP
+            })
             logger.info(f"Migração de solicitações concluída. {migrated_count} documentos migrados.")
             return migrated_count
             
@@ -155,19 +227,7 @@ class MigrationManager:
     def migrate_avaliacoes(self):
         """Migra dados antigos de avaliações para o novo formato"""
         try:
-            avaliacoes = self._get_collection_data('avaliacoes')
-            migrated_count = 0
-            
-            for avaliacao in avaliacoes:
-                # Verifica se precisa de migração
-                if 'data_criacao' not in avaliacao:
-                    avaliacao['data_criacao'] = firestore.SERVER_TIMESTAMP
-                    
-                    # Atualiza o documento
-                    doc_ref = self.db.collection('avaliacoes').document(avaliacao['id'])
-                    doc_ref.set(avaliacao)
-                    migrated_count += 1
-                    
+            migrated_count = self._batched_migrate('avaliacoes', 'data_criacao', {'data_criacao': firestore.SERVER_TIMESTAMP})
             logger.info(f"Migração de avaliações concluída. {migrated_count} documentos migrados.")
             return migrated_count
             
@@ -178,19 +238,14 @@ class MigrationManager:
     def migrate_consolidado(self):
         """Migra dados antigos de consolidado para o novo formato"""
         try:
-            consolidados = self._get_collection_data('consolidada_atendimentos')
-            migrated_count = 0
-            
-            for consolidado in consolidados:
-                # Verifica se precisa de migração
-                if 'data_criacao' not in consolidado:
-                    consolidado['data_criacao'] = firestore.SERVER_TIMESTAMP
-                    
-                    # Atualiza o documento
-                    doc_ref = self.db.collection('consolidada_atendimentos').document(consolidado['id'])
-                    doc_ref.set(consolidado)
-                    migrated_count += 1
-                    
+            migrated_count = self._batched_migrate('consolidada_atendimentos', 'data_criacao', {'data_criacao': firestore.SERVER_TIMESTAMP})
+            
+            # Preenche o bucket mensal usado por get_consolidado_by_period
+            migrated_count += self._batched_migrate(
+                'consolidada_atendimentos', 'period_bucket',
+                lambda data: ({'period_bucket': _period_bucket(data['data_inicio'])}
+                              if isinstance(data.get('data_inicio'), datetime) else None)
+            )
             logger.info(f"Migração de consolidado concluída. {migrated_count} documentos migrados.")
             return migrated_count
             
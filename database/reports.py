@@ -1,19 +1,34 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union
+from importlib.util import find_spec
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import logging
 import pandas as pd
 from firebase_admin import firestore
 from .firebase_db import get_firestore_db
-from .analytics import (
-    get_conversation_metrics,
-    get_satisfaction_metrics,
-    get_performance_metrics,
-    get_trending_topics,
-    get_agent_performance
-)
+from .analytics import get_dashboard_metrics
+
+# Motor xlsxwriter para exportar Excel, opcional; sem ele o pandas usa o motor padrão
+XLSXWRITER_AVAILABLE = find_spec('xlsxwriter') is not None
 
 logger = logging.getLogger(__name__)
 
+# Campos do cabeçalho de um relatório, sem o bloco 'dados'
+REPORT_HEADER_FIELDS = ('tipo', 'data_criacao')
+
+def _collect_metrics(start_date: datetime, end_date: datetime) -> Dict:
+    """
+    Coleta as métricas de um relatório com as consultas em paralelo
+    
+    Args:
+        start_date: Data inicial do período
+        end_date: Data final do período
+        
+    Returns:
+        Dict com as seções conversas, satisfacao, performance,
+        topicos_tendencia e atendentes
+    """
+    return get_dashboard_metrics(start_date, end_date)
+
 def generate_daily_report(date: datetime) -> Dict:
     """
     Gera relatório diário com todas as métricas
@@ -28,21 +43,10 @@ def generate_daily_report(date: datetime) -> Dict:
         start_date = datetime(date.year, date.month, date.day)
         end_date = start_date + timedelta(days=1)
         
-        # Coletar todas as métricas
-        conversation_metrics = get_conversation_metrics(start_date, end_date)
-        satisfaction_metrics = get_satisfaction_metrics(start_date, end_date)
-        performance_metrics = get_performance_metrics(start_date, end_date)
-        trending_topics = get_trending_topics(start_date, end_date)
-        agent_metrics = get_agent_performance(start_date, end_date)
-        
-        # Consolidar relatório
+        # Consolidar relatório com as métricas coletadas em paralelo
         report = {
             'data': date.strftime('%Y-%m-%d'),
-            'conversas': conversation_metrics,
-            'satisfacao': satisfaction_metrics,
-            'performance': performance_metrics,
-            'topicos_tendencia': trending_topics,
-            'atendentes': agent_metrics
+            **_collect_metrics(start_date, end_date)
         }
         
         # Salvar relatório no Firebase
@@ -67,24 +71,13 @@ def generate_weekly_report(start_date: datetime) -> Dict:
     try:
         end_date = start_date + timedelta(days=7)
         
-        # Coletar todas as métricas
-        conversation_metrics = get_conversation_metrics(start_date, end_date)
-        satisfaction_metrics = get_satisfaction_metrics(start_date, end_date)
-        performance_metrics = get_performance_metrics(start_date, end_date)
-        trending_topics = get_trending_topics(start_date, end_date)
-        agent_metrics = get_agent_performance(start_date, end_date)
-        
-        # Consolidar relatório
+        # Consolidar relatório com as métricas coletadas em paralelo
         report = {
             'periodo': {
                 'inicio': start_date.strftime('%Y-%m-%d'),
                 'fim': end_date.strftime('%Y-%m-%d')
             },
-            'conversas': conversation_metrics,
-            'satisfacao': satisfaction_metrics,
-            'performance': performance_metrics,
-            'topicos_tendencia': trending_topics,
-            'atendentes': agent_metrics
+            **_collect_metrics(start_date, end_date)
         }
         
         # Salvar relatório no Firebase
@@ -113,21 +106,10 @@ def generate_monthly_report(date: datetime) -> Dict:
         else:
             end_date = datetime(date.year, date.month + 1, 1)
         
-        # Coletar todas as métricas
-        conversation_metrics = get_conversation_metrics(start_date, end_date)
-        satisfaction_metrics = get_satisfaction_metrics(start_date, end_date)
-        performance_metrics = get_performance_metrics(start_date, end_date)
-        trending_topics = get_trending_topics(start_date, end_date)
-        agent_metrics = get_agent_performance(start_date, end_date)
-        
-        # Consolidar relatório
+        # Consolidar relatório com as métricas coletadas em paralelo
         report = {
             'mes': date.strftime('%Y-%m'),
-            'conversas': conversation_metrics,
-            'satisfacao': satisfaction_metrics,
-            'performance': performance_metrics,
-            'topicos_tendencia': trending_topics,
-            'atendentes': agent_metrics
+            **_collect_metrics(start_date, end_date)
         }
         
         # Salvar relatório no Firebase
@@ -226,14 +208,16 @@ def export_report_to_excel(report: Dict, filename: str) -> bool:
         
         # Atendentes
         if 'atendentes' in report:
-            agent_data = []
-            for agent_id, metrics in report['atendentes'].items():
-                metrics['atendente_id'] = agent_id
-                agent_data.append(metrics)
-            dfs['atendentes'] = pd.DataFrame(agent_data)
-        
-        # Exportar para Excel
-        with pd.ExcelWriter(filename) as writer:
+            dfs['atendentes'] = (pd.DataFrame
+                                 .from_dict(report['atendentes'], orient='index')
+                                 .rename_axis('atendente_id')
+                                 .reset_index())
+        
+        # Exportar para Excel; o modo constant_memory do xlsxwriter não é usado
+        # porque o pandas grava coluna a coluna e as linhas já descarregadas
+        # perderiam as células seguintes
+        engine = 'xlsxwriter' if XLSXWRITER_AVAILABLE else None
+        with pd.ExcelWriter(filename, engine=engine) as writer:
             for sheet_name, df in dfs.items():
                 df.to_excel(writer, sheet_name=sheet_name, index=False)
         
@@ -244,33 +228,59 @@ def export_report_to_excel(report: Dict, filename: str) -> bool:
         logger.error(f"Erro ao exportar relatório para Excel: {e}")
         return False
 
-def get_reports_by_type(report_type: str, limit: int = 10) -> List[Dict]:
+def iter_reports_by_type(report_type: str, limit: int = 10,
+                         fields: Optional[Tuple[str, ...]] = None) -> Iterator[Dict]:
     """
-    Obtém relatórios por tipo
+    Percorre relatórios por tipo à medida que chegam do Firestore
     
     Args:
         report_type: Tipo do relatório (diario, semanal, mensal)
         limit: Número máximo de relatórios a retornar
+        fields: Campos a retornar (projeção no servidor); None retorna o
+            documento inteiro e REPORT_HEADER_FIELDS omite os dados do relatório
         
     Returns:
-        Lista de relatórios
+        Gerador de relatórios, sem manter a lista inteira em memória
     """
     try:
-        db = get_firestore_db()
-        reports_ref = db.collection('relatorios').where(
+        reports_ref = get_firestore_db().collection('relatorios').where(
             'tipo', '==', report_type
         ).order_by(
             'data_criacao', direction=firestore.Query.DESCENDING
         ).limit(limit)
+        if fields:
+            reports_ref = reports_ref.select(fields)
         
-        reports = []
         for doc in reports_ref.stream():
-            data = doc.to_dict()
-            data['id'] = doc.id
-            reports.append(data)
-            
-        return reports
+            yield {**doc.to_dict(), 'id': doc.id}
         
     except Exception as e:
         logger.error(f"Erro ao obter relatórios: {e}")
-        return [] 
\ No newline at end of file
+
+def get_reports_by_type(report_type: str, limit: int = 10,
+                        fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+    """
+    Obtém relatórios por tipo
+    
+    Args:
+        report_type: Tipo do relatório (diario, semanal, mensal)
+        limit: Número máximo de relatórios a retornar
+        fields: Campos a retornar (projeção no servidor); None retorna o documento inteiro
+        
+    Returns:
+        Lista de relatórios
+    """
+    return list(iter_reports_by_type(report_type, limit, fields))
+
+def get_report_headers(report_type: str, limit: int = 10) -> List[Dict]:
+    """
+    Obtém apenas o cabeçalho dos relatórios de um tipo, para listagens
+    
+    Args:
+        report_type: Tipo do relatório (diario, semanal, mensal)
+        limit: Número máximo de relatórios a retornar
+        
+    Returns:
+        Lista de relatórios com id, tipo e data_criacao, sem os dados
+    """
+    return get_reports_by_type(report_type, limit, fields=REPORT_HEADER_FIELDS)
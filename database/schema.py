@@ -15,9 +15,12 @@ class FirebaseSchema:
         Cria a estrutura base de uma conversa com suas subcoleções
         """
         try:
+            # As quatro gravações são confirmadas juntas, em uma única requisição
+            batch = self.db.batch()
+
             # Documento principal da conversa
             conversation_ref = self.db.collection('conversas').document(conversation_id)
-            conversation_ref.set({
+            batch.set(conversation_ref, {
                 'cliente': {
                     'nome': '',
                     'telefone': ''
@@ -34,7 +37,7 @@ class FirebaseSchema:
 
             # Criar subcoleção mensagens
             mensagens_ref = conversation_ref.collection('mensagens').document()
-            mensagens_ref.set({
+            batch.set(mensagens_ref, {
                 'tipo': 'texto',  # texto, audio, imagem
                 'conteudo': 'Conversa iniciada',
                 'remetente': 'sistema',  # cliente ou idDoAtendente
@@ -43,7 +46,7 @@ class FirebaseSchema:
 
             # Criar subcoleção solicitacoes
             solicitacoes_ref = conversation_ref.collection('solicitacoes').document()
-            solicitacoes_ref.set({
+            batch.set(solicitacoes_ref, {
                 'descricao': 'Atendimento inicial',
                 'dataHoraCriacao': firestore.SERVER_TIMESTAMP,
                 'prazo': firestore.SERVER_TIMESTAMP,
@@ -54,7 +57,7 @@ class FirebaseSchema:
 
             # Criar subcoleção avaliacoes
             avaliacoes_ref = conversation_ref.collection('avaliacoes').document()
-            avaliacoes_ref.set({
+            batch.set(avaliacoes_ref, {
                 'dataAvaliacao': firestore.SERVER_TIMESTAMP,
                 'reclamacoes': [],
                 'notaComunicacaoClara': None,  # 0-10
@@ -69,6 +72,8 @@ class FirebaseSchema:
                 'detalhesCriticos': None
             })
 
+            batch.commit()
+
             logger.info(f"Estrutura da conversa {conversation_id} criada com sucesso")
             return True
 
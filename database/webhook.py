@@ -1,10 +1,13 @@
 import os
 import json
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from collections import defaultdict
 from typing import Dict, List, Optional
-from flask import Flask, request, jsonify
-from threading import Thread
-from queue import Queue
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
 from .firebase_db import get_firestore_db, init_firebase
 
 # Configuração de logging
@@ -13,108 +16,187 @@ logger = logging.getLogger(__name__)
 # Inicializa o Firebase
 init_firebase()
 
-# Fila de notificações
-notification_queue = Queue()
+# Número de tarefas que consomem a fila de notificações em paralelo
+WEBHOOK_CONSUMERS = int(os.getenv('WEBHOOK_CONSUMERS', '4'))
+
+# Capacidade da fila; cheia, o webhook responde 503 para o remetente tentar depois
+WEBHOOK_QUEUE_SIZE = 10000
+
+# Máximo de notificações processadas juntas por um consumidor
+WEBHOOK_BATCH_SIZE = 500
+
+# Janela, em segundos, para acumular notificações em um lote
+WEBHOOK_BATCH_WINDOW = 0.1
 
 class WebhookManager:
-    def __init__(self):
-        self.app = Flask(__name__)
+    def __init__(self, consumers: int = WEBHOOK_CONSUMERS):
+        self.app = FastAPI(lifespan=self._lifespan)
         self.setup_routes()
-        self.processing_thread = None
+        self.consumers = consumers
+        # Fila de notificações, criada no event loop do servidor
+        self.queue: Optional[asyncio.Queue] = None
+        self.processing_tasks: List[asyncio.Task] = []
         self.running = False
+        # Tratador de cada tipo de evento, montado uma única vez
+        self._dispatch = {
+            'new_message': self._handle_new_messages,
+            'conversation_closed': self._handle_conversations_closed,
+            'conversation_reopened': self._handle_conversations_reopened,
+            'evaluation_completed': self._handle_evaluations_completed
+        }
+    
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """Inicia os consumidores da fila junto com o servidor e os encerra ao final"""
+        self.start_processing()
+        try:
+            yield
+        finally:
+            await self.stop_processing()
         
     def setup_routes(self):
         """Configura as rotas do webhook"""
-        @self.app.route('/webhook', methods=['POST'])
-        def webhook():
+        @self.app.post('/webhook')
+        async def webhook(request: Request):
             try:
-                data = request.get_json()
+                data = await request.json()
                 if not data:
-                    return jsonify({'error': 'No data provided'}), 400
+                    return JSONResponse({'error': 'No data provided'}, status_code=400)
+                if not isinstance(data, dict):
+                    return JSONResponse({'error': 'Notification must be a JSON object'}, status_code=400)
+                
+                # Sem o lifespan do app não há fila nem consumidores
+                if self.queue is None:
+                    return JSONResponse({'error': 'Webhook not started'}, status_code=503)
                 
                 # Adiciona à fila de processamento
-                notification_queue.put(data)
+                try:
+                    self.queue.put_nowait(data)
+                except asyncio.QueueFull:
+                    return JSONResponse({'error': 'Queue full'}, status_code=503)
                 
-                return jsonify({'status': 'received'}), 200
+                return JSONResponse({'status': 'received'}, status_code=200)
             except Exception as e:
                 logger.error(f"Erro no webhook: {e}")
-                return jsonify({'error': str(e)}), 500
+                return JSONResponse({'error': str(e)}, status_code=500)
     
     def start_processing(self):
-        """Inicia a thread de processamento de notificações"""
+        """Inicia as tarefas de processamento de notificações no event loop atual"""
         self.running = True
-        self.processing_thread = Thread(target=self._process_notifications)
-        self.processing_thread.daemon = True
-        self.processing_thread.start()
+        self.queue = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        self.processing_tasks = [
+            asyncio.create_task(self._process_notifications())
+            for _ in range(self.consumers)
+        ]
     
-    def stop_processing(self):
-        """Para a thread de processamento"""
+    async def stop_processing(self):
+        """Para as tarefas de processamento"""
         self.running = False
-        if self.processing_thread:
-            self.processing_thread.join()
+        for task in self.processing_tasks:
+            task.cancel()
+        await asyncio.gather(*self.processing_tasks, return_exceptions=True)
+        self.processing_tasks = []
     
-    def _process_notifications(self):
-        """Processa as notificações da fila"""
+    async def _next_batch(self) -> List[Dict]:
+        """
+        Aguarda a próxima notificação e acumula as seguintes por até WEBHOOK_BATCH_WINDOW
+        
+        Returns:
+            Lote com até WEBHOOK_BATCH_SIZE notificações
+        """
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WEBHOOK_BATCH_WINDOW
+        while len(batch) < WEBHOOK_BATCH_SIZE:
+            # Esvazia sem esperar o que já está na fila
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _process_notifications(self):
+        """Processa as notificações da fila em lotes"""
         while self.running:
+            # Obtém o próximo lote de notificações
+            batch = await self._next_batch()
             try:
-                # Obtém a próxima notificação
-                notification = notification_queue.get(timeout=1)
-                
-                # Processa a notificação
-                self._handle_notification(notification)
-                
-                # Marca como processada
-                notification_queue.task_done()
-                
+                # Os tratadores fazem E/S bloqueante; rodam fora do event loop
+                # para que os consumidores processem notificações em paralelo
+                await asyncio.to_thread(self._handle_notifications, batch)
             except Exception as e:
-                logger.error(f"Erro ao processar notificação: {e}")
+                logger.error(f"Erro ao processar notificações: {e}")
+            finally:
+                # Marca como processadas
+                for _ in batch:
+                    self.queue.task_done()
     
-    def _handle_notification(self, notification: Dict):
-        """Processa uma notificação específica"""
-        try:
-            event_type = notification.get('type')
-            data = notification.get('data', {})
-            
-            if event_type == 'new_message':
-                self._handle_new_message(data)
-            elif event_type == 'conversation_closed':
-                self._handle_conversation_closed(data)
-            elif event_type == 'conversation_reopened':
-                self._handle_conversation_reopened(data)
-            elif event_type == 'evaluation_completed':
-                self._handle_evaluation_completed(data)
-            else:
-                logger.warning(f"Tipo de evento desconhecido: {event_type}")
-                
-        except Exception as e:
-            logger.error(f"Erro ao processar notificação: {e}")
+    def _handle_notifications(self, notifications: List[Dict]):
+        """
+        Processa um lote de notificações, agrupadas por tipo de evento
+        
+        Cada tratador recebe todas as notificações do seu tipo de uma vez,
+        podendo reunir as gravações em um único WriteBatch.
+        
+        Args:
+            notifications: Notificações recebidas pelo webhook
+        """
+        by_type = defaultdict(list)
+        for notification in notifications:
+            # Uma notificação malformada é descartada sozinha, sem perder o lote
+            event_type = notification.get('type') if isinstance(notification, dict) else None
+            data = notification.get('data', {}) if isinstance(notification, dict) else None
+            if not isinstance(event_type, str) or not isinstance(data, dict):
+                logger.warning(f"Notificação malformada ignorada: {notification!r}")
+                continue
+            by_type[event_type].append(data)
+        
+        for event_type, items in by_type.items():
+            handler = self._dispatch.get(event_type)
+            if handler is None:
+                logger.warning(f"Tipo de evento desconhecido: {event_type} ({len(items)} notificações)")
+                continue
+            try:
+                handler(items)
+            except Exception as e:
+                logger.error(f"Erro ao processar notificações {event_type}: {e}")
     
-    def _handle_new_message(self, data: Dict):
-        """Processa notificação de nova mensagem"""
-        conversation_id = data.get('conversation_id')
-        message_id = data.get('message_id')
+    def _handle_new_messages(self, items: List[Dict]):
+        """Processa notificações de novas mensagens"""
+        for data in items:
+            conversation_id = data.get('conversation_id')
+            message_id = data.get('message_id')
         
         # Notifica o Agente Coletor
         # Implementar lógica específica aqui
     
-    def _handle_conversation_closed(self, data: Dict):
-        """Processa notificação de conversa encerrada"""
-        conversation_id = data.get('conversation_id')
+    def _handle_conversations_closed(self, items: List[Dict]):
+        """Processa notificações de conversas encerradas"""
+        for data in items:
+            conversation_id = data.get('conversation_id')
         
         # Notifica o Agente Avaliador
         # Implementar lógica específica aqui
     
-    def _handle_conversation_reopened(self, data: Dict):
-        """Processa notificação de conversa reaberta"""
-        conversation_id = data.get('conversation_id')
+    def _handle_conversations_reopened(self, items: List[Dict]):
+        """Processa notificações de conversas reabertas"""
+        for data in items:
+            conversation_id = data.get('conversation_id')
         
         # Notifica o Agente Coletor
         # Implementar lógica específica aqui
     
-    def _handle_evaluation_completed(self, data: Dict):
-        """Processa notificação de avaliação concluída"""
-        conversation_id = data.get('conversation_id')
-        evaluation_id = data.get('evaluation_id')
+    def _handle_evaluations_completed(self, items: List[Dict]):
+        """Processa notificações de avaliações concluídas"""
+        for data in items:
+            conversation_id = data.get('conversation_id')
+            evaluation_id = data.get('evaluation_id')
         
         # Atualiza métricas e estatísticas
         # Implementar lógica específica aqui
@@ -122,11 +204,10 @@ class WebhookManager:
 def start_webhook():
     """Inicia o servidor webhook"""
     webhook_manager = WebhookManager()
-    webhook_manager.start_processing()
     
     # Configura o host e porta
     host = os.getenv('WEBHOOK_HOST', '0.0.0.0')
     port = int(os.getenv('WEBHOOK_PORT', '5000'))
     
-    # Inicia o servidor Flask
-    webhook_manager.app.run(host=host, port=port) 
\ No newline at end of file
+    # Inicia o servidor ASGI; o uvicorn usa uvloop quando instalado
+    uvicorn.run(webhook_manager.app, host=host, port=port)
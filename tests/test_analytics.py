@@ -0,0 +1,43 @@
+import sys
+import os
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao PYTHONPATH
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from database.cache import cache_manager
+from database.analytics import get_conversation_metrics
+
+class TestAnalyticsCache(unittest.TestCase):
+    """Testa o cache das métricas de análise."""
+
+    def setUp(self):
+        cache_manager.clear()
+        self.addCleanup(cache_manager.clear)
+
+    def test_failure_is_not_cached(self):
+        """Uma falha transitória do Firestore não deve ficar em cache."""
+        start, end = datetime(2024, 1, 1), datetime(2024, 1, 2)
+        with patch('database.analytics.get_firestore_db',
+                   side_effect=[RuntimeError('indisponível'), MagicMock()]), \
+             patch('database.analytics._stream_pages', return_value=[]):
+            self.assertEqual(get_conversation_metrics(start, end), {})
+            metrics = get_conversation_metrics(start, end)
+
+        self.assertEqual(metrics['total_conversas'], 0)
+
+    def test_success_is_cached(self):
+        """Métricas calculadas com sucesso são reutilizadas no mesmo período."""
+        start, end = datetime(2024, 2, 1), datetime(2024, 2, 2)
+        with patch('database.analytics.get_firestore_db') as get_db, \
+             patch('database.analytics._stream_pages', return_value=[]):
+            first = get_conversation_metrics(start, end)
+            second = get_conversation_metrics(start, end)
+
+        self.assertEqual(first, second)
+        get_db.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from datetime import datetime, timedelta
-from database.cache import CacheManager, cached, invalidate_cache
+from database.cache import CacheManager, cached, cached_batch, cache_manager, invalidate_cache
+import threading
 import time
 
 class TestCache(unittest.TestCase):
@@ -19,6 +20,19 @@ class TestCache(unittest.TestCase):
         time.sleep(2)
         self.assertIsNone(self.cache_manager.get('test_key'))
 
+    def test_cache_expired_sweep_on_reads(self):
+        """Testa se entradas expiradas saem do cache mesmo sem novas escritas"""
+        cache = CacheManager(ttl=0.05)
+        for i in range(10):
+            cache.set(f'zombie:{i}', i)
+        time.sleep(0.1)
+
+        for _ in range(64):
+            cache.get('other')
+
+        self.assertEqual(len(cache._cache), 0)
+        self.assertEqual(cache._trie.children, {})
+
     def test_cache_delete(self):
         """Testa a remoção de itens do cache"""
         self.cache_manager.set('test_key', 'test_value')
@@ -48,6 +62,70 @@ class TestCache(unittest.TestCase):
         third_call = test_function()
         self.assertNotEqual(first_call, third_call)
 
+    def test_cache_decorator_keys(self):
+        """Testa as chaves geradas pelo @cached para args, kwargs e valores não hasheáveis"""
+        calls = []
+
+        @cached(ttl=60)
+        def get_item(item_id, limit=10):
+            calls.append((item_id, limit))
+            return [item_id, limit]
+
+        get_item('a')
+        get_item('a')
+        get_item('a', limit=5)
+        get_item('b', limit=5)
+        self.assertEqual(calls, [('a', 10), ('a', 5), ('b', 5)])
+
+        # Argumentos não hasheáveis são executados sem cache
+        self.assertEqual(get_item({'id': 1}), [{'id': 1}, 10])
+        self.assertEqual(get_item({'id': 1}), [{'id': 1}, 10])
+        self.assertEqual(len(calls), 5)
+
+    def test_cache_mget_mset(self):
+        """Testa a leitura e escrita em lote"""
+        self.cache_manager.mset({'a': 1, 'b': 2})
+        hits, misses = self.cache_manager.mget(['a', 'b', 'c'])
+        self.assertEqual(hits, {'a': 1, 'b': 2})
+        self.assertEqual(misses, ['c'])
+
+    def test_cached_batch_decorator(self):
+        """Testa se o @cached_batch busca apenas os ids ausentes do cache"""
+        cache_manager.clear()
+        calls = []
+
+        @cached_batch(key_fn=lambda item_id: f'batch_item:{item_id}')
+        def get_items(item_ids):
+            calls.append(list(item_ids))
+            return {item_id: item_id * 10 for item_id in item_ids}
+
+        self.assertEqual(get_items([1, 2]), {1: 10, 2: 20})
+        self.assertEqual(get_items([1, 2, 3]), {1: 10, 2: 20, 3: 30})
+        self.assertEqual(calls, [[1, 2], [3]])
+
+    def test_get_or_compute_single_flight(self):
+        """Testa se chamadas concorrentes para a mesma chave calculam o valor uma única vez"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.cache_manager.get_or_compute('herd', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
     def test_invalidate_cache_decorator(self):
         """Testa o decorador @invalidate_cache"""
         @cached(ttl=60)
@@ -63,6 +141,71 @@ class TestCache(unittest.TestCase):
         second_call = get_data()
         self.assertNotEqual(first_call, second_call)
 
+    def test_cached_pattern_invalidation(self):
+        """Testa a invalidação das chaves do @cached pelo padrão e pelo prefixo da função"""
+        cache_manager.clear()
+
+        @cached(ttl=60, pattern='item:*')
+        def get_item(item_id):
+            return datetime.now()
+
+        @invalidate_cache('item:*')
+        def update_item(item_id):
+            return True
+
+        first_call = get_item(1)
+        self.assertEqual(get_item(1), first_call)
+        update_item(1)
+        second_call = get_item(1)
+        self.assertNotEqual(first_call, second_call)
+
+        cache_manager.invalidate_pattern(('item', get_item.__module__, get_item.__qualname__))
+        self.assertNotEqual(get_item(1), second_call)
+
+    def test_targeted_invalidation_key_fn(self):
+        """Testa se a invalidação por tag remove apenas as entradas da chave afetada"""
+        cache_manager.clear()
+        calls = []
+
+        @cached(ttl=60, key_fn=lambda item_id: f'item:{item_id}')
+        def get_item(item_id):
+            calls.append(item_id)
+            return item_id
+
+        @invalidate_cache(key_fn=lambda item_id, data: f'item:{item_id}')
+        def update_item(item_id, data):
+            return True
+
+        get_item(1)
+        get_item(2)
+        cache_manager.set('item:1', 'batch')
+        update_item(1, {})
+        get_item(1)
+        get_item(2)
+
+        self.assertEqual(calls, [1, 2, 1])
+        self.assertIsNone(cache_manager.get('item:1'))
+
+        cache_manager.invalidate_pattern('item:*')
+        get_item(2)
+        self.assertEqual(calls, [1, 2, 1, 2])
+
+    def test_update_pattern_write_through(self):
+        """Testa a atualização das entradas em cache de uma subárvore"""
+        self.cache_manager.set('conversation:1', {'status': 'open'})
+        self.cache_manager.set(('conversation', '1', 'module', 'get_conversation', '1'), {'status': 'open'})
+        self.cache_manager.set('conversation:2', {'status': 'open'})
+
+        updated = self.cache_manager.update_pattern(
+            ('conversation', '1'), lambda key, value: {**value, 'status': 'closed'})
+
+        self.assertEqual(updated, 2)
+        self.assertEqual(self.cache_manager.get('conversation:1'), {'status': 'closed'})
+        self.assertEqual(self.cache_manager.get(('conversation', '1', 'module', 'get_conversation', '1')),
+                         {'status': 'closed'})
+        self.assertEqual(self.cache_manager.get('conversation:2'), {'status': 'open'})
+        self.assertEqual(self.cache_manager.update_pattern(('conversation', '3'), lambda key, value: value), 0)
+
     def test_cache_eviction(self):
         """Testa a remoção automática de itens antigos quando o cache está cheio"""
         for i in range(1100):  # Mais que o limite de 1000
@@ -72,6 +215,30 @@ class TestCache(unittest.TestCase):
         self.assertIsNone(self.cache_manager.get('key0'))
         self.assertIsNotNone(self.cache_manager.get('key1099'))
 
+    def test_cache_eviction_lru(self):
+        """Testa se a remoção considera o uso mais recente, não a inserção"""
+        cache = CacheManager(maxsize=3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        cache.get('a')
+        cache.set('d', 4)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get_metrics()['evictions'], 1)
+
+    def test_cache_eviction_vlru(self):
+        """Testa se a evicção v-LRU preserva entradas antigas com maior peso"""
+        cache = CacheManager(maxsize=10)
+        cache.set('expensive', 1, weight=100)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+
+        self.assertEqual(cache.get('expensive'), 1)
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.get('key1'), 1)
+
     def test_cache_pattern_invalidation(self):
         """Testa a invalidação de cache por padrão"""
         self.cache_manager.set('test:1', 'value1')
@@ -83,6 +250,43 @@ class TestCache(unittest.TestCase):
         self.assertIsNone(self.cache_manager.get('test:2'))
         self.assertIsNotNone(self.cache_manager.get('other:1'))
 
+    def test_cache_pattern_invalidation_trie(self):
+        """Testa a invalidação por subárvore, por chave exata e de chaves registradas"""
+        self.cache_manager.set('conversation:1:messages', 'value1')
+        self.cache_manager.set('conversation:2', 'value2')
+        self.cache_manager.set('conversations', 'value3')
+        self.cache_manager.set(('conversation', 'module', 'get_conversation', '1'), 'value4')
+
+        self.cache_manager.invalidate_pattern('conversations')
+        self.assertIsNone(self.cache_manager.get('conversations'))
+        self.assertEqual(self.cache_manager.get('conversation:2'), 'value2')
+
+        self.cache_manager.invalidate_pattern('conversation:*')
+        self.assertIsNone(self.cache_manager.get('conversation:1:messages'))
+        self.assertIsNone(self.cache_manager.get('conversation:2'))
+        self.assertIsNone(self.cache_manager.get(('conversation', 'module', 'get_conversation', '1')))
+        self.assertEqual(self.cache_manager._trie.children, {})
+
+    def test_cache_glob_invalidation(self):
+        """Testa padrões glob que não são apenas um prefixo"""
+        self.cache_manager.set('conversation:1:messages', 'value1')
+        self.cache_manager.set('conversation:1:summary', 'value2')
+        self.cache_manager.set('conversation:2:messages', 'value3')
+
+        self.cache_manager.invalidate_pattern('conversation:*:messages')
+        self.assertIsNone(self.cache_manager.get('conversation:1:messages'))
+        self.assertIsNone(self.cache_manager.get('conversation:2:messages'))
+        self.assertEqual(self.cache_manager.get('conversation:1:summary'), 'value2')
+        self.assertNotIn('2', self.cache_manager._trie.children['conversation'].children)
+
+    def test_cache_trie_pruned_on_delete(self):
+        """Testa se chaves removidas não deixam entradas na trie de invalidação"""
+        self.cache_manager.set('conversation:1', 'value1')
+        self.cache_manager.set(('conversation', 'module', 'get_conversation', '1'), 'value2')
+        self.cache_manager.delete('conversation:1')
+        self.cache_manager.delete(('conversation', 'module', 'get_conversation', '1'))
+        self.assertEqual(self.cache_manager._trie.children, {})
+
     def test_cache_metrics(self):
         """Testa as métricas do cache"""
         # Testa hits
@@ -103,5 +307,20 @@ class TestCache(unittest.TestCase):
         self.cache_manager.invalidate_pattern('test:*')
         self.assertEqual(self.cache_manager.get_metrics()['invalidations'], 1)
 
+    def test_cache_hit_ratio_metrics(self):
+        """Testa as métricas derivadas de taxa de acerto e speedup"""
+        self.assertEqual(self.cache_manager.get_metrics()['hit_ratio'], 0.0)
+
+        self.cache_manager.set('key1', 'value1')
+        for _ in range(3):
+            self.cache_manager.get('key1')
+        self.cache_manager.get('missing')
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['hit_ratio'], 0.75)
+        self.assertEqual(metrics['miss_ratio'], 0.25)
+        self.assertEqual(metrics['speedup'], 4)
+        self.assertEqual(self.cache_manager.get_hot_keys(1), [('key1', 3)])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
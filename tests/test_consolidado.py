@@ -0,0 +1,71 @@
+import sys
+import os
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao PYTHONPATH
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from database.cache import cache_manager
+from database.firebase_db import get_consolidado_by_period
+
+# migrations cria um MigrationManager na importação, que acessa o Firestore e
+# cria o diretório de migrações
+with patch('database.firebase_db.get_firestore_db'), patch('os.makedirs'):
+    from database.migrations import MigrationManager
+
+def _doc(data, doc_id='doc1'):
+    doc = MagicMock()
+    doc.id = doc_id
+    doc.to_dict.return_value = dict(data)
+    return doc
+
+class TestConsolidadoPeriodBucket(unittest.TestCase):
+    """Testa registros consolidados gravados antes do campo period_bucket."""
+
+    def setUp(self):
+        cache_manager.clear()
+        self.addCleanup(cache_manager.clear)
+        self.legacy = {
+            'data_inicio': datetime(2024, 3, 5, tzinfo=timezone.utc),
+            'data_fim': datetime(2024, 3, 6, tzinfo=timezone.utc)
+        }
+
+    def test_get_by_period_finds_document_without_bucket(self):
+        """Sem period_bucket, o registro é achado pela consulta por data_inicio."""
+        bucket_query = MagicMock()
+        bucket_query.stream.return_value = []
+        range_query = MagicMock()
+        range_query.where.return_value = range_query
+        range_query.stream.return_value = [_doc(self.legacy)]
+
+        collection = MagicMock()
+        collection.where.side_effect = lambda filter: (
+            bucket_query if filter.field_path == 'period_bucket' else range_query
+        )
+        db = MagicMock()
+        db.collection.return_value = collection
+
+        with patch('database.firebase_db._pick_db', return_value=db):
+            result = get_consolidado_by_period(datetime(2024, 3, 1), datetime(2024, 3, 31))
+
+        self.assertEqual(result, self.legacy)
+
+    def test_migrate_consolidado_backfills_bucket(self):
+        """A migração grava period_bucket a partir de data_inicio."""
+        legacy = _doc({**self.legacy, 'data_criacao': datetime(2024, 3, 5)})
+        migrated = _doc({**self.legacy, 'data_criacao': datetime(2024, 3, 5), 'period_bucket': '202403'}, 'doc2')
+        db = MagicMock()
+        db.collection.return_value.stream.return_value = [legacy, migrated]
+        batch = db.batch.return_value
+
+        with patch('database.migrations.get_firestore_db', return_value=db), \
+             patch.object(MigrationManager, '_ensure_migrations_dir'):
+            count = MigrationManager().migrate_consolidado()
+
+        self.assertEqual(count, 1)
+        batch.update.assert_called_once_with(legacy.reference, {'period_bucket': '202403'})
+
+if __name__ == '__main__':
+    unittest.main()
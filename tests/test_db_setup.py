@@ -0,0 +1,38 @@
+import sys
+import os
+import subprocess
+import unittest
+from unittest.mock import MagicMock, patch
+
+ROOT = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
+class TestDbSetup(unittest.TestCase):
+    """Testa a configuração do banco de dados SQL."""
+
+    def test_init_db_with_database_url(self):
+        """init_db não deve falhar com DATABASE_URL definida enquanto os modelos são stubs."""
+        env = dict(os.environ, DATABASE_URL='sqlite:///:memory:')
+        result = subprocess.run(
+            [sys.executable, '-c', 'import database; print(database.init_db())'],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'True')
+
+    def test_readonly_scope_returns_connection(self):
+        """O escopo somente leitura fecha a sessão sem commit e mantém a sessão da thread."""
+        from database import db_setup
+
+        factory = MagicMock()
+        session = factory.return_value
+        with patch.object(db_setup, 'ENABLE_SQL', True), \
+             patch.object(db_setup, 'get_session_factory', return_value=factory):
+            with db_setup.with_db_session(readonly=True) as db:
+                self.assertIs(db, session)
+
+        session.commit.assert_not_called()
+        session.close.assert_called_once()
+        factory.remove.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
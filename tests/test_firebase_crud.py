@@ -1,5 +1,5 @@
 import unittest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from database.firebase_db import (
     init_firebase,
     get_firestore_db,
@@ -24,7 +24,9 @@ from database.firebase_db import (
     create_consolidado,
     get_consolidado,
     get_conversations_with_pagination,
-    get_messages_with_pagination
+    get_messages_with_pagination,
+    _encode_cursor,
+    _decode_cursor
 )
 from tests.test_config import FIREBASE_TEST_CONFIG, COLLECTIONS
 import os
@@ -237,9 +239,8 @@ def test_get_conversations_with_pagination_no_status():
     
     with patch('database.firebase_db.get_firestore_db') as mock_db:
         # Configura o mock para retornar a lista de documentos
-        mock_query = MagicMock()
-        mock_query.stream.return_value = mock_docs
-        mock_db.return_value.collection().order_by().limit.return_value = mock_query
+        collection = mock_db.return_value.collection.return_value
+        collection.order_by.return_value.limit.return_value.stream.return_value = mock_docs
         
         # Executa a função
         conversations, last_doc_id = get_conversations_with_pagination(limit=3)
@@ -247,10 +248,11 @@ def test_get_conversations_with_pagination_no_status():
         # Verifica o resultado
         assert len(conversations) == 3
         assert all('id' in conv for conv in conversations)
-        assert last_doc_id == 'conversation_2'  # Último documento
+        assert _decode_cursor(last_doc_id)[1] == 'conversation_2'  # Último documento
         
         # Verifica que o método order_by foi chamado corretamente
-        mock_db.return_value.collection().order_by.assert_called_once()
+        collection.order_by.assert_called_once()
+        collection.order_by.return_value.limit.assert_called_once_with(3)
 
 def test_get_conversations_with_pagination_with_status():
     """Testa a paginação de conversas com filtro de status."""
@@ -279,16 +281,16 @@ def test_get_conversations_with_pagination_with_status():
         # Verifica o resultado
         assert len(conversations) == 2
         assert all(conv['status'] == 'encerrada' for conv in conversations)
-        assert last_doc_id == 'conversation_1'  # Último documento
+        assert _decode_cursor(last_doc_id)[1] == 'conversation_1'  # Último documento
         
         # Verifica que o método where foi chamado corretamente
         mock_db.return_value.collection().where.assert_called_once()
 
 def test_get_conversations_with_pagination_with_start_after():
     """Testa a paginação de conversas com ponto de início."""
-    # Mock para o documento de início
-    start_doc = MagicMock()
-    start_doc.exists = True
+    # Cursor retornado pela página anterior
+    last_ts = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = _encode_cursor(last_ts, 'last_conversation_id')
     
     # Mock para documentos retornados pelo Firestore
     mock_docs = []
@@ -303,27 +305,37 @@ def test_get_conversations_with_pagination_with_start_after():
         mock_docs.append(mock_doc)
     
     with patch('database.firebase_db.get_firestore_db') as mock_db:
-        # Configura o mock para retornar o documento de início
-        mock_db.return_value.collection().document().get.return_value = start_doc
-        
         # Configura o mock para retornar a lista de documentos após o ponto de início
-        mock_query = MagicMock()
-        mock_query.stream.return_value = mock_docs
-        mock_db.return_value.collection().order_by().start_after().limit.return_value = mock_query
+        collection = mock_db.return_value.collection.return_value
+        ordered = collection.order_by.return_value.order_by.return_value
+        ordered.start_after.return_value.limit.return_value.stream.return_value = mock_docs
         
         # Executa a função
         conversations, last_doc_id = get_conversations_with_pagination(
             limit=3,
-            start_after='last_conversation_id'
+            start_after=cursor
         )
         
         # Verifica o resultado
         assert len(conversations) == 3
         assert all('id' in conv for conv in conversations)
-        assert last_doc_id == 'conversation_next_2'  # Último documento
+        assert _decode_cursor(last_doc_id)[1] == 'conversation_next_2'  # Último documento
         
-        # Verifica que o método start_after foi chamado corretamente
-        mock_db.return_value.collection().order_by().start_after.assert_called_once()
+        # O cursor posiciona a consulta sem reler o documento de início
+        ordered.start_after.assert_called_once_with(
+            {'ultimaMensagem': last_ts, '__name__': 'last_conversation_id'}
+        )
+        collection.document.assert_not_called()
+
+def test_pagination_cursor_round_trip():
+    """Testa a codificação do cursor de paginação e a compatibilidade com IDs antigos."""
+    ts = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    assert _decode_cursor(_encode_cursor(ts, 'doc_1')) == (ts, 'doc_1')
+    assert _decode_cursor(_encode_cursor(1714566615.5, 'doc_2')) == (1714566615.5, 'doc_2')
+    
+    # IDs de documento usados como cursor nas versões anteriores não são decodificados
+    assert _decode_cursor('last_conversation_id') is None
+    assert _decode_cursor('abc123') is None
 
 def test_get_messages_with_pagination():
     """Testa a paginação de mensagens de uma conversa."""
@@ -344,9 +356,9 @@ def test_get_messages_with_pagination():
     with patch('database.firebase_db.get_firestore_db') as mock_db, \
          patch('database.firebase_db.firestore') as mock_firestore:
         # Configura o mock para retornar a lista de documentos
-        mock_filter = MagicMock()
-        mock_db.return_value.collection().where.return_value = mock_filter
-        mock_filter.order_by().limit.return_value.stream.return_value = mock_docs
+        collection = mock_db.return_value.collection.return_value
+        ordered = collection.where.return_value.order_by.return_value
+        ordered.limit.return_value.stream.return_value = mock_docs
         
         # Executa a função
         messages, last_doc_id = get_messages_with_pagination(conversation_id, limit=5)
@@ -354,11 +366,12 @@ def test_get_messages_with_pagination():
         # Verifica o resultado
         assert len(messages) == 5
         assert all('id' in msg for msg in messages)
-        assert last_doc_id == 'message_4'  # Último documento
+        assert _decode_cursor(last_doc_id)[1] == 'message_4'  # Último documento
         
         # Verifica que os métodos foram chamados corretamente
         mock_db.return_value.collection.assert_called_once_with('mensagens')
-        mock_db.return_value.collection().where.assert_called_once()
+        collection.where.assert_called_once()
+        ordered.limit.assert_called_once_with(5)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,43 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import grpc
+from google.auth.credentials import AnonymousCredentials
+
+# Adiciona o diretório raiz ao PYTHONPATH
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from database.firebase_db import POOL_CHANNEL_OPTIONS, _create_pooled_client
+
+class TestFirestoreClientPool(unittest.TestCase):
+    """Testa os clientes Firestore adicionais do pool."""
+
+    @patch.dict(os.environ, {}, clear=False)
+    def test_pooled_client_channel_has_pool_options(self):
+        """O canal gRPC dos clientes adicionais deve receber POOL_CHANNEL_OPTIONS."""
+        os.environ.pop('FIRESTORE_EMULATOR_HOST', None)
+        primary = MagicMock(project='projeto-teste', _database='(default)')
+        firebase_app = MagicMock()
+        firebase_app.credential.get_credential.return_value = AnonymousCredentials()
+
+        with patch('database.firebase_db.firebase_app', firebase_app):
+            client = _create_pooled_client(primary)
+
+        # Canal real sem conexão, para o transporte aceitá-lo sem credenciais padrão
+        channel = grpc.insecure_channel('localhost:1')
+        self.addCleanup(channel.close)
+        with patch('google.api_core.grpc_helpers.create_channel', return_value=channel) as create_channel:
+            client._firestore_api
+
+        create_channel.assert_called_once()
+        options = create_channel.call_args.kwargs['options']
+        for option in POOL_CHANNEL_OPTIONS:
+            self.assertIn(option, options)
+        # As opções padrão do cliente (keepalive) são mantidas
+        self.assertGreater(len(options), len(POOL_CHANNEL_OPTIONS))
+        self.assertEqual(client.project, 'projeto-teste')
+
+if __name__ == '__main__':
+    unittest.main()
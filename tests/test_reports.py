@@ -0,0 +1,52 @@
+import sys
+import os
+import tempfile
+import unittest
+
+import pytest
+
+# Adiciona o diretório raiz ao PYTHONPATH
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('xlsxwriter')
+pytest.importorskip('openpyxl')
+
+from database.reports import export_report_to_excel
+
+class TestExportReportToExcel(unittest.TestCase):
+    """Testa a exportação de relatórios para Excel."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_export_keeps_every_cell(self):
+        """Todas as linhas e colunas devem ser gravadas, não só a última linha."""
+        report = {
+            'conversas': {'total_conversas': 3, 'conversas_ativas': 1, 'conversas_finalizadas': 2},
+            'topicos_tendencia': [
+                {'topico': 'entrega', 'frequencia': 30},
+                {'topico': 'pagamento', 'frequencia': 20},
+                {'topico': 'troca', 'frequencia': 10}
+            ],
+            'atendentes': {
+                'a1': {'total_mensagens': 5, 'tempo_medio_resposta': 1.5},
+                'a2': {'total_mensagens': 7, 'tempo_medio_resposta': 2.5},
+                'a3': {'total_mensagens': 9, 'tempo_medio_resposta': 3.5}
+            }
+        }
+        filename = os.path.join(self.tmpdir.name, 'relatorio.xlsx')
+
+        self.assertTrue(export_report_to_excel(report, filename))
+
+        sheets = pd.read_excel(filename, sheet_name=None)
+        self.assertEqual(sheets['topicos_tendencia'].to_dict('records'), report['topicos_tendencia'])
+        self.assertEqual(
+            sheets['atendentes'].set_index('atendente_id').to_dict('index'),
+            report['atendentes']
+        )
+        self.assertEqual(sheets['conversas'].to_dict('records'), [report['conversas']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+# Adiciona o diretório raiz ao PYTHONPATH
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+pytest.importorskip('fastapi')
+pytest.importorskip('httpx')
+pytest.importorskip('uvicorn')
+
+from fastapi.testclient import TestClient
+
+with patch('database.firebase_db.init_firebase'):
+    from database.webhook import WebhookManager
+
+class TestWebhook(unittest.TestCase):
+    """Testa o recebimento e o processamento das notificações do webhook."""
+
+    def setUp(self):
+        self.manager = WebhookManager(consumers=1)
+
+    def test_rejects_non_object_body(self):
+        """Corpos JSON que não são objetos devem ser recusados com 400."""
+        with TestClient(self.manager.app) as client:
+            for body in ([1], 'x', 5):
+                response = client.post('/webhook', json=body)
+                self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(self.manager.queue.qsize(), 0)
+
+    def test_returns_503_before_lifespan(self):
+        """Sem o lifespan (fila ainda não criada) o webhook responde 503."""
+        client = TestClient(self.manager.app)
+        response = client.post('/webhook', json={'type': 'new_message', 'data': {}})
+        self.assertEqual(response.status_code, 503)
+
+    def test_malformed_notification_does_not_drop_batch(self):
+        """Uma notificação malformada não deve impedir o processamento das demais."""
+        with patch.object(self.manager, '_handle_new_messages') as handle:
+            self.manager._dispatch['new_message'] = handle
+            self.manager._handle_notifications([
+                {'type': 'new_message', 'data': {'conversation_id': 'c1'}},
+                [1],
+                'x',
+                {'type': 'new_message', 'data': 'invalido'},
+                {'type': 'new_message', 'data': {'conversation_id': 'c2'}}
+            ])
+
+        handle.assert_called_once_with([{'conversation_id': 'c1'}, {'conversation_id': 'c2'}])
+
+if __name__ == '__main__':
+    unittest.main()